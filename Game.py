@@ -1,7 +1,16 @@
+import os, sys
+if '--headless' in sys.argv:
+    # Must be decided before the first OpenGL import
+    os.environ.setdefault('PYOPENGL_PLATFORM', 'osmesa')
 from OpenGL.GL import *
 from OpenGL.GLUT import *
 from OpenGL.GLU import *
-import math, time, sys, random
+import math, time, random, struct, zlib, collections, array, ctypes
+import asyncio, concurrent.futures, heapq
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 # Camera-related variables
 camera_pos = (0, 500, 500)
@@ -34,13 +43,12 @@ last_tile = None
 time_on_tile = 0.0
 max_tile_time = 3.0
 show_timer = False
-time_last = time.time()
-game_start_time = time.time()
+game_start_time = 0.0
 bounce_timer = 0.0
 bounce_time_limit = 10.0
 base_bounce_time = 10.0
 show_bounce_timer = True
-last_bounce_time = time.time()
+last_bounce_time = 0.0
 move_keys = {"a": False, "d": False, "w": False, "s": False}
 space_pressed = False
 difficulty_timer = None
@@ -72,6 +80,773 @@ shield_duration = 0.0
 max_shield_duration = 10.0
 zones = {'safe': [], 'normal': [], 'danger': []}
 small_obstacle_trees = []
+layout_version = 0
+DEATH_CAUSES = ('none', 'bounce_timer', 'obstacle', 'projectile', 'tile_timer', 'hole')
+death_cause = 0
+layout_seed = None
+layout_library = None
+layout_placements = None
+placement_log = None
+gc_freeze_layouts = False
+
+class FrameClock:
+    """The one time source for a frame.
+
+    tick() samples perf_counter once; everything else reads `now`/`dt` from
+    here so all systems agree on the time within a frame.  Game time stops
+    while paused.  Hazards (obstacles, projectiles, shooting trees) run on
+    their own accumulated time scaled by `hazard_scale`, which is what the
+    slow_time pickup lowers.  simulate() swaps real time for a fixed step so
+    headless runs are deterministic and independent of wall-clock speed.
+    """
+    def __init__(self, source=time.perf_counter):
+        self.source = source
+        self.real = source()
+        self.now = 0.0
+        self.dt = 0.0
+        self.hazard_now = 0.0
+        self.hazard_dt = 0.0
+        self.hazard_scale = 1.0
+        self.scale = 1.0
+        self.paused = False
+        self.fixed_step = None
+
+    def simulate(self, step):
+        self.fixed_step = step
+
+    def tick(self):
+        real = self.source()
+        elapsed = real - self.real if self.fixed_step is None else self.fixed_step
+        self.real = real
+        self.dt = 0.0 if self.paused else elapsed * self.scale
+        self.now += self.dt
+        self.hazard_dt = self.dt * self.hazard_scale
+        self.hazard_now += self.hazard_dt
+        return self.now
+
+clock = FrameClock()
+
+class FixedFunctionRenderer:
+    """The original immediate-mode path; every verb is the GL/GLUT call itself"""
+    name = 'fixed'
+    # class attributes rather than instance ones, so MeshRenderer can replace them
+    solid_sphere = staticmethod(glutSolidSphere)
+    wire_sphere = staticmethod(glutWireSphere)
+    solid_cube = staticmethod(glutSolidCube)
+    solid_cone = staticmethod(glutSolidCone)
+    solid_torus = staticmethod(glutSolidTorus)
+
+    def __init__(self):
+        self.push_matrix = glPushMatrix
+        self.pop_matrix = glPopMatrix
+        self.translate = glTranslatef
+        self.rotate = glRotatef
+        self.scale = glScalef
+        self.color = glColor3f
+        self.color_alpha = glColor4f
+        self.vertex = glVertex3f
+        self.end = glEnd
+        self.line_width = glLineWidth
+        self.look_at = gluLookAt
+        self.mult_matrix = glMultMatrixf
+
+    def begin(self, mode):
+        # GLUT solids leave their last normal current; blocks are lit facing +z
+        glNormal3f(0.0, 0.0, 1.0)
+        glBegin(mode)
+
+    def enable_blend(self):
+        glEnable(GL_BLEND)
+        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+
+    def disable_blend(self):
+        glDisable(GL_BLEND)
+
+    def begin_frame(self):
+        pass
+
+    def end_frame(self):
+        pass
+
+class MeshRenderer(FixedFunctionRenderer):
+    """Fixed-function renderer that needs no GLUT window.
+
+    freeglut refuses to draw its solids before glutInit, so these come from
+    the same mesh generators as ShaderRenderer, compiled into display lists.
+    Used for headless (OSMesa) runs.
+    """
+    name = 'mesh'
+
+    def __init__(self):
+        super().__init__()
+        self.lists = {}
+        glEnable(GL_NORMALIZE)
+
+    def call_mesh(self, key, build, mode=GL_TRIANGLES):
+        display_list = self.lists.get(key)
+        if display_list is None:
+            data = build()
+            display_list = self.lists[key] = glGenLists(1)
+            glNewList(display_list, GL_COMPILE)
+            glBegin(mode)
+            for k in range(0, len(data), 6):
+                glNormal3f(data[k + 3], data[k + 4], data[k + 5])
+                glVertex3f(data[k], data[k + 1], data[k + 2])
+            glEnd()
+            glEndList()
+        glCallList(display_list)
+
+    def solid_sphere(self, radius, slices, stacks):
+        glPushMatrix()
+        glScalef(radius, radius, radius)
+        self.call_mesh(('sphere', slices, stacks), lambda: sphere_mesh(slices, stacks))
+        glPopMatrix()
+
+    def wire_sphere(self, radius, slices, stacks):
+        glPushMatrix()
+        glScalef(radius, radius, radius)
+        self.call_mesh(('wire_sphere', slices, stacks), lambda: sphere_mesh(slices, stacks, True), GL_LINES)
+        glPopMatrix()
+
+    def solid_cube(self, size):
+        glPushMatrix()
+        glScalef(size, size, size)
+        self.call_mesh(('cube',), cube_mesh)
+        glPopMatrix()
+
+    def solid_cone(self, base, height, slices, stacks):
+        glPushMatrix()
+        glScalef(base, base, height)
+        self.call_mesh(('cone', slices), lambda: cone_mesh(slices))
+        glPopMatrix()
+
+    def solid_torus(self, inner, outer, sides, rings):
+        self.call_mesh(('torus', inner, outer, sides, rings), lambda: torus_mesh(inner, outer, sides, rings))
+
+IDENTITY = (1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0)
+
+def mat_mul(a, b):
+    return tuple(sum(a[k * 4 + r] * b[c * 4 + k] for k in range(4)) for c in range(4) for r in range(4))
+
+def perspective_matrix(fovy, aspect, near, far):
+    f = 1.0 / math.tan(math.radians(fovy) / 2)
+    return (f / aspect, 0.0, 0.0, 0.0, 0.0, f, 0.0, 0.0,
+            0.0, 0.0, (far + near) / (near - far), -1.0,
+            0.0, 0.0, 2 * far * near / (near - far), 0.0)
+
+def normalize(v):
+    length = math.sqrt(v[0]**2 + v[1]**2 + v[2]**2) or 1.0
+    return (v[0] / length, v[1] / length, v[2] / length)
+
+def cross(a, b):
+    return (a[1] * b[2] - a[2] * b[1], a[2] * b[0] - a[0] * b[2], a[0] * b[1] - a[1] * b[0])
+
+def look_at_matrix(eye, center, up):
+    f = normalize((center[0] - eye[0], center[1] - eye[1], center[2] - eye[2]))
+    s = normalize(cross(f, up))
+    u = cross(s, f)
+    return (s[0], u[0], -f[0], 0.0, s[1], u[1], -f[1], 0.0, s[2], u[2], -f[2], 0.0,
+            -(s[0] * eye[0] + s[1] * eye[1] + s[2] * eye[2]),
+            -(u[0] * eye[0] + u[1] * eye[1] + u[2] * eye[2]),
+            f[0] * eye[0] + f[1] * eye[1] + f[2] * eye[2], 1.0)
+
+def normal_columns(m):
+    """Inverse transpose of the upper 3x3, which is how GL transforms normals"""
+    a, b, c = m[0:3], m[4:7], m[8:11]
+    cofactor = cross(b, c) + cross(c, a) + cross(a, b)
+    det = a[0] * cofactor[0] + a[1] * cofactor[1] + a[2] * cofactor[2]
+    if not det:
+        return cofactor
+    return tuple(v / det for v in cofactor)
+
+IDENTITY_NORMALS = normal_columns(IDENTITY)
+
+class MatrixStack:
+    """Python-side modelview stack, colour and blend state for renderers that
+    need to know the transform of every draw rather than leave it to GL"""
+    def reset_state(self):
+        self.model = IDENTITY
+        self.stack = []
+        self.current_color = (1.0, 1.0, 1.0, 1.0)
+        self.current_line_width = 1.0
+        self.blend = False
+
+    def push_matrix(self):
+        self.stack.append(self.model)
+
+    def pop_matrix(self):
+        self.model = self.stack.pop()
+
+    def translate(self, x, y, z):
+        m = self.model
+        self.model = m[:12] + tuple(m[r] * x + m[4 + r] * y + m[8 + r] * z + m[12 + r] for r in range(4))
+
+    def scale(self, x, y, z):
+        m = self.model
+        self.model = (tuple(v * x for v in m[0:4]) + tuple(v * y for v in m[4:8]) +
+                      tuple(v * z for v in m[8:12]) + m[12:])
+
+    def mult_matrix(self, m):
+        self.model = mat_mul(self.model, m)
+
+    def rotate(self, angle, x, y, z):
+        x, y, z = normalize((x, y, z))
+        c, s = math.cos(math.radians(angle)), math.sin(math.radians(angle))
+        t = 1 - c
+        r = (t * x * x + c, t * x * y + s * z, t * x * z - s * y, 0.0,
+             t * x * y - s * z, t * y * y + c, t * y * z + s * x, 0.0,
+             t * x * z + s * y, t * y * z - s * x, t * z * z + c, 0.0,
+             0.0, 0.0, 0.0, 1.0)
+        self.model = mat_mul(self.model, r)
+
+    def color(self, r, g, b):
+        self.current_color = (r, g, b, 1.0)
+
+    def color_alpha(self, r, g, b, a):
+        self.current_color = (r, g, b, a)
+
+    def line_width(self, width):
+        self.current_line_width = width
+
+    def enable_blend(self):
+        self.blend = True
+
+    def disable_blend(self):
+        self.blend = False
+
+
+def sphere_mesh(slices, stacks, wire=False):
+    def point(t, p):
+        return (math.sin(t) * math.cos(p), math.sin(t) * math.sin(p), math.cos(t))
+    data = []
+    for i in range(stacks):
+        t0, t1 = math.pi * i / stacks, math.pi * (i + 1) / stacks
+        for j in range(slices):
+            p0, p1 = 2 * math.pi * j / slices, 2 * math.pi * (j + 1) / slices
+            if wire:
+                corners = [point(t0, p0), point(t0, p1), point(t0, p0), point(t1, p0)]
+            else:
+                a, b, c, d = point(t0, p0), point(t1, p0), point(t1, p1), point(t0, p1)
+                corners = [a, b, c, a, c, d]
+            for v in corners:
+                data.extend(v + v)
+    return data
+
+def cube_mesh():
+    data = []
+    for axis in range(3):
+        for sign in (-0.5, 0.5):
+            n = [0.0, 0.0, 0.0]
+            n[axis] = sign * 2
+            u, v = (axis + 1) % 3, (axis + 2) % 3
+            corners = []
+            for du, dv in ((-0.5, -0.5), (0.5, -0.5), (0.5, 0.5), (-0.5, 0.5)):
+                p = [0.0, 0.0, 0.0]
+                p[axis], p[u], p[v] = sign, du, dv
+                corners.append(tuple(p))
+            for k in (0, 1, 2, 0, 2, 3):
+                data.extend(corners[k] + tuple(n))
+    return data
+
+def cone_mesh(slices, aspect=1.0):
+    """Unit cone; normals are those of a cone `aspect` times as wide as it is high"""
+    data = []
+    for j in range(slices):
+        a0, a1 = 2 * math.pi * j / slices, 2 * math.pi * (j + 1) / slices
+        n0 = normalize((math.cos(a0), math.sin(a0), aspect))
+        n1 = normalize((math.cos(a1), math.sin(a1), aspect))
+        apex_n = normalize(((n0[0] + n1[0]) / 2, (n0[1] + n1[1]) / 2, n0[2]))
+        p0 = (math.cos(a0), math.sin(a0), 0.0)
+        p1 = (math.cos(a1), math.sin(a1), 0.0)
+        data.extend(p0 + n0)
+        data.extend(p1 + n1)
+        data.extend((0.0, 0.0, 1.0) + apex_n)
+        for v in ((0.0, 0.0, 0.0), p1, p0):
+            data.extend(v + (0.0, 0.0, -1.0))
+    return data
+
+def torus_mesh(inner, outer, sides, rings):
+    def point(u, v):
+        n = (math.cos(v) * math.cos(u), math.cos(v) * math.sin(u), math.sin(v))
+        p = ((outer + inner * math.cos(v)) * math.cos(u), (outer + inner * math.cos(v)) * math.sin(u), inner * math.sin(v))
+        return p + n
+    data = []
+    for i in range(rings):
+        u0, u1 = 2 * math.pi * i / rings, 2 * math.pi * (i + 1) / rings
+        for j in range(sides):
+            v0, v1 = 2 * math.pi * j / sides, 2 * math.pi * (j + 1) / sides
+            a, b, c, d = point(u0, v0), point(u1, v0), point(u1, v1), point(u0, v1)
+            for v in (a, b, c, a, c, d):
+                data.extend(v)
+    return data
+
+SHADER_VERTEX = """
+#version 330 core
+layout(location = 0) in vec3 position;
+layout(location = 1) in vec3 normal;
+layout(location = 2) in vec4 color;
+struct Instance {
+    mat4 model;
+    mat3 normal_matrix;
+    vec4 color;
+};
+layout(std140) uniform Instances {
+    Instance instances[%d];
+};
+uniform mat4 view;
+uniform mat4 projection;
+out vec3 v_normal;
+out float v_normal_length;
+out vec4 v_color;
+void main() {
+    Instance inst = instances[gl_InstanceID];
+    v_normal = mat3(view) * (inst.normal_matrix * normal);
+    v_normal_length = length(v_normal);
+    v_color = color * inst.color;
+    gl_Position = projection * view * inst.model * vec4(position, 1.0);
+}
+"""
+
+SHADER_FRAGMENT = """
+#version 330 core
+in vec3 v_normal;
+in float v_normal_length;
+in vec4 v_color;
+uniform vec3 light_dir;
+out vec4 frag_color;
+void main() {
+    // Lit per pixel along the interpolated normal, which keeps the length
+    // the model matrix gave it: fixed function does not renormalize either
+    vec3 n = v_normal_length > 0.0 ? normalize(v_normal) * v_normal_length : vec3(0.0);
+    frag_color = vec4(min(v_color.rgb * (0.2 + max(dot(n, light_dir), 0.0)), 1.0), v_color.a);
+}
+"""
+
+class ShaderRenderer(MatrixStack):
+    """Shader/VBO path with the same verbs as FixedFunctionRenderer.
+
+    Transforms are tracked in Python.  GLUT solids become shared unit meshes and
+    each draw becomes an instance record (model matrix, normal matrix, colour) in
+    one uniform buffer per frame, so a run of identical meshes is a single
+    glDrawArraysInstanced.  glBegin/glEnd geometry is transformed on the CPU into
+    a streamed vertex buffer, lit with the normal (0, 0, 1) as the fixed-function
+    renderer sets it.  Lighting reproduces LIGHT0 with GL_COLOR_MATERIAL (0.2
+    ambient plus a headlight) per pixel, normals transformed by the inverse
+    transpose and not renormalized, as fixed function does without GL_NORMALIZE.
+
+    Everything here is core-profile GL 3.3; wide lines need a context which is
+    not forward-compatible.  main() asks for a compatibility context by default
+    only because the HUD draws with bitmap fonts, --core-profile gets a core
+    one and leaves the HUD out.
+    """
+    name = 'shader'
+    max_instances = 128
+    instance_floats = 32
+
+    def __init__(self):
+        from OpenGL.GL import shaders
+        self.stream_vao = glGenVertexArrays(1)
+        self.stream_vbo = glGenBuffers(1)
+        glBindVertexArray(self.stream_vao)
+        glBindBuffer(GL_ARRAY_BUFFER, self.stream_vbo)
+        for location, size, offset in ((0, 3, 0), (1, 3, 12), (2, 4, 24)):
+            glEnableVertexAttribArray(location)
+            glVertexAttribPointer(location, size, GL_FLOAT, GL_FALSE, 40, ctypes.c_void_p(offset))
+        self.program = shaders.compileProgram(
+            shaders.compileShader(SHADER_VERTEX % self.max_instances, GL_VERTEX_SHADER),
+            shaders.compileShader(SHADER_FRAGMENT, GL_FRAGMENT_SHADER),
+        )
+        glBindVertexArray(0)
+        glUniformBlockBinding(self.program, glGetUniformBlockIndex(self.program, 'Instances'), 0)
+        self.view_location = glGetUniformLocation(self.program, 'view')
+        self.projection_location = glGetUniformLocation(self.program, 'projection')
+        self.light_location = glGetUniformLocation(self.program, 'light_dir')
+        self.ubo = glGenBuffers(1)
+        alignment = glGetIntegerv(GL_UNIFORM_BUFFER_OFFSET_ALIGNMENT)
+        self.ubo_alignment = max(1, int(alignment) // 4)
+        self.meshes = {}
+        self.view = IDENTITY
+        self.begin_frame()
+
+    def mesh(self, key, build, mode=GL_TRIANGLES):
+        mesh = self.meshes.get(key)
+        if mesh is None:
+            data = array.array('f', build())
+            vao = glGenVertexArrays(1)
+            vbo = glGenBuffers(1)
+            glBindVertexArray(vao)
+            glBindBuffer(GL_ARRAY_BUFFER, vbo)
+            glBufferData(GL_ARRAY_BUFFER, data.tobytes(), GL_STATIC_DRAW)
+            for location, offset in ((0, 0), (1, 12)):
+                glEnableVertexAttribArray(location)
+                glVertexAttribPointer(location, 3, GL_FLOAT, GL_FALSE, 24, ctypes.c_void_p(offset))
+            glBindVertexArray(0)
+            mesh = self.meshes[key] = (vao, mode, len(data) // 6)
+        return mesh
+
+    def begin_frame(self):
+        self.reset_state()
+        self.items = []
+        # opaque geometry by (primitive, line width), then everything blended
+        self.streams = {'blend': array.array('f')}
+        self.immediate = None
+
+    def look_at(self, ex, ey, ez, cx, cy, cz, ux, uy, uz):
+        self.view = look_at_matrix((ex, ey, ez), (cx, cy, cz), (ux, uy, uz))
+
+    def submit(self, mesh, size=(1.0, 1.0, 1.0)):
+        """Queue mesh scaled to size; as with GLUT's solids, their size does not shorten normals"""
+        model = self.model
+        self.push_matrix()
+        self.scale(*size)
+        self.items.append((mesh, self.model, normal_columns(model), self.current_color, self.blend,
+                           self.current_line_width if mesh[1] == GL_LINES else None))
+        self.pop_matrix()
+
+    def solid_sphere(self, radius, slices, stacks):
+        self.submit(self.mesh(('sphere', slices, stacks), lambda: sphere_mesh(slices, stacks)), (radius,) * 3)
+
+    def wire_sphere(self, radius, slices, stacks):
+        self.submit(self.mesh(('wire_sphere', slices, stacks), lambda: sphere_mesh(slices, stacks, True), GL_LINES),
+                    (radius,) * 3)
+
+    def solid_cube(self, size):
+        self.submit(self.mesh(('cube',), cube_mesh), (size,) * 3)
+
+    def solid_cone(self, base, height, slices, stacks):
+        aspect = base / height
+        self.submit(self.mesh(('cone', slices, aspect), lambda: cone_mesh(slices, aspect)), (base, base, height))
+
+    def solid_torus(self, inner, outer, sides, rings):
+        self.submit(self.mesh(('torus', inner, outer, sides, rings), lambda: torus_mesh(inner, outer, sides, rings)))
+
+    def begin(self, mode):
+        self.immediate = (mode, [])
+
+    def vertex(self, x, y, z):
+        self.immediate[1].append((x, y, z))
+
+    def end(self):
+        mode, points = self.immediate
+        self.immediate = None
+        if mode == GL_QUADS:
+            order = [q + k for q in range(0, len(points) - 3, 4) for k in (0, 1, 2, 0, 2, 3)]
+        elif mode == GL_TRIANGLE_FAN:
+            order = [k for i in range(1, len(points) - 1) for k in (0, i, i + 1)]
+        elif mode == GL_LINE_LOOP:
+            order = [k for i in range(len(points)) for k in (i, (i + 1) % len(points))]
+        else:
+            order = range(len(points))
+        primitive = GL_LINES if mode in (GL_LINES, GL_LINE_LOOP) else GL_TRIANGLES
+        width = self.current_line_width if primitive == GL_LINES else None
+        m = self.model
+        n = normal_columns(m)[6:9]
+        if self.blend:
+            stream = self.streams['blend']
+        else:
+            stream = self.streams.setdefault((primitive, width), array.array('f'))
+        first = len(stream) // 10
+        for k in order:
+            x, y, z = points[k]
+            stream.extend((m[0] * x + m[4] * y + m[8] * z + m[12],
+                           m[1] * x + m[5] * y + m[9] * z + m[13],
+                           m[2] * x + m[6] * y + m[10] * z + m[14]) + n + self.current_color)
+        if self.blend:
+            segment = ('stream', primitive, first, len(stream) // 10 - first)
+            self.items.append((segment, IDENTITY, IDENTITY_NORMALS, (1.0, 1.0, 1.0, 1.0), True, width))
+
+    def end_frame(self):
+        white = (1.0, 1.0, 1.0, 1.0)
+        groups = {}
+        blended = []
+        # Opaque streamed geometry is drawn as one range per primitive type
+        # and line width, blended ranges follow them in the same vertex buffer.
+        stream = array.array('f')
+        for key, data in self.streams.items():
+            if key != 'blend' and data:
+                primitive, width = key
+                segment = ('stream', primitive, len(stream) // 10, len(data) // 10)
+                groups[segment, width] = [(segment, IDENTITY, IDENTITY_NORMALS, white, False, width)]
+                stream.extend(data)
+        blend_base = len(stream) // 10
+        stream.extend(self.streams['blend'])
+        for item in self.items:
+            if item[4]:
+                mesh = item[0]
+                if mesh[0] == 'stream':
+                    item = (('stream', mesh[1], mesh[2] + blend_base, mesh[3]),) + item[1:]
+                blended.append(((item[0], item[5]), [item]))
+            else:
+                groups.setdefault((item[0], item[5]), []).append(item)
+        batches = []
+        instances = array.array('f')
+        for (mesh, width), items in list(groups.items()) + blended:
+            for start in range(0, len(items), self.max_instances):
+                chunk = items[start:start + self.max_instances]
+                pad = -len(instances) % self.ubo_alignment
+                instances.extend([0.0] * pad)
+                batches.append((mesh, len(instances) * 4, len(chunk), chunk[0][4], width))
+                for _, model, normals, color, _, _ in chunk:
+                    instances.extend(model)
+                    instances.extend(normals[0:3] + (0.0,) + normals[3:6] + (0.0,) + normals[6:9] + (0.0,))
+                    instances.extend(color)
+        glUseProgram(self.program)
+        glUniformMatrix4fv(self.view_location, 1, GL_FALSE, self.view)
+        glUniformMatrix4fv(self.projection_location, 1, GL_FALSE, perspective_matrix(fovY, ASPECT, 1.0, 3000.0))
+        glUniform3f(self.light_location, 0.0, 0.0, 1.0)
+        glVertexAttrib4f(2, 1.0, 1.0, 1.0, 1.0)
+        block_size = self.max_instances * self.instance_floats * 4
+        if instances:
+            # Pad so every bound range covers the whole declared block
+            instances.extend([0.0] * (block_size // 4))
+            glBindBuffer(GL_UNIFORM_BUFFER, self.ubo)
+            glBufferData(GL_UNIFORM_BUFFER, instances.tobytes(), GL_STREAM_DRAW)
+        if stream:
+            glBindBuffer(GL_ARRAY_BUFFER, self.stream_vbo)
+            glBufferData(GL_ARRAY_BUFFER, stream.tobytes(), GL_STREAM_DRAW)
+        line_width = 1.0
+        for mesh, offset, count, blend, width in batches:
+            if blend:
+                glEnable(GL_BLEND)
+                glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+            if width is not None and width != line_width:
+                line_width = width
+                glLineWidth(width)
+            glBindBufferRange(GL_UNIFORM_BUFFER, 0, self.ubo, offset, block_size)
+            if mesh[0] == 'stream':
+                glBindVertexArray(self.stream_vao)
+                glDrawArrays(mesh[1], mesh[2], mesh[3])
+            else:
+                vao, mode, vertex_count = mesh
+                glBindVertexArray(vao)
+                glDrawArraysInstanced(mode, 0, vertex_count, count)
+        glDisable(GL_BLEND)
+        if line_width != 1.0:
+            glLineWidth(1.0)
+        glBindVertexArray(0)
+        glUseProgram(0)
+        self.begin_frame()
+
+MERGEABLE_MODES = (GL_QUADS, GL_TRIANGLES, GL_LINES)
+
+def count_state_changes(items):
+    """Blend toggles, primitive switches and material changes needed to draw items in order"""
+    changes = 0
+    blend, primitive, color = False, None, None
+    for item in items:
+        changes += (item[0] != blend) + (item[1] != primitive) + (item[2] != color)
+        blend, primitive, color = item[0], item[1], item[2]
+    return changes
+
+class RenderQueue(MatrixStack):
+    """Collects a frame's draws and replays them, sorted, into another renderer.
+
+    Every item is keyed by (blend, primitive, material), the material being
+    the colour and line width.  Opaque items go first, sorted by primitive
+    and then material so that neighbours share state,
+    and consecutive glBegin blocks with the same mode, colour and transform
+    are merged.  Translucent items follow in submission order inside a single
+    blended batch.
+    """
+    def __init__(self, backend):
+        self.backend = backend
+        self.name = backend.name + '+queue'
+        self.look_at = backend.look_at
+        self.stats = {'items': 0, 'batches': 0, 'state_changes': 0, 'unsorted_state_changes': 0}
+        self.begin_frame()
+
+    def begin_frame(self):
+        self.reset_state()
+        self.items = []
+        self.immediate = None
+
+    def submit(self, primitive, args):
+        self.items.append((self.blend, primitive, (self.current_color, self.current_line_width),
+                           len(self.items), self.model, args))
+
+    def solid_sphere(self, radius, slices, stacks):
+        self.submit(('solid_sphere', slices, stacks), (radius, slices, stacks))
+
+    def wire_sphere(self, radius, slices, stacks):
+        self.submit(('wire_sphere', slices, stacks), (radius, slices, stacks))
+
+    def solid_cube(self, size):
+        self.submit(('solid_cube',), (size,))
+
+    def solid_cone(self, base, height, slices, stacks):
+        self.submit(('solid_cone', slices, stacks), (base, height, slices, stacks))
+
+    def solid_torus(self, inner, outer, sides, rings):
+        self.submit(('solid_torus', inner, outer, sides, rings), (inner, outer, sides, rings))
+
+    def begin(self, mode):
+        self.immediate = (mode, [])
+
+    def vertex(self, x, y, z):
+        self.immediate[1].append((x, y, z))
+
+    def end(self):
+        mode, points = self.immediate
+        self.immediate = None
+        # Loops and fans are rewritten as plain lines/triangles so they can merge
+        if mode == GL_LINE_LOOP:
+            mode, points = GL_LINES, [points[k] for i in range(len(points)) for k in (i, (i + 1) % len(points))]
+        elif mode == GL_TRIANGLE_FAN:
+            mode, points = GL_TRIANGLES, [points[k] for i in range(1, len(points) - 1) for k in (0, i, i + 1)]
+        self.submit(('immediate', mode), points)
+
+    @staticmethod
+    def sort_key(item):
+        if item[0]:
+            return (True, item[3])
+        return (False, item[1], item[2], item[3])
+
+    def end_frame(self):
+        items = sorted(self.items, key=self.sort_key)
+        backend = self.backend
+        color = None
+        line_width = 1.0
+        blend = False
+        batches = 0
+        i = 0
+        while i < len(items):
+            item_blend, primitive, (item_color, item_width), _, model, args = items[i]
+            if item_blend != blend:
+                blend = item_blend
+                if blend:
+                    backend.enable_blend()
+                else:
+                    backend.disable_blend()
+            if item_color != color:
+                color = item_color
+                backend.color_alpha(*color)
+            if item_width != line_width:
+                line_width = item_width
+                backend.line_width(line_width)
+            if model is not IDENTITY:
+                backend.push_matrix()
+                backend.mult_matrix(model)
+            if primitive[0] == 'immediate':
+                mode = primitive[1]
+                vertex = backend.vertex
+                backend.begin(mode)
+                for point in args:
+                    vertex(*point)
+                while (mode in MERGEABLE_MODES and i + 1 < len(items) and
+                       items[i + 1][:3] == items[i][:3] and items[i + 1][4] is model):
+                    i += 1
+                    for point in items[i][5]:
+                        vertex(*point)
+                backend.end()
+            else:
+                getattr(backend, primitive[0])(*args)
+            if model is not IDENTITY:
+                backend.pop_matrix()
+            batches += 1
+            i += 1
+        if blend:
+            backend.disable_blend()
+        if line_width != 1.0:
+            backend.line_width(1.0)
+        backend.end_frame()
+        self.stats = {
+            'items': len(items),
+            'batches': batches,
+            'state_changes': count_state_changes(items),
+            'unsorted_state_changes': count_state_changes(self.items),
+        }
+        self.begin_frame()
+
+gfx = FixedFunctionRenderer()
+
+# Detail settings from cheapest to full quality.  render_scale only applies
+# when the scene is drawn through SceneFramebuffer (--adaptive-resolution).
+QUALITY_LEVELS = [
+    {'name': 'minimal', 'ball_detail': 8, 'obstacle_detail': 6, 'projectile_detail': 4,
+     'foliage_detail': 4, 'small_foliage_detail': 4, 'glow': False, 'hud_interval': 0.5, 'render_scale': 0.5},
+    {'name': 'low', 'ball_detail': 12, 'obstacle_detail': 8, 'projectile_detail': 5,
+     'foliage_detail': 6, 'small_foliage_detail': 5, 'glow': False, 'hud_interval': 0.25, 'render_scale': 0.7},
+    {'name': 'medium', 'ball_detail': 20, 'obstacle_detail': 12, 'projectile_detail': 6,
+     'foliage_detail': 8, 'small_foliage_detail': 6, 'glow': True, 'hud_interval': 0.1, 'render_scale': 0.85},
+    {'name': 'high', 'ball_detail': 32, 'obstacle_detail': 16, 'projectile_detail': 8,
+     'foliage_detail': 12, 'small_foliage_detail': 8, 'glow': True, 'hud_interval': 0.0, 'render_scale': 1.0},
+]
+quality = QUALITY_LEVELS[-1]
+
+class QualityGovernor:
+    """Steps QUALITY_LEVELS up or down to keep frame times inside a budget.
+
+    Averages are taken over a full window of frames.  Dropping a level needs
+    the average to exceed the budget by 15%, raising one needs it to stay
+    below 70% of the budget for several windows in a row, and nothing moves
+    during the cooldown after a change, so the level does not oscillate.
+    """
+    def __init__(self, budget, window=30, cooldown=1.0, upgrade_windows=3):
+        self.budget = budget
+        self.samples = collections.deque(maxlen=window)
+        self.cooldown = cooldown
+        self.upgrade_windows = upgrade_windows
+        self.level = len(QUALITY_LEVELS) - 1
+        self.last_change = 0.0
+        self.calm_windows = 0
+        self.history = []
+
+    def observe(self, frame_time, now):
+        global quality
+        self.samples.append(frame_time)
+        if len(self.samples) < self.samples.maxlen or now - self.last_change < self.cooldown:
+            return
+        average = sum(self.samples) / len(self.samples)
+        self.samples.clear()
+        step = 0
+        if average > self.budget * 1.15 and self.level > 0:
+            step = -1
+        elif average < self.budget * 0.7 and self.level < len(QUALITY_LEVELS) - 1:
+            self.calm_windows += 1
+            if self.calm_windows >= self.upgrade_windows:
+                step = 1
+        else:
+            self.calm_windows = 0
+        if step:
+            self.level += step
+            self.calm_windows = 0
+            self.last_change = now
+            quality = QUALITY_LEVELS[self.level]
+            self.history.append((now, quality['name'], average))
+            print(f" Quality -> {quality['name']} (average frame {1000 * average:.1f} ms)")
+
+    def report(self):
+        return dict(quality, budget_ms=1000 * self.budget, changes=len(self.history))
+
+class SceneFramebuffer:
+    """Offscreen target for drawing the 3D scene below window resolution"""
+    def __init__(self):
+        self.fbo = glGenFramebuffers(1)
+        self.color, self.depth = glGenRenderbuffers(2)
+        self.size = None
+
+    def bind(self, width, height):
+        glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+        if self.size != (width, height):
+            glBindRenderbuffer(GL_RENDERBUFFER, self.color)
+            glRenderbufferStorage(GL_RENDERBUFFER, GL_RGBA8, width, height)
+            glBindRenderbuffer(GL_RENDERBUFFER, self.depth)
+            glRenderbufferStorage(GL_RENDERBUFFER, GL_DEPTH_COMPONENT24, width, height)
+            glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_RENDERBUFFER, self.color)
+            glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_DEPTH_ATTACHMENT, GL_RENDERBUFFER, self.depth)
+            self.size = (width, height)
+        glViewport(0, 0, width, height)
+
+    def resolve(self):
+        width, height = self.size
+        glBindFramebuffer(GL_READ_FRAMEBUFFER, self.fbo)
+        glBindFramebuffer(GL_DRAW_FRAMEBUFFER, 0)
+        glBlitFramebuffer(0, 0, width, height, 0, 0, WINDOW_WIDTH, WINDOW_HEIGHT, GL_COLOR_BUFFER_BIT, GL_LINEAR)
+        glBindFramebuffer(GL_FRAMEBUFFER, 0)
+        glViewport(0, 0, WINDOW_WIDTH, WINDOW_HEIGHT)
+
+governor = None
+scene_framebuffer = None
 
 def draw_text(x, y, text, font=GLUT_BITMAP_HELVETICA_18):
     glColor3f(1, 1, 1)
@@ -92,9 +867,9 @@ def draw_text(x, y, text, font=GLUT_BITMAP_HELVETICA_18):
 
 def update_bounce_timer():
     global bounce_timer, bounce_time_limit, lives, game_over, ball_pos, ball_vel, shield_active, shield_duration, max_shield_duration
+    global death_cause
     bounce_time_limit = max(3.0, base_bounce_time - (current_round - 1))
-    current_time = time.time()
-    bounce_timer = current_time - last_bounce_time
+    bounce_timer = clock.now - last_bounce_time
     if bounce_timer >= bounce_time_limit:
         if shield_active:
             shield_active = False
@@ -102,6 +877,7 @@ def update_bounce_timer():
             reset_bounce_timer()
         else:
             lives -= 1
+            death_cause = DEATH_CAUSES.index('bounce_timer')
             if lives <= 0:
                 game_over = True
                 return
@@ -116,7 +892,7 @@ def update_bounce_timer():
 def reset_bounce_timer():
     global bounce_timer, last_bounce_time
     bounce_timer = 0.0
-    last_bounce_time = time.time()
+    last_bounce_time = clock.now
 
 def initialize_zones():
     global zones
@@ -132,16 +908,104 @@ def initialize_zones():
                     else:
                         zones['normal'].append((i, j))
 
+class LayoutValidator:
+    """Connectivity checks for hole layouts, done on bitsets.
+
+    A layout is one Python int with bit i * grid_size_y + j per tile;
+    snapshots store the same bitset as bytes through tiles_to_mask().  Flood filling is a handful of shifts and
+    masks per step over the whole grid instead of a per-tile search, which
+    is fast enough to screen thousands of candidate layouts per second.
+    """
+
+    def __init__(self, width=grid_size_x, height=grid_size_y):
+        self.width = width
+        self.height = height
+        self.full = (1 << (width * height)) - 1
+        column_bottom = sum(1 << (i * height) for i in range(width))
+        # Shifting by one moves along a column; these stop it wrapping into the next one
+        self.not_bottom = self.full & ~column_bottom
+        self.not_top = self.full & ~(column_bottom << (height - 1))
+
+    def bit(self, tile):
+        return 1 << (tile[0] * self.height + tile[1])
+
+    def mask(self, tiles):
+        mask = 0
+        for tile in tiles:
+            mask |= self.bit(tile)
+        return mask
+
+    def tiles(self, mask):
+        tiles = []
+        while mask:
+            low = mask & -mask
+            index = low.bit_length() - 1
+            tiles.append(divmod(index, self.height))
+            mask ^= low
+        return tiles
+
+    def grow(self, mask):
+        """The mask plus its four-way neighbours"""
+        height = self.height
+        return (mask | (mask << 1) & self.not_bottom | (mask >> 1) & self.not_top
+                | (mask << height) & self.full | mask >> height)
+
+    def reachable(self, open_mask, start):
+        """Every open tile connected to the start bits"""
+        reach = start & open_mask
+        while True:
+            grown = self.grow(reach) & open_mask
+            if grown == reach:
+                return reach
+            reach = grown
+
+    def check(self, hole_mask, spawn, targets=None):
+        """True if the spawn tile is open and reaches every target (all open tiles by default)"""
+        open_mask = self.full & ~hole_mask
+        if targets is None:
+            targets = open_mask
+        if targets & hole_mask or not self.bit(spawn) & open_mask:
+            return False
+        return self.reachable(open_mask, self.bit(spawn)) & targets == targets
+
+    def repair(self, hole_mask, spawn, targets=None):
+        """Fill in the fewest obvious holes so the layout passes check()
+
+        Each pass opens the hole on the edge of the reachable area closest
+        to a cut-off target, so the result stays close to the original.
+        """
+        hole_mask &= ~self.bit(spawn)
+        if targets is not None:
+            hole_mask &= ~targets
+        while True:
+            open_mask = self.full & ~hole_mask
+            reach = self.reachable(open_mask, self.bit(spawn))
+            missing = (open_mask if targets is None else targets) & ~reach
+            if not missing:
+                return hole_mask
+            border = self.tiles(self.grow(reach) & hole_mask)
+            cut_off = self.tiles(missing)
+            best = min(border, key=lambda tile: min(abs(tile[0] - i) + abs(tile[1] - j) for i, j in cut_off))
+            hole_mask &= ~self.bit(best)
+
+layout_validator = LayoutValidator()
+start_tile = (0, 0)
+
+def random_holes(count, rng=random):
+    """A candidate hole mask of `count` interior tiles"""
+    interior = [(i, j) for i in range(1, grid_size_x - 1) for j in range(1, grid_size_y - 1)]
+    return layout_validator.mask(rng.sample(interior, min(count, len(interior))))
+
 def generate_holes():
     global holes
-    holes = set()
     hole_count = min(20 + current_round * 15, 80)
-    while len(holes) < hole_count:
-        i = random.randint(1, grid_size_x - 2)
-        j = random.randint(1, grid_size_y - 2)
-        holes.add((i, j))
+    mask = layout_validator.repair(random_holes(hole_count), start_tile)
+    holes = set(layout_validator.tiles(mask))
 
 def find_safe_tile():
+    if layout_placements:
+        i, j = layout_placements.popleft()
+        return (i * tile_size - half_size_x + tile_size / 2, j * tile_size - half_size_y + tile_size / 2)
     attempts = 0
     while attempts < 100:
         i = random.randint(0, grid_size_x - 1)
@@ -149,9 +1013,16 @@ def find_safe_tile():
         if (i, j) not in holes:
             x = i * tile_size - half_size_x + tile_size / 2
             y = j * tile_size - half_size_y + tile_size / 2
+            if placement_log is not None:
+                placement_log.append((i, j))
             return (x, y)
         attempts += 1
-    return (0, 0)
+    # Fall back to the tile under the origin, placed at its centre like any
+    # other so that a layout library replays the same position
+    tile = tile_of((0, 0))
+    if placement_log is not None:
+        placement_log.append(tile)
+    return tile_center(tile)
 
 def find_safe_start_tile():
     for i in range(grid_size_x):
@@ -247,7 +1118,7 @@ def generate_small_obstacle_trees():
 
 def update_tree_obstacles(dt):
     global projectiles
-    current_time = time.time()
+    current_time = clock.hazard_now
     for tree in tree_obstacles:
         if current_time - tree['last_shot_time'] >= tree['shoot_interval']:
             tree['last_shot_time'] = current_time
@@ -260,7 +1131,7 @@ def update_tree_obstacles(dt):
 
 def update_small_obstacle_trees(dt):
     global projectiles
-    current_time = time.time()
+    current_time = clock.hazard_now
     for tree in small_obstacle_trees:
         if current_time - tree['last_shot_time'] >= tree['shoot_interval']:
             tree['last_shot_time'] = current_time
@@ -323,60 +1194,60 @@ def draw_tree_obstacles():
     for tree in tree_obstacles:
         tx, ty = tree['pos'][:2]
         if tree['shooting_pattern'] == 'one_side':
-            glColor3f(0.4, 0.2, 0.1)
+            gfx.color(0.4, 0.2, 0.1)
         elif tree['shooting_pattern'] == 'two_sides':
-            glColor3f(0.6, 0.3, 0.1)
+            gfx.color(0.6, 0.3, 0.1)
         else:
-            glColor3f(0.8, 0.2, 0.1)
-        glPushMatrix()
-        glTranslatef(tx, ty, 20)
-        glScalef(8, 8, 40)
-        glutSolidCube(1)
-        glPopMatrix()
+            gfx.color(0.8, 0.2, 0.1)
+        gfx.push_matrix()
+        gfx.translate(tx, ty, 20)
+        gfx.scale(8, 8, 40)
+        gfx.solid_cube(1)
+        gfx.pop_matrix()
         if tree['shooting_pattern'] == 'all_sides':
-            pulse = 0.5 + 0.5 * math.sin(time.time() * 3)
-            glColor3f(pulse, 0.1, 0.1)
+            pulse = 0.5 + 0.5 * math.sin(clock.now * 3)
+            gfx.color(pulse, 0.1, 0.1)
         elif tree['shooting_pattern'] == 'two_sides':
-            glColor3f(0.6, 0.4, 0.1)
+            gfx.color(0.6, 0.4, 0.1)
         else:
-            glColor3f(0.0, 0.5, 0.0)
-        glPushMatrix()
-        glTranslatef(tx, ty, 50)
-        glutSolidCone(20, 50, 12, 12)
-        glPopMatrix()
+            gfx.color(0.0, 0.5, 0.0)
+        gfx.push_matrix()
+        gfx.translate(tx, ty, 50)
+        gfx.solid_cone(20, 50, quality['foliage_detail'], quality['foliage_detail'])
+        gfx.pop_matrix()
 
 def draw_small_obstacle_trees():
     for tree in small_obstacle_trees:
         tx, ty = tree['pos'][:2]
-        glColor3f(0.5, 0.25, 0.1)
-        glPushMatrix()
-        glTranslatef(tx, ty, 10)
-        glScalef(4, 4, 15)
-        glutSolidCube(1)
-        glPopMatrix()
+        gfx.color(0.5, 0.25, 0.1)
+        gfx.push_matrix()
+        gfx.translate(tx, ty, 10)
+        gfx.scale(4, 4, 15)
+        gfx.solid_cube(1)
+        gfx.pop_matrix()
         if tree['shooting_pattern'] == 'all_sides':
-            pulse = 0.5 + 0.5 * math.sin(time.time() * 3)
-            glColor3f(pulse, 0.1, 0.1)
+            pulse = 0.5 + 0.5 * math.sin(clock.now * 3)
+            gfx.color(pulse, 0.1, 0.1)
         elif tree['shooting_pattern'] == 'two_sides':
-            glColor3f(0.6, 0.4, 0.1)
+            gfx.color(0.6, 0.4, 0.1)
         else:
-            glColor3f(0.0, 0.5, 0.0)
-        glPushMatrix()
-        glTranslatef(tx, ty, 22)
-        glutSolidCone(10, 20, 8, 8)
-        glPopMatrix()
+            gfx.color(0.0, 0.5, 0.0)
+        gfx.push_matrix()
+        gfx.translate(tx, ty, 22)
+        gfx.solid_cone(10, 20, quality['small_foliage_detail'], quality['small_foliage_detail'])
+        gfx.pop_matrix()
 
 def draw_projectiles():
     for proj in projectiles:
-        glPushMatrix()
-        glTranslatef(proj['pos'][0], proj['pos'][1], proj['pos'][2])
+        gfx.push_matrix()
+        gfx.translate(proj['pos'][0], proj['pos'][1], proj['pos'][2])
         age_ratio = proj['life_time'] / proj['max_life']
         if current_round >= 5:
-            glColor3f(1.0, 0.2 - age_ratio * 0.1, 0.1)
+            gfx.color(1.0, 0.2 - age_ratio * 0.1, 0.1)
         else:
-            glColor3f(0.8 + age_ratio * 0.2, 0.4 - age_ratio * 0.3, 0.1)
-        glutSolidSphere(proj['size'], 8, 8)
-        glPopMatrix()
+            gfx.color(0.8 + age_ratio * 0.2, 0.4 - age_ratio * 0.3, 0.1)
+        gfx.solid_sphere(proj['size'], quality['projectile_detail'], quality['projectile_detail'])
+        gfx.pop_matrix()
 
 def generate_collectibles():
     global collectibles, special_collectibles
@@ -416,22 +1287,147 @@ def generate_shields():
             'rotation': 0.0
         })
 
+def generate_layout():
+    """Holes, zones and everything placed on them for the current round"""
+    global layout_placements
+    if layout_library is not None:
+        seed = layout_seed if layout_seed is not None else random.getrandbits(32)
+        layout_library.apply(current_round, seed)
+    else:
+        generate_holes()
+        initialize_zones()
+    generate_obstacles()
+    generate_tree_obstacles()
+    generate_boundary_trees()
+    generate_collectibles()
+    generate_shields()
+    generate_small_obstacle_trees()
+    layout_placements = None
+    if gc_freeze_layouts:
+        # Everything built so far lives for the whole round: keep it out of
+        # the collector's scans, after clearing cycles left by the last round
+        import gc
+        gc.unfreeze()
+        gc.collect()
+        gc.freeze()
+
+def zones_from_danger(danger):
+    danger_set = set(danger)
+    zones = {'safe': [], 'normal': [], 'danger': list(danger)}
+    for i in range(grid_size_x):
+        for j in range(grid_size_y):
+            if (i, j) not in holes and (i, j) not in danger_set:
+                zones['safe' if (i + j) % 2 == 0 else 'normal'].append((i, j))
+    return zones
+
+# Layout library: a header, then `per_round` fixed-size records for each round
+# in turn.  A record holds the hole and danger tile masks and the tiles that
+# find_safe_tile() hands out, in the order the generators ask for them, as
+# i * grid_size_y + j.  Entity attributes are still rolled at runtime.
+LAYOUT_MAGIC = b'TTL1'
+layout_header = struct.Struct('<4sHHHHI')  # magic, grid x, grid y, rounds, tile capacity, records per round
+
+def layout_record(capacity):
+    return struct.Struct('<%ds%dsH%dH' % (grid_mask_bytes, grid_mask_bytes, capacity))
+
+class LayoutLibrary:
+    """Pregenerated round layouts read in place from a memory-mapped file.
+
+    Picking a layout is one struct unpack at a computed offset, so round
+    transitions cost the same whatever the layout, and a seed selects the
+    same record on every machine.
+    """
+
+    def __init__(self, path):
+        import mmap
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, size_x, size_y, self.rounds, capacity, self.per_round = layout_header.unpack_from(self.map, 0)
+        if magic != LAYOUT_MAGIC:
+            raise ValueError(f"{path} is not a layout library")
+        if (size_x, size_y) != (grid_size_x, grid_size_y):
+            raise ValueError(f"{path} was built for a {size_x}x{size_y} grid")
+        self.record = layout_record(capacity)
+
+    def __len__(self):
+        return self.rounds * self.per_round
+
+    def lookup(self, round_number, seed):
+        index = (min(round_number, self.rounds) - 1) * self.per_round + seed % self.per_round
+        hole_bytes, danger_bytes, count, *tiles = self.record.unpack_from(
+            self.map, layout_header.size + index * self.record.size)
+        return (mask_to_tiles(hole_bytes), mask_to_tiles(danger_bytes),
+                [divmod(tile, grid_size_y) for tile in tiles[:count]])
+
+    def apply(self, round_number, seed):
+        global holes, zones, layout_placements
+        hole_tiles, danger, placements = self.lookup(round_number, seed)
+        holes = set(hole_tiles)
+        zones = zones_from_danger(danger)
+        layout_placements = collections.deque(placements)
+
+    def close(self):
+        self.map.close()
+
+def build_layout_library(path, per_round, seed=0):
+    """Generate, validate and write `per_round` layouts for every round"""
+    global current_round, placement_log, layout_placements
+    rng = random.Random(seed)
+    state = random.getstate()
+    saved_round = current_round
+    layouts = []
+    rejected = 0
+    start = time.perf_counter()
+    try:
+        for round_number in range(1, max_rounds + 1):
+            current_round = round_number
+            built = 0
+            while built < per_round:
+                random.seed(rng.getrandbits(64))
+                placement_log = []
+                layout_placements = None
+                generate_holes()
+                initialize_zones()
+                generate_obstacles()
+                generate_tree_obstacles()
+                generate_collectibles()
+                generate_shields()
+                generate_small_obstacle_trees()
+                hole_mask = layout_validator.mask(holes)
+                if not layout_validator.check(hole_mask, start_tile, layout_validator.mask(placement_log)):
+                    rejected += 1
+                    continue
+                layouts.append((hole_mask, layout_validator.mask(zones['danger']), placement_log))
+                built += 1
+    finally:
+        placement_log = None
+        current_round = saved_round
+        random.setstate(state)
+    capacity = max(len(tiles) for _, _, tiles in layouts)
+    record = layout_record(capacity)
+    with open(path, 'wb') as f:
+        f.write(layout_header.pack(LAYOUT_MAGIC, grid_size_x, grid_size_y, max_rounds, capacity, per_round))
+        for hole_mask, danger_mask, tiles in layouts:
+            indices = [i * grid_size_y + j for i, j in tiles]
+            f.write(record.pack(hole_mask.to_bytes(grid_mask_bytes, 'little'),
+                                danger_mask.to_bytes(grid_mask_bytes, 'little'),
+                                len(indices), *indices, *[0] * (capacity - len(indices))))
+    elapsed = time.perf_counter() - start
+    print(f" Wrote {len(layouts)} layouts ({record.size} bytes each) to {path} "
+          f"in {elapsed:.1f}s, {rejected} rejected")
+
 def advance_round():
     global current_round, score, speed_multiplier, obstacle_speed_multiplier, max_tile_time, bounce_time_limit
+    global layout_version
     if current_round < max_rounds:
         current_round += 1
+        layout_version += 1
         new_bounce_limit = max(3.0, base_bounce_time - (current_round - 1))
         speed_multiplier += 0.15
         obstacle_speed_multiplier += 0.25
         max_tile_time = max(0.8, max_tile_time * 0.85)
-        generate_holes()
-        initialize_zones()
-        generate_obstacles()
-        generate_tree_obstacles()
-        generate_boundary_trees()
-        generate_collectibles()
-        generate_shields()
-        generate_small_obstacle_trees()
+        clock.hazard_scale = 1.0
+        generate_layout()
         score = 0
         reset_bounce_timer()
 
@@ -442,11 +1438,12 @@ def update_round_progression():
 
 def reset_game(reset_score=True, reset_lives=True):
     global ball_pos, ball_vel, jumping, jump_start_time, score, lives, game_over, game_won
-    global collectibles, special_collectibles, time_last, obstacles, last_tile, time_on_tile
+    global collectibles, special_collectibles, obstacles, last_tile, time_on_tile
     global show_timer, difficulty_timer, difficulty_mode, speed_multiplier, game_start_time
     global shield_active, shield_duration, difficulty_level, game_paused, tree_obstacles, projectiles
     global obstacle_speed_multiplier, max_shield_duration, current_round, boundary_trees
-    global bounce_timer, bounce_time_limit, last_bounce_time, small_obstacle_trees
+    global bounce_timer, bounce_time_limit, last_bounce_time, small_obstacle_trees, layout_version
+    layout_version += 1
     ball_pos[:] = find_safe_start_tile()
     ball_vel[:] = [0.0, 0.0, 0.0]
     jumping = False
@@ -460,8 +1457,9 @@ def reset_game(reset_score=True, reset_lives=True):
     game_over = False
     game_won = False
     game_paused = False
-    time_last = time.time()
-    game_start_time = time.time()
+    clock.paused = False
+    clock.hazard_scale = 1.0
+    game_start_time = clock.now
     last_tile = None
     time_on_tile = 0.0
     show_timer = False
@@ -474,7 +1472,7 @@ def reset_game(reset_score=True, reset_lives=True):
     max_tile_time = 3.0
     bounce_timer = 0.0
     bounce_time_limit = base_bounce_time
-    last_bounce_time = time.time()
+    last_bounce_time = clock.now
     obstacles.clear()
     tree_obstacles.clear()
     boundary_trees.clear()
@@ -483,16 +1481,1109 @@ def reset_game(reset_score=True, reset_lives=True):
     special_collectibles.clear()
     shields.clear()
     small_obstacle_trees.clear()
-    generate_holes()
-    initialize_zones()
-    generate_obstacles()
-    generate_tree_obstacles()
-    generate_boundary_trees()
-    generate_collectibles()
-    generate_shields()
-    generate_small_obstacle_trees()
+    generate_layout()
+    snapshot_ring.clear()
+
+# Snapshot format: a fixed header followed by one packed record per entity.
+# Absolute timestamps are stored as ages so a snapshot can be restored later.
+SNAPSHOT_MAGIC = b'TTS1'
+SNAPSHOT_DUMP_MAGIC = b'TTR1'
+obstacle_patterns = ['oscillate', 'circle', 'figure8', 'zigzag']
+shooting_patterns = ['one_side', 'two_sides', 'all_sides']
+collectible_types = ['cube', 'torus', 'pyramid']
+special_effects = ['speed_boost', 'slow_time', 'extra_life', 'shield', 'score_multiplier']
+snap_header = struct.Struct('<4s18d6i8H')
+snap_obstacle = struct.Struct('<16dB')
+snap_tree = struct.Struct('<6dB')
+snap_projectile = struct.Struct('<9d')
+snap_collectible = struct.Struct('<5dBB')
+snap_special = struct.Struct('<5dBB')
+snap_shield = struct.Struct('<4dB')
+snap_dump_entry = struct.Struct('<IdI')
+grid_mask_bytes = (grid_size_x * grid_size_y + 7) // 8
+
+def tiles_to_mask(tiles):
+    """layout_validator's bitset for tiles as little-endian bytes"""
+    return layout_validator.mask(tiles).to_bytes(grid_mask_bytes, 'little')
+
+def mask_to_tiles(data):
+    return layout_validator.tiles(int.from_bytes(data, 'little') & layout_validator.full)
+
+def take_snapshot():
+    now = clock.now
+    all_trees = (tree_obstacles, boundary_trees, small_obstacle_trees)
+    size = (snap_header.size + 2 * grid_mask_bytes +
+            snap_obstacle.size * len(obstacles) +
+            snap_tree.size * sum(len(trees) for trees in all_trees) +
+            snap_projectile.size * len(projectiles) +
+            snap_collectible.size * len(collectibles) +
+            snap_special.size * len(special_collectibles) +
+            snap_shield.size * len(shields))
+    buf = bytearray(size)
+    flags = (jumping | game_over << 1 | game_won << 2 | show_timer << 3 | shield_active << 4 |
+             game_paused << 5)
+    tile_i, tile_j = last_tile if last_tile is not None else (-1, -1)
+    snap_header.pack_into(buf, 0, SNAPSHOT_MAGIC,
+        ball_pos[0], ball_pos[1], ball_pos[2], ball_vel[0], ball_vel[1], ball_vel[2],
+        now - jump_start_time, time_on_tile, max_tile_time, bounce_timer, bounce_time_limit,
+        now - last_bounce_time, now - game_start_time, shield_duration, max_shield_duration,
+        speed_multiplier, obstacle_speed_multiplier, clock.hazard_scale,
+        score, lives, current_round, tile_i, tile_j, flags,
+        len(obstacles), len(tree_obstacles), len(boundary_trees), len(small_obstacle_trees),
+        len(projectiles), len(collectibles), len(special_collectibles), len(shields))
+    offset = snap_header.size
+    buf[offset:offset + grid_mask_bytes] = tiles_to_mask(holes)
+    offset += grid_mask_bytes
+    buf[offset:offset + grid_mask_bytes] = tiles_to_mask(zones['danger'])
+    offset += grid_mask_bytes
+    for o in obstacles:
+        snap_obstacle.pack_into(buf, offset, o['pos'][0], o['pos'][1], o['pos'][2],
+            o['base_size'], o['current_size'], o['vel'], o['shrink_speed'], o['min_size'],
+            o['float_height'], o['float_speed'], o['float_offset'], o['pulse'],
+            o['pattern_time'], o['original_pos'][0], o['original_pos'][1],
+            o['aggressiveness'], obstacle_patterns.index(o['pattern']))
+        offset += snap_obstacle.size
+    for trees in all_trees:
+        for tree in trees:
+            snap_tree.pack_into(buf, offset, tree['pos'][0], tree['pos'][1], tree['pos'][2],
+                clock.hazard_now - tree['last_shot_time'], tree['shoot_interval'], tree['projectile_speed'],
+                shooting_patterns.index(tree['shooting_pattern']))
+            offset += snap_tree.size
+    for proj in projectiles:
+        snap_projectile.pack_into(buf, offset, proj['pos'][0], proj['pos'][1], proj['pos'][2],
+            proj['vel'][0], proj['vel'][1], proj['vel'][2],
+            proj['life_time'], proj['max_life'], proj['size'])
+        offset += snap_projectile.size
+    for c in collectibles:
+        snap_collectible.pack_into(buf, offset, c['pos'][0], c['pos'][1], c['pos'][2],
+            c['rotation'], c['float_offset'], collectible_types.index(c['type']), c['collected'])
+        offset += snap_collectible.size
+    for sc in special_collectibles:
+        snap_special.pack_into(buf, offset, sc['pos'][0], sc['pos'][1], sc['pos'][2],
+            sc['glow'], sc['rotation'], special_effects.index(sc['effect']), sc['collected'])
+        offset += snap_special.size
+    for shield in shields:
+        snap_shield.pack_into(buf, offset, shield['pos'][0], shield['pos'][1], shield['pos'][2],
+            shield['rotation'], shield['collected'])
+        offset += snap_shield.size
+    return bytes(buf)
+
+def unpack_records(layout, data, offset, count):
+    end = offset + layout.size * count
+    return list(layout.iter_unpack(data[offset:end])), end
+
+def restore_snapshot(data):
+    global jumping, jump_start_time, score, lives, game_over, game_won, last_tile, time_on_tile
+    global show_timer, max_tile_time, bounce_timer, bounce_time_limit, last_bounce_time
+    global game_start_time, shield_active, shield_duration, max_shield_duration, game_paused
+    global speed_multiplier, obstacle_speed_multiplier, current_round, holes, zones, layout_version
+    header = snap_header.unpack_from(data, 0)
+    if header[0] != SNAPSHOT_MAGIC:
+        raise ValueError("not a Tile Tumble snapshot")
+    now = clock.now
+    (ball_pos[0], ball_pos[1], ball_pos[2], ball_vel[0], ball_vel[1], ball_vel[2],
+     jump_age, time_on_tile, max_tile_time, bounce_timer, bounce_time_limit,
+     bounce_age, elapsed, shield_duration, max_shield_duration,
+     speed_multiplier, obstacle_speed_multiplier, clock.hazard_scale) = header[1:19]
+    score, lives, current_round, tile_i, tile_j, flags = header[19:25]
+    counts = header[25:]
+    jump_start_time = now - jump_age
+    last_bounce_time = now - bounce_age
+    game_start_time = now - elapsed
+    last_tile = (tile_i, tile_j) if tile_i >= 0 else None
+    jumping = bool(flags & 1)
+    game_over = bool(flags & 2)
+    game_won = bool(flags & 4)
+    show_timer = bool(flags & 8)
+    shield_active = bool(flags & 16)
+    game_paused = bool(flags & 32)
+
+    offset = snap_header.size
+    restored_holes = set(mask_to_tiles(data[offset:offset + grid_mask_bytes]))
+    offset += grid_mask_bytes
+    danger = mask_to_tiles(data[offset:offset + grid_mask_bytes])
+    offset += grid_mask_bytes
+    # Most restores (rewind, the threaded and network renderers) land on the
+    # layout already shown; only a different one invalidates cached geometry
+    if restored_holes != holes or set(danger) != set(zones['danger']):
+        holes = restored_holes
+        zones = zones_from_danger(danger)
+        layout_version += 1
+
+    records, offset = unpack_records(snap_obstacle, data, offset, counts[0])
+    obstacles[:] = [{
+        'pos': [r[0], r[1], r[2]],
+        'base_size': r[3],
+        'current_size': r[4],
+        'vel': r[5],
+        'shrink_speed': r[6],
+        'min_size': r[7],
+        'float_height': r[8],
+        'float_speed': r[9],
+        'float_offset': r[10],
+        'pulse': r[11],
+        'pattern': obstacle_patterns[r[16]],
+        'pattern_time': r[12],
+        'original_pos': [r[13], r[14]],
+        'aggressiveness': r[15]
+    } for r in records]
+    for trees, count in zip((tree_obstacles, boundary_trees, small_obstacle_trees), counts[1:4]):
+        records, offset = unpack_records(snap_tree, data, offset, count)
+        trees[:] = [{
+            'pos': [r[0], r[1], r[2]],
+            'shooting_pattern': shooting_patterns[r[6]],
+            'last_shot_time': clock.hazard_now - r[3],
+            'shoot_interval': r[4],
+            'projectile_speed': r[5]
+        } for r in records]
+    records, offset = unpack_records(snap_projectile, data, offset, counts[4])
+    projectiles[:] = [{
+        'pos': [r[0], r[1], r[2]],
+        'vel': [r[3], r[4], r[5]],
+        'life_time': r[6],
+        'max_life': r[7],
+        'size': r[8]
+    } for r in records]
+    records, offset = unpack_records(snap_collectible, data, offset, counts[5])
+    collectibles[:] = [{
+        'type': collectible_types[r[5]],
+        'pos': [r[0], r[1], r[2]],
+        'rotation': r[3],
+        'collected': bool(r[6]),
+        'float_offset': r[4]
+    } for r in records]
+    records, offset = unpack_records(snap_special, data, offset, counts[6])
+    special_collectibles[:] = [{
+        'pos': [r[0], r[1], r[2]],
+        'effect': special_effects[r[5]],
+        'collected': bool(r[6]),
+        'glow': r[3],
+        'rotation': r[4]
+    } for r in records]
+    records, offset = unpack_records(snap_shield, data, offset, counts[7])
+    shields[:] = [{
+        'pos': [r[0], r[1], r[2]],
+        'collected': bool(r[4]),
+        'rotation': r[3]
+    } for r in records]
+
+def xor_bytes(a, b):
+    return (int.from_bytes(a, 'little') ^ int.from_bytes(b, 'little')).to_bytes(len(a), 'little')
+
+class SnapshotRing:
+    """Keeps the last few seconds of snapshots for rewind and desync debugging.
+
+    Every keyframe_interval-th entry is stored whole.  The ones in between are
+    XORed against that keyframe and zlib-compressed, which leaves very little
+    since only a handful of fields move from one tick to the next.
+    """
+    def __init__(self, seconds=5.0, rate=30, keyframe_interval=15):
+        self.capacity = max(2, int(seconds * rate))
+        self.interval = 1.0 / rate
+        self.keyframe_interval = keyframe_interval
+        self.entries = collections.deque(maxlen=self.capacity)
+        self.clear()
+
+    def clear(self):
+        self.entries.clear()
+        self.frame = 0
+        self.last_record = 0.0
+        self.keyframe = None
+        self.since_keyframe = 0
+
+    def due(self, now):
+        return now - self.last_record >= self.interval
+
+    def record(self, now, data):
+        self.last_record = now
+        self.frame += 1
+        key = self.keyframe
+        if key is None or self.since_keyframe >= self.keyframe_interval or len(key) != len(data):
+            self.keyframe = data
+            self.since_keyframe = 0
+            self.entries.append((self.frame, now, None, data))
+        else:
+            self.since_keyframe += 1
+            self.entries.append((self.frame, now, key, zlib.compress(xor_bytes(data, key), 1)))
+
+    def decode(self, entry):
+        frame, stamp, key, payload = entry
+        if key is None:
+            return payload
+        return xor_bytes(zlib.decompress(payload), key)
+
+    def rewind(self, seconds, now):
+        """Drop everything newer than `seconds` ago and return that snapshot"""
+        if not self.entries:
+            return None
+        target = now - seconds
+        while len(self.entries) > 1 and self.entries[-1][1] > target:
+            self.entries.pop()
+        entry = self.entries[-1]
+        self.keyframe = None
+        self.last_record = now
+        return self.decode(entry)
+
+    def memory_used(self):
+        return sum(len(entry[3]) for entry in self.entries)
+
+    def dump(self, path):
+        with open(path, 'wb') as f:
+            f.write(SNAPSHOT_DUMP_MAGIC)
+            f.write(struct.pack('<I', len(self.entries)))
+            for entry in self.entries:
+                data = self.decode(entry)
+                f.write(snap_dump_entry.pack(entry[0], entry[1], len(data)))
+                f.write(data)
+
+def load_snapshot_dump(path):
+    """Read back a file written by SnapshotRing.dump as (frame, timestamp, snapshot) tuples"""
+    with open(path, 'rb') as f:
+        if f.read(4) != SNAPSHOT_DUMP_MAGIC:
+            raise ValueError("not a Tile Tumble snapshot dump")
+        count, = struct.unpack('<I', f.read(4))
+        result = []
+        for _ in range(count):
+            frame, stamp, length = snap_dump_entry.unpack(f.read(snap_dump_entry.size))
+            result.append((frame, stamp, f.read(length)))
+        return result
+
+snapshot_ring = SnapshotRing()
+rewind_seconds = 2.0
+
+def record_snapshot():
+    now = clock.now
+    if snapshot_ring.due(now):
+        snapshot_ring.record(now, take_snapshot())
+
+def rewind_game():
+    data = snapshot_ring.rewind(rewind_seconds, clock.now)
+    if data is not None:
+        restore_snapshot(data)
+        print(f" Rewound to snapshot {snapshot_ring.entries[-1][0]}")
+
+def dump_snapshots():
+    path = time.strftime("snapshots_%Y%m%d_%H%M%S.bin")
+    snapshot_ring.dump(path)
+    print(f" Saved {len(snapshot_ring.entries)} snapshots to {path}")
+
+# Layout of the block shared between the render process and the simulation
+# process: a control header, an input ring written only by the renderer and
+# drained only by the simulation, and two snapshot slots the simulation
+# alternates between.  Each slot has its own sequence word (odd while it is
+# being written) so the renderer can detect a torn read and retry.
+link_control = struct.Struct('<QQBB')
+link_input = struct.Struct('<Qdc?6x')
+link_slot_header = struct.Struct('<QQId')
+link_input_capacity = 256
+link_slot_bytes = 256 * 1024
+link_read_attempts = 64
+link_input_offset = 64
+link_slots_offset = link_input_offset + link_input_capacity * link_input.size
+
+class SimulationLink:
+    """Shared-memory channel between the GLUT process and the simulation process"""
+    def __init__(self, name=None):
+        from multiprocessing import shared_memory
+        size = link_slots_offset + 2 * (link_slot_header.size + link_slot_bytes)
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+            self.shm.buf[:link_slots_offset] = bytes(link_slots_offset)
+            self.owner = True
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.owner = False
+        self.buf = self.shm.buf
+        self.next_seq = 1
+        self.sent = {}
+        self.latencies = collections.deque(maxlen=300)
+        self.last_slot_seq = None
+        self.shown_input_seq = 0
+        self.process = None
+        self.torn_reads = 0
+        self.exited = False
+
+    def control(self):
+        return link_control.unpack_from(self.buf, 0)
+
+    def slot_offset(self, slot):
+        return link_slots_offset + slot * (link_slot_header.size + link_slot_bytes)
+
+    # Renderer side
+
+    def start(self, rate, layouts=None, seed=None, use_bot=False):
+        import multiprocessing
+        context = multiprocessing.get_context('spawn')
+        self.process = context.Process(target=run_simulation_process,
+                                       args=(self.shm.name, rate, layouts, seed, use_bot), daemon=True)
+        self.process.start()
+
+    def send_key(self, key, down):
+        head, tail, front, stopped = self.control()
+        if head - tail >= link_input_capacity:
+            return
+        seq = self.next_seq
+        self.next_seq += 1
+        now = time.perf_counter()
+        link_input.pack_into(self.buf, link_input_offset + head % link_input_capacity * link_input.size,
+                             seq, now, key[:1], down)
+        struct.pack_into('<Q', self.buf, 0, head + 1)
+        self.sent[seq] = now
+
+    def sync(self):
+        """Restore the newest published snapshot if there is one we have not shown
+
+        A slot still being written after link_read_attempts tries, or a
+        simulation process which has gone away, leaves the last frame up.
+        """
+        if self.process is not None and not self.process.is_alive():
+            if not self.exited:
+                self.exited = True
+                print(f" Simulation process exited with code {self.process.exitcode}, "
+                      f"the game is frozen on its last frame")
+            return False
+        front = self.control()[2]
+        offset = self.slot_offset(front)
+        for _ in range(link_read_attempts):
+            seq, input_seq, length, sim_time = link_slot_header.unpack_from(self.buf, offset)
+            if seq & 1:
+                continue
+            data = bytes(self.buf[offset + link_slot_header.size:offset + link_slot_header.size + length])
+            if link_slot_header.unpack_from(self.buf, offset)[0] == seq:
+                break
+        else:
+            self.torn_reads += 1
+            return False
+        if (front, seq) == self.last_slot_seq or not length:
+            return False
+        self.last_slot_seq = (front, seq)
+        restore_snapshot(data)
+        self.shown_input_seq = input_seq
+        return True
+
+    def presented(self, now):
+        """Input events folded into the frame just swapped have become visible"""
+        for seq in [seq for seq in self.sent if seq <= self.shown_input_seq]:
+            self.latencies.append(now - self.sent.pop(seq))
+
+    def latency_report(self):
+        if not self.latencies:
+            return None
+        values = sorted(self.latencies)
+        return sum(values) / len(values), values[int(len(values) * 0.95)]
+
+    def stop(self):
+        struct.pack_into('<B', self.buf, 17, 1)
+        if self.process is not None:
+            self.process.join(1.0)
+        if self.owner:
+            self.buf = None
+            self.shm.close()
+            self.shm.unlink()
+
+    # Simulation side
+
+    def drain_inputs(self):
+        head, tail, front, stopped = self.control()
+        events = []
+        while tail < head:
+            events.append(link_input.unpack_from(self.buf, link_input_offset + tail % link_input_capacity * link_input.size))
+            tail += 1
+        struct.pack_into('<Q', self.buf, 8, tail)
+        return events
+
+    def publish(self, data, input_seq, sim_time):
+        if len(data) > link_slot_bytes:
+            raise ValueError(f"snapshot of {len(data)} bytes does not fit a {link_slot_bytes} byte link slot")
+        slot = 1 - self.control()[2]
+        offset = self.slot_offset(slot)
+        seq = link_slot_header.unpack_from(self.buf, offset)[0]
+        struct.pack_into('<Q', self.buf, offset, seq + 1)
+        self.buf[offset + link_slot_header.size:offset + link_slot_header.size + len(data)] = data
+        link_slot_header.pack_into(self.buf, offset, seq + 2, input_seq, len(data), sim_time)
+        struct.pack_into('<B', self.buf, 16, slot)
+
+def run_simulation_process(name, rate, layouts=None, seed=None, use_bot=False):
+    """Entry point of the simulation process: fixed-rate ticks, one published snapshot each"""
+    global layout_library, layout_seed, bot, threat_field
+    link = SimulationLink(name)
+    if layouts:
+        layout_library = LayoutLibrary(layouts)
+    layout_seed = seed
+    if use_bot:
+        # the bot steers the simulation, so it has to live where the ticks run
+        bot = BotPolicy()
+        if np is not None:
+            threat_field = ThreatField()
+    clock.simulate(1.0 / rate)
+    reset_game()
+    input_seq = 0
+    next_tick = time.perf_counter()
+    while not link.control()[3]:
+        for seq, sent, key, down in link.drain_inputs():
+            if down:
+                keyboard(key, 0, 0)
+            else:
+                keyboard_up(key, 0, 0)
+            input_seq = seq
+        step_simulation()
+        link.publish(take_snapshot(), input_seq, clock.now)
+        next_tick += 1.0 / rate
+        delay = next_tick - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        else:
+            next_tick = time.perf_counter()
+    link.buf = None
+    link.shm.close()
+
+sim_link = None
+
+# Network play: the server owns the simulation and streams snapshots to its
+# clients.  On the wire every double of a snapshot becomes a 64-bit fixed
+# point integer (net_scale steps per unit), so values that did not move
+# XOR to zero bytes.  Some values grow without bound (an obstacle's
+# velocity gains 10% per bounce), so they are clamped rather than allowed
+# to overflow the wire type.  A state is sent XORed against the newest state the
+# client acknowledged and zlib-compressed, or whole when there is no such
+# baseline.  Messages are a type byte and a payload length.
+NET_HELLO, NET_STATE, NET_INPUT, NET_ACK = 1, 2, 3, 4
+net_message = struct.Struct('<BI')
+net_hello = struct.Struct('<4sd')  # snapshot magic, tick rate
+net_state = struct.Struct('<IIIQ')  # tick, baseline tick (0 for none), crc32 of the state, last input applied
+net_input = struct.Struct('<Qc?')
+net_ack = struct.Struct('<I')
+net_scale = 256
+net_history = 64
+# Only movement and jumping are taken from remote players; reset, rewind,
+# snapshot dumps and the like stay with whoever runs the server
+net_input_keys = frozenset([b'a', b'd', b'w', b's', b' '])
+net_layouts = {}
+
+def value_codes(fmt):
+    """One type code per value a struct format packs"""
+    codes = []
+    count = ''
+    for char in fmt.lstrip('<>=!@'):
+        if char.isdigit():
+            count += char
+            continue
+        if char == 's':
+            codes.append(char)
+        elif char != 'x':
+            codes.extend(char * int(count or 1))
+        count = ''
+    return codes
+
+def net_layout(counts):
+    """Structs for a snapshot with these entity counts, in memory and on the wire"""
+    layout = net_layouts.get(counts)
+    if layout is None:
+        obstacle_count, tree_count, boundary_count, small_count, projectile_count, \
+            collectible_count, special_count, shield_count = counts
+        fmt = (snap_header.format + '%ds' % (2 * grid_mask_bytes)
+               + snap_obstacle.format[1:] * obstacle_count
+               + snap_tree.format[1:] * (tree_count + boundary_count + small_count)
+               + snap_projectile.format[1:] * projectile_count
+               + snap_collectible.format[1:] * collectible_count
+               + snap_special.format[1:] * special_count
+               + snap_shield.format[1:] * shield_count)
+        doubles = [k for k, code in enumerate(value_codes(fmt)) if code == 'd']
+        layout = net_layouts[counts] = (struct.Struct(fmt), struct.Struct(fmt.replace('d', 'q')), doubles)
+    return layout
+
+net_wire_header = struct.Struct(snap_header.format.replace('d', 'q'))
+net_wire_limit = 2 ** 63 - 1
+
+def quantize_value(value):
+    """Fixed-point wire value for a double, saturating at the int64 range"""
+    scaled = value * net_scale
+    if scaled != scaled:
+        return 0
+    if scaled >= net_wire_limit:
+        return net_wire_limit
+    if scaled <= -net_wire_limit:
+        return -net_wire_limit
+    return round(scaled)
+
+def quantize_snapshot(data):
+    snapshot, wire, doubles = net_layout(snap_header.unpack_from(data)[-8:])
+    values = list(snapshot.unpack(data))
+    for k in doubles:
+        values[k] = quantize_value(values[k])
+    return wire.pack(*values)
+
+def dequantize_snapshot(data):
+    snapshot, wire, doubles = net_layout(net_wire_header.unpack_from(data)[-8:])
+    values = list(wire.unpack(data))
+    for k in doubles:
+        values[k] /= net_scale
+    return snapshot.pack(*values)
+
+def parse_address(text):
+    """'unix:/path' or 'host:port'"""
+    if text.startswith('unix:'):
+        return ('unix', text[5:])
+    host, _, port = text.rpartition(':')
+    return ('tcp', (host or '127.0.0.1', int(port)))
+
+def send_message(writer, kind, payload):
+    writer.write(net_message.pack(kind, len(payload)) + payload)
+
+async def read_message(reader):
+    kind, length = net_message.unpack(await reader.readexactly(net_message.size))
+    return kind, await reader.readexactly(length)
+
+class NetServer:
+    """Authoritative headless simulation serving its state over TCP or a Unix socket.
+
+    Ticks at a fixed rate and sends each connected client the new state as
+    a delta against the last one it acknowledged.  A client whose socket
+    is backed up skips ticks rather than queueing them; its next delta is
+    simply taken against an older baseline.
+    """
+
+    def __init__(self, rate=60, max_buffered=256 * 1024):
+        self.rate = rate
+        self.max_buffered = max_buffered
+        self.tick = 0
+        self.history = {}
+        self.clients = []
+        self.stats = collections.Counter()
+        self.listening = asyncio.Event()
+
+    async def serve(self, address):
+        kind, where = parse_address(address)
+        if kind == 'unix':
+            server = await asyncio.start_unix_server(self.handle, where)
+        else:
+            server = await asyncio.start_server(self.handle, *where)
+        print(f" Serving on {address} at {self.rate} Hz")
+        self.listening.set()
+        async with server:
+            await self.run()
+
+    async def handle(self, reader, writer):
+        client = {'writer': writer, 'acked': 0, 'input_seq': 0}
+        send_message(writer, NET_HELLO, net_hello.pack(SNAPSHOT_MAGIC, self.rate))
+        self.clients.append(client)
+        try:
+            while True:
+                kind, payload = await read_message(reader)
+                if kind == NET_ACK:
+                    client['acked'] = max(client['acked'], net_ack.unpack(payload)[0])
+                elif kind == NET_INPUT:
+                    seq, key, down = net_input.unpack(payload)
+                    if key in net_input_keys:
+                        (keyboard if down else keyboard_up)(key, 0, 0)
+                    else:
+                        self.stats['rejected_inputs'] += 1
+                    client['input_seq'] = seq
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.clients.remove(client)
+            writer.close()
+
+    async def run(self):
+        interval = 1.0 / self.rate
+        next_tick = time.perf_counter()
+        report = next_tick + benchmark_interval
+        while not shutdown_requested:
+            step_simulation()
+            snapshot = take_snapshot()
+            self.stats['raw_bytes'] += len(snapshot)
+            self.publish(quantize_snapshot(snapshot))
+            now = time.perf_counter()
+            if now >= report:
+                self.report()
+                report = now + benchmark_interval
+            next_tick = max(next_tick + interval, now)
+            await asyncio.sleep(next_tick - now)
+
+    def publish(self, state):
+        self.tick += 1
+        self.history[self.tick] = state
+        self.history.pop(self.tick - net_history, None)
+        crc = zlib.crc32(state)
+        self.stats['states'] += 1
+        self.stats['state_bytes'] += len(state)
+        for client in self.clients:
+            writer = client['writer']
+            if writer.transport.get_write_buffer_size() > self.max_buffered:
+                self.stats['skipped'] += 1
+                continue
+            baseline = client['acked'] if client['acked'] in self.history else 0
+            if baseline:
+                base = self.history[baseline]
+                payload = zlib.compress(xor_bytes(state, base[:len(state)]), 1)
+                self.stats['deltas'] += 1
+            else:
+                payload = zlib.compress(state, 1)
+                self.stats['keyframes'] += 1
+            self.stats['sent_bytes'] += len(payload)
+            send_message(writer, NET_STATE, net_state.pack(self.tick, baseline, crc, client['input_seq']) + payload)
+
+    def report(self):
+        stats = self.stats
+        sent = stats['deltas'] + stats['keyframes']
+        if stats['states'] and sent:
+            print(f" [server] tick {self.tick}, {len(self.clients)} clients, state {stats['state_bytes'] / stats['states']:.0f} B "
+                  f"({stats['raw_bytes'] / stats['states']:.0f} B unquantized), "
+                  f"{stats['sent_bytes'] / sent:.0f} B sent per client per tick, "
+                  f"{stats['keyframes']} keyframes, {stats['skipped']} skipped, "
+                  f"{stats['rejected_inputs']} inputs rejected")
+        self.stats = collections.Counter()
+
+class NetClient:
+    """Client end of a NetServer connection, standing in for a SimulationLink.
+
+    The game keeps calling send_key(), sync() and presented() as it would
+    on the shared-memory link; the connection itself runs as a task on the
+    asyncio main loop.  With apply=False it only decodes and verifies
+    states, which is what the loopback test clients do.
+    """
+
+    def __init__(self, address, apply=True):
+        self.address = address
+        self.apply = apply
+        self.writer = None
+        self.states = {}
+        self.latest = None
+        self.shown_tick = 0
+        self.next_seq = 1
+        self.sent = {}
+        self.latencies = collections.deque(maxlen=300)
+        self.shown_input_seq = 0
+        self.received_bytes = 0
+        self.received_states = 0
+        self.errors = 0
+
+    async def run(self):
+        kind, where = parse_address(self.address)
+        if kind == 'unix':
+            reader, self.writer = await asyncio.open_unix_connection(where)
+        else:
+            reader, self.writer = await asyncio.open_connection(*where)
+        try:
+            kind, payload = await read_message(reader)
+            magic, rate = net_hello.unpack(payload)
+            if kind != NET_HELLO or magic != SNAPSHOT_MAGIC:
+                raise ConnectionError("server speaks a different snapshot format")
+            while True:
+                kind, payload = await read_message(reader)
+                if kind == NET_STATE:
+                    self.receive(payload)
+        except (asyncio.IncompleteReadError, ConnectionError) as error:
+            if self.writer is not None:
+                print(f" Disconnected from {self.address}: {error or 'connection closed'}")
+        finally:
+            if self.writer is not None:
+                self.writer.close()
+                self.writer = None
+
+    def receive(self, payload):
+        try:
+            tick, baseline, crc, input_seq = net_state.unpack_from(payload)
+            data = zlib.decompress(payload[net_state.size:])
+        except (struct.error, zlib.error):
+            self.errors += 1
+            return
+        if baseline:
+            base = self.states.get(baseline)
+            if base is None:
+                self.errors += 1
+                return
+            data = xor_bytes(data, base[:len(data)])
+        if zlib.crc32(data) != crc:
+            self.errors += 1
+            return
+        self.received_bytes += len(payload)
+        self.received_states += 1
+        # The server only ever uses our newest acknowledgement as a baseline,
+        # and never one older than its history, even while sending keyframes
+        oldest = max(baseline, tick - net_history)
+        for old in [old for old in self.states if old < oldest]:
+            del self.states[old]
+        self.states[tick] = data
+        self.latest = (tick, input_seq)
+        send_message(self.writer, NET_ACK, net_ack.pack(tick))
+
+    def send_key(self, key, down):
+        if self.writer is None:
+            return
+        seq = self.next_seq
+        self.next_seq += 1
+        send_message(self.writer, NET_INPUT, net_input.pack(seq, key[:1], down))
+        self.sent[seq] = time.perf_counter()
+
+    def sync(self):
+        """Restore the newest state received if it has not been shown yet"""
+        if self.latest is None or self.latest[0] == self.shown_tick:
+            return False
+        tick, input_seq = self.latest
+        self.shown_tick = tick
+        if self.apply:
+            restore_snapshot(dequantize_snapshot(self.states[tick]))
+        self.shown_input_seq = input_seq
+        return True
+
+    presented = SimulationLink.presented
+    latency_report = SimulationLink.latency_report
+
+    def stop(self):
+        if self.writer is not None:
+            writer, self.writer = self.writer, None
+            writer.close()
+
+async def run_test_client(server, address, index, seconds):
+    """A loopback client that wanders about and checks every state it decodes"""
+    await server.listening.wait()
+    await asyncio.sleep(0.1 * index)
+    client = NetClient(address, apply=False)
+    task = asyncio.get_running_loop().create_task(client.run())
+    rng = random.Random(index)
+    held = None
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end and not task.done():
+        if held:
+            client.send_key(held, False)
+        held = rng.choice([b'w', b'a', b's', b'd', b' '])
+        client.send_key(held, True)
+        await asyncio.sleep(rng.uniform(0.1, 0.5))
+        client.sync()
+    client.stop()
+    await asyncio.gather(task, return_exceptions=True)
+    print(f" [test client {index}] {client.received_states} states, "
+          f"{client.received_bytes / max(client.received_states, 1):.0f} B each, {client.errors} errors")
+
+def main_server(args):
+    clock.simulate(1.0 / args.serve_rate)
+    reset_game()
+    server = NetServer(args.serve_rate)
+    async def serve():
+        tasks = [asyncio.get_running_loop().create_task(run_test_client(server, args.serve, k, args.test_seconds))
+                 for k in range(args.test_clients)]
+        serving = asyncio.get_running_loop().create_task(server.serve(args.serve))
+        if tasks:
+            await asyncio.gather(*tasks)
+            server.report()
+            serving.cancel()
+        await asyncio.gather(serving, return_exceptions=bool(tasks))
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+def tile_of(pos):
+    return (int(math.floor((pos[0] + half_size_x) / tile_size)),
+            int(math.floor((pos[1] + half_size_y) / tile_size)))
+
+def tile_center(tile):
+    return (tile[0] * tile_size - half_size_x + tile_size / 2,
+            tile[1] * tile_size - half_size_y + tile_size / 2)
+
+def obstacle_path_tiles():
+    """Tiles each obstacle's movement pattern sweeps over, sampled along one cycle"""
+    tiles = set()
+    t = np.linspace(0.0, 2 * math.pi, 64)
+    for o in obstacles:
+        ox, oy = o['original_pos']
+        if o['pattern'] == 'circle':
+            radius = 40 + current_round * 10 + 15
+            xs, ys = ox + radius * np.cos(t), oy + radius * np.sin(t)
+        elif o['pattern'] == 'figure8':
+            scale = 50 + current_round * 10
+            xs, ys = ox + scale * np.cos(t), oy + scale * np.sin(2 * t) / 2
+        else:
+            sweep = 50 if o['pattern'] == 'zigzag' else 0
+            xs = ox + sweep * np.sin(t)
+            ys = np.linspace(-half_size_y, half_size_y - 1, 64)
+        i = np.floor((xs + half_size_x) / tile_size).astype(int)
+        j = np.floor((ys + half_size_y) / tile_size).astype(int)
+        keep = (i >= 0) & (i < grid_size_x) & (j >= 0) & (j < grid_size_y)
+        tiles.update(zip(i[keep].tolist(), j[keep].tolist()))
+    return tiles
+
+def neighbour_min(field):
+    """Per tile, the smallest value among its four neighbours (and which one)"""
+    padded = np.pad(field, [(0, 0)] * (field.ndim - 2) + [(1, 1), (1, 1)], constant_values=np.inf)
+    candidates = np.stack([padded[..., :-2, 1:-1], padded[..., 2:, 1:-1],
+                           padded[..., 1:-1, :-2], padded[..., 1:-1, 2:]])
+    return candidates.min(axis=0), candidates.argmin(axis=0)
+
+NEIGHBOUR_STEPS = ((-1, 0), (1, 0), (0, -1), (0, 1))
+
+class NavigationService:
+    """Distance fields over the tile grid for bots.
+
+    Entering a tile costs 1, danger tiles and obstacle paths cost
+    `avoid_cost`, holes cannot be entered.  There is one field per pickup
+    (collectibles and special collectibles), all relaxed together as a
+    NumPy wavefront.  Picking something up drops its field and a respawn
+    relaxes just the new one; either way the combined field and the
+    next-tile table are rebuilt with a few array operations, so
+    next_tile() is a table lookup.  A* paths to arbitrary goals are cached
+    until the layout changes.
+    """
+    avoid_cost = 4.0
+
+    def __init__(self):
+        if np is None:
+            raise RuntimeError("the navigation service needs numpy")
+        self.layout = None
+        self.goals = []
+        self.fields = np.empty((0, grid_size_x, grid_size_y))
+        self.paths = {}
+
+    def sync(self):
+        if self.layout != layout_version:
+            self.rebuild_layout()
+        goals = sorted({tile_of(c['pos']) for c in collectibles + special_collectibles if not c['collected']})
+        if goals == self.goals:
+            return
+        keep = [k for k, goal in enumerate(self.goals) if goal in goals]
+        added = [goal for goal in goals if goal not in self.goals]
+        fields = self.fields[keep]
+        if added:
+            fields = np.concatenate([fields, self.relax(added)])
+        self.goals = [self.goals[k] for k in keep] + added
+        self.fields = fields
+        self.update_next_table()
+
+    def rebuild_layout(self):
+        self.layout = layout_version
+        cost = np.ones((grid_size_x, grid_size_y))
+        for tile in set(zones['danger']) | obstacle_path_tiles():
+            cost[tile] = self.avoid_cost
+        for tile in holes:
+            cost[tile] = np.inf
+        self.cost = cost
+        self.paths.clear()
+        self.goals = []
+        self.fields = np.empty((0, grid_size_x, grid_size_y))
+
+    def relax(self, goals):
+        fields = np.full((len(goals), grid_size_x, grid_size_y), np.inf)
+        for k, goal in enumerate(goals):
+            fields[k][goal] = 0.0
+        while True:
+            best, _ = neighbour_min(fields + self.cost)
+            relaxed = np.minimum(fields, best)
+            if np.array_equal(relaxed, fields):
+                return fields
+            fields = relaxed
+
+    def update_next_table(self):
+        if len(self.goals):
+            self.distance = self.fields.min(axis=0)
+        else:
+            self.distance = np.full((grid_size_x, grid_size_y), np.inf)
+        best, direction = neighbour_min(self.distance + self.cost)
+        steps = np.array(NEIGHBOUR_STEPS)[direction]
+        ii, jj = np.indices((grid_size_x, grid_size_y))
+        stay = ~np.isfinite(best) | (self.distance == 0)
+        self.next_i = np.where(stay, ii, ii + steps[..., 0]).tolist()
+        self.next_j = np.where(stay, jj, jj + steps[..., 1]).tolist()
+
+    def next_tile(self, tile):
+        """Neighbouring tile on the cheapest route to the nearest pickup"""
+        i, j = tile
+        if not (0 <= i < grid_size_x and 0 <= j < grid_size_y):
+            return tile
+        return (self.next_i[i][j], self.next_j[i][j])
+
+    def path(self, start, goal):
+        """A* over the same costs; None if the goal cannot be reached"""
+        key = (start, goal)
+        if key in self.paths:
+            return self.paths[key]
+        cost = self.cost.tolist()
+        def estimate(tile):
+            return abs(tile[0] - goal[0]) + abs(tile[1] - goal[1])
+        came_from = {start: None}
+        spent = {start: 0.0}
+        frontier = [(estimate(start), start)]
+        result = None
+        while frontier:
+            _, tile = heapq.heappop(frontier)
+            if tile == goal:
+                result = []
+                while tile is not None:
+                    result.append(tile)
+                    tile = came_from[tile]
+                result.reverse()
+                break
+            for di, dj in NEIGHBOUR_STEPS:
+                i, j = tile[0] + di, tile[1] + dj
+                if 0 <= i < grid_size_x and 0 <= j < grid_size_y:
+                    total = spent[tile] + cost[i][j]
+                    if total < spent.get((i, j), math.inf):
+                        spent[(i, j)] = total
+                        came_from[(i, j)] = tile
+                        heapq.heappush(frontier, (total + estimate((i, j)), (i, j)))
+        self.paths[key] = result
+        return result
+
+class BotPolicy:
+    """Steers the ball towards the nearest pickup and jumps before the bounce timer runs out"""
+    def __init__(self):
+        self.nav = NavigationService()
+
+    def act(self):
+        global space_pressed
+        self.nav.sync()
+        tile = tile_of(ball_pos)
+        target = tile_center(self.nav.next_tile(tile))
+        dx, dy = target[0] - ball_pos[0], target[1] - ball_pos[1]
+        move_keys['w'] = dx > 5
+        move_keys['s'] = dx < -5
+        move_keys['a'] = dy > 5
+        move_keys['d'] = dy < -5
+        time_left = bounce_time_limit - bounce_timer
+        if threat_field is not None and time_left > 0.3:
+            # Projectiles only hurt in the air: wait for a quiet moment to jump
+            space_pressed = time_left < 1.5 and not threat_field.danger(tile, 0.5, ThreatField.AIR)
+        else:
+            space_pressed = time_left < 1.0
+
+class ThreatField:
+    """Which tiles will be dangerous over the next `horizon` seconds.
+
+    Layer 0 is the air (projectiles, which only hurt a jumping ball) and
+    layer 1 the ground (obstacles, which only hurt it on the floor).  Every
+    tick all projectile trajectories and predicted obstacle positions are
+    sampled at once as NumPy arrays and binned into `buckets` time slices,
+    counting how many hazards cross each tile in each slice.  Times are real
+    seconds, so slow_time stretches the predictions accordingly.
+    """
+    AIR, GROUND = 0, 1
+
+    def __init__(self, horizon=2.0, buckets=8, samples=4):
+        if np is None:
+            raise RuntimeError("the threat field needs numpy")
+        self.horizon = horizon
+        self.buckets = buckets
+        self.bucket_time = horizon / buckets
+        self.times = (np.arange(buckets * samples) + 0.5) * (self.bucket_time / samples)
+        self.bucket_of = np.repeat(np.arange(buckets), samples)
+        self.counts = np.zeros((2, buckets, grid_size_x, grid_size_y), dtype=np.int32)
+        self.texture = None
+
+    def rasterize(self, layer, xs, ys, valid, owner):
+        """Bin sample positions (hazard, time) into the layer, once per hazard per bucket and tile"""
+        i = np.floor((xs + half_size_x) / tile_size).astype(np.int64)
+        j = np.floor((ys + half_size_y) / tile_size).astype(np.int64)
+        buckets = np.broadcast_to(self.bucket_of, xs.shape)
+        valid = valid & (i >= 0) & (i < grid_size_x) & (j >= 0) & (j < grid_size_y)
+        cells = (buckets[valid] * grid_size_x + i[valid]) * grid_size_y + j[valid]
+        cells = np.unique(np.broadcast_to(owner, xs.shape)[valid] * self.counts[layer].size + cells)
+        cells %= self.counts[layer].size
+        self.counts[layer] += np.bincount(cells, minlength=self.counts[layer].size).reshape(self.counts[layer].shape)
+
+    def update(self):
+        self.counts[:] = 0
+        t = self.times * clock.hazard_scale
+        if projectiles:
+            state = np.array([(p['pos'][0], p['pos'][1], p['vel'][0], p['vel'][1], p['max_life'] - p['life_time'])
+                              for p in projectiles])
+            xs = state[:, 0:1] + state[:, 2:3] * t
+            ys = state[:, 1:2] + state[:, 3:4] * t
+            valid = t < state[:, 4:5]
+            self.rasterize(self.AIR, xs, ys, valid, np.arange(len(projectiles))[:, None])
+        if obstacles:
+            self.update_obstacles(t)
+
+    def update_obstacles(self, t):
+        state = np.array([(o['original_pos'][0], o['original_pos'][1], o['pos'][0], o['pos'][1],
+                           o['pattern_time'], o['aggressiveness'], o['vel'] * obstacle_speed_multiplier,
+                           o['current_size'] + ball_radius, obstacle_patterns.index(o['pattern']))
+                          for o in obstacles])
+        ox, oy, px, py, phase, aggressiveness, vel, reach, pattern = (state[:, k:k + 1] for k in range(9))
+        phase = phase + aggressiveness * t
+        # oscillate/zigzag bounce between the walls: fold a straight line into a triangle wave
+        span = 2 * half_size_y
+        travel = (py + half_size_y + vel * t) % (2 * span)
+        bounced = np.where(travel > span, 2 * span - travel, travel) - half_size_y
+        radius = 40 + current_round * 10 + 15 * np.sin(phase * 0.5)
+        scale = 50 + current_round * 10
+        xs = np.select([pattern == 0, pattern == 1, pattern == 2],
+                       [px + 0 * t, ox + radius * np.cos(phase), ox + scale * np.cos(phase)],
+                       ox + 50 * np.sin(phase * 2))
+        ys = np.select([pattern == 1, pattern == 2],
+                       [oy + radius * np.sin(phase), oy + scale * np.sin(2 * phase) / 2],
+                       bounced)
+        owner = np.arange(len(obstacles))[:, None]
+        valid = np.ones(xs.shape, dtype=bool)
+        for dx, dy in ((0, 0), (1, 0), (-1, 0), (0, 1), (0, -1)):
+            self.rasterize(self.GROUND, xs + dx * reach, ys + dy * reach, valid, owner)
+
+    def danger(self, tile, within=None, layer=None):
+        """Number of hazard crossings of a tile in the next `within` seconds"""
+        i, j = tile
+        if not (0 <= i < grid_size_x and 0 <= j < grid_size_y):
+            return 0
+        buckets = self.buckets if within is None else max(1, min(self.buckets, int(math.ceil(within / self.bucket_time))))
+        layers = self.counts if layer is None else self.counts[layer:layer + 1]
+        return int(layers[:, :buckets, i, j].sum())
+
+    def first_threat(self, tile, layer=None):
+        """Seconds until the first hazard reaches the tile, None if none within the horizon"""
+        i, j = tile
+        if not (0 <= i < grid_size_x and 0 <= j < grid_size_y):
+            return None
+        layers = self.counts if layer is None else self.counts[layer:layer + 1]
+        hits = np.nonzero(layers[:, :, i, j].sum(axis=0))[0]
+        return float(hits[0] * self.bucket_time) if len(hits) else None
+
+    def overlay_pixels(self):
+        """RGBA per tile, nearer threats more opaque: red for ground, orange for air"""
+        weights = np.linspace(1.0, 0.25, self.buckets)[:, None, None]
+        air = np.clip((np.minimum(self.counts[self.AIR], 1) * weights).max(axis=0), 0, 1)
+        ground = np.clip((np.minimum(self.counts[self.GROUND], 1) * weights).max(axis=0), 0, 1)
+        rgba = np.zeros((grid_size_y, grid_size_x, 4), dtype=np.uint8)
+        rgba[..., 0] = 255
+        rgba[..., 1] = (160 * air * (1 - ground)).T
+        rgba[..., 3] = (180 * np.maximum(air, ground)).T
+        return rgba.tobytes()
+
+    def draw_overlay(self):
+        if self.texture is None:
+            self.texture = glGenTextures(1)
+            glBindTexture(GL_TEXTURE_2D, self.texture)
+            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
+        glBindTexture(GL_TEXTURE_2D, self.texture)
+        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, grid_size_x, grid_size_y, 0, GL_RGBA, GL_UNSIGNED_BYTE,
+                     self.overlay_pixels())
+        view = getattr(getattr(gfx, 'backend', gfx), 'view', None)
+        glPushMatrix()
+        if view is not None:
+            glLoadMatrixf(view)
+        glPushAttrib(GL_ENABLE_BIT)
+        glDisable(GL_LIGHTING)
+        glEnable(GL_TEXTURE_2D)
+        glEnable(GL_BLEND)
+        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        glColor4f(1, 1, 1, 1)
+        glBegin(GL_QUADS)
+        glTexCoord2f(0, 0); glVertex3f(-half_size_x, -half_size_y, 0.2)
+        glTexCoord2f(1, 0); glVertex3f(half_size_x, -half_size_y, 0.2)
+        glTexCoord2f(1, 1); glVertex3f(half_size_x, half_size_y, 0.2)
+        glTexCoord2f(0, 1); glVertex3f(-half_size_x, half_size_y, 0.2)
+        glEnd()
+        glPopAttrib()
+        glPopMatrix()
+        glBindTexture(GL_TEXTURE_2D, 0)
+
+threat_field = None
+show_threat_overlay = False
+
+bot = None
 
 def setup_projection():
+    if core_profile:
+        return  # ShaderRenderer builds its own projection matrix
     glMatrixMode(GL_PROJECTION)
     glLoadIdentity()
     gluPerspective(60.0, ASPECT, 1.0, 3000.0)
@@ -504,17 +2595,20 @@ def reshape(w, h):
     WINDOW_HEIGHT = h
     ASPECT = w / h if h > 0 else 1
     glViewport(0, 0, w, h)
+    if frame_capture is not None:
+        frame_capture.resize(w, h)
     setup_projection()
 
 def setup_scene():
     glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
     glEnable(GL_DEPTH_TEST)
-    glLoadIdentity()
+    if not core_profile:
+        glLoadIdentity()
     angle_rad = math.radians(camera_angle)
     eye_x = ball_pos[0] - camera_distance * math.cos(angle_rad)
     eye_y = ball_pos[1] + camera_distance * math.sin(angle_rad)
     eye_z = ball_pos[2] + camera_height
-    gluLookAt(eye_x, eye_y, eye_z,
+    gfx.look_at(eye_x, eye_y, eye_z,
               ball_pos[0], ball_pos[1], ball_pos[2],
               0.0, 0.0, 1.0)
     if theme == "default":
@@ -552,30 +2646,30 @@ def draw_floor():
             x = i * tile_size - half_size_x
             y = j * tile_size - half_size_y
             if (i, j) in holes:
-                glColor3f(*hole_color)
+                gfx.color(*hole_color)
             elif (i, j) in zones['danger']:
-                glColor3f(*danger_color)
+                gfx.color(*danger_color)
             elif (i, j) in zones['safe']:
-                glColor3f(*safe_color)
+                gfx.color(*safe_color)
             else:
-                glColor3f(*normal_color)
-            glBegin(GL_QUADS)
-            glVertex3f(x, y, 0.0)
-            glVertex3f(x + tile_size, y, 0.0)
-            glVertex3f(x + tile_size, y + tile_size, 0.0)
-            glVertex3f(x, y + tile_size, 0.0)
-            glEnd()
-            glColor3f(0.0, 0.0, 0.0)
-            glLineWidth(1.0)
-            glBegin(GL_LINE_LOOP)
-            glVertex3f(x, y, 0.1)
-            glVertex3f(x + tile_size, y, 0.1)
-            glVertex3f(x + tile_size, y + tile_size, 0.1)
-            glVertex3f(x, y + tile_size, 0.1)
-            glEnd()
+                gfx.color(*normal_color)
+            gfx.begin(GL_QUADS)
+            gfx.vertex(x, y, 0.0)
+            gfx.vertex(x + tile_size, y, 0.0)
+            gfx.vertex(x + tile_size, y + tile_size, 0.0)
+            gfx.vertex(x, y + tile_size, 0.0)
+            gfx.end()
+            gfx.color(0.0, 0.0, 0.0)
+            gfx.line_width(1.0)
+            gfx.begin(GL_LINE_LOOP)
+            gfx.vertex(x, y, 0.1)
+            gfx.vertex(x + tile_size, y, 0.1)
+            gfx.vertex(x + tile_size, y + tile_size, 0.1)
+            gfx.vertex(x, y + tile_size, 0.1)
+            gfx.end()
 
 def draw_walls():
-    glColor3f(0.2, 0.2, 0.8)
+    gfx.color(0.2, 0.2, 0.8)
     wall_positions = [
         (-half_size_x, 0, -half_size_y, half_size_y, True),
         (half_size_x, 0, -half_size_y, half_size_y, True),
@@ -585,20 +2679,20 @@ def draw_walls():
     for wall in wall_positions:
         if wall[4]:
             x, _, y1, y2 = wall[:4]
-            glBegin(GL_QUADS)
-            glVertex3f(x, y1, 0)
-            glVertex3f(x, y2, 0)
-            glVertex3f(x, y2, wall_height)
-            glVertex3f(x, y1, wall_height)
-            glEnd()
+            gfx.begin(GL_QUADS)
+            gfx.vertex(x, y1, 0)
+            gfx.vertex(x, y2, 0)
+            gfx.vertex(x, y2, wall_height)
+            gfx.vertex(x, y1, wall_height)
+            gfx.end()
         else:
             _, y, x1, x2 = wall[:4]
-            glBegin(GL_QUADS)
-            glVertex3f(x1, y, 0)
-            glVertex3f(x2, y, 0)
-            glVertex3f(x2, y, wall_height)
-            glVertex3f(x1, y, wall_height)
-            glEnd()
+            gfx.begin(GL_QUADS)
+            gfx.vertex(x1, y, 0)
+            gfx.vertex(x2, y, 0)
+            gfx.vertex(x2, y, wall_height)
+            gfx.vertex(x1, y, wall_height)
+            gfx.end()
 
 def draw_trees():
     if theme == "default":
@@ -626,66 +2720,63 @@ def draw_trees():
         ])
 
     for tx, ty, tz in tree_positions:
-        glColor3f(*trunk_color)
-        glPushMatrix()
-        glTranslatef(tx, ty, 15)
-        glScalef(8, 8, 30)
-        glutSolidCube(1)
-        glPopMatrix()
+        gfx.color(*trunk_color)
+        gfx.push_matrix()
+        gfx.translate(tx, ty, 15)
+        gfx.scale(8, 8, 30)
+        gfx.solid_cube(1)
+        gfx.pop_matrix()
         if current_round >= 5:
-            pulse = 0.5 + 0.5 * math.sin(time.time() * 4)
-            glColor3f(pulse, 0.1, 0.1)
+            pulse = 0.5 + 0.5 * math.sin(clock.now * 4)
+            gfx.color(pulse, 0.1, 0.1)
         else:
-            glColor3f(*foliage_color)
-        glPushMatrix()
-        glTranslatef(tx, ty, 45)
-        glutSolidCone(20, 50, 12, 12)
-        glPopMatrix()
+            gfx.color(*foliage_color)
+        gfx.push_matrix()
+        gfx.translate(tx, ty, 45)
+        gfx.solid_cone(20, 50, quality['foliage_detail'], quality['foliage_detail'])
+        gfx.pop_matrix()
 
 def draw_collectibles():
-    current_time = time.time()
+    current_time = clock.now
     for c in collectibles:
         if not c['collected']:
-            glPushMatrix()
+            gfx.push_matrix()
             x, y, base_z = c['pos']
             float_z = base_z + 5 * math.sin(current_time * 2 + c['float_offset'])
-            glTranslatef(x, y, float_z)
-            c['rotation'] += 2.0
-            glRotatef(c['rotation'], 0, 0, 1)
+            gfx.translate(x, y, float_z)
+            gfx.rotate(c['rotation'], 0, 0, 1)
             if c['type'] == 'cube':
-                glColor3f(1.0, 0.8, 0.0)
-                glutSolidCube(15)
+                gfx.color(1.0, 0.8, 0.0)
+                gfx.solid_cube(15)
             elif c['type'] == 'torus':
-                glColor3f(0.0, 1.0, 1.0)
-                glutSolidTorus(3, 10, 12, 12)
+                gfx.color(0.0, 1.0, 1.0)
+                gfx.solid_torus(3, 10, 12, 12)
             elif c['type'] == 'pyramid':
-                glColor3f(1.0, 0.0, 1.0)
-                glBegin(GL_QUADS)
-                glVertex3f(-7, -7, 0)
-                glVertex3f(7, -7, 0)
-                glVertex3f(7, 7, 0)
-                glVertex3f(-7, 7, 0)
-                glEnd()
-                glBegin(GL_TRIANGLES)
-                glVertex3f(0, 0, 14); glVertex3f(-7, -7, 0); glVertex3f(7, -7, 0)
-                glVertex3f(0, 0, 14); glVertex3f(7, 7, 0); glVertex3f(-7, 7, 0)
-                glVertex3f(0, 0, 14); glVertex3f(7, -7, 0); glVertex3f(7, 7, 0)
-                glVertex3f(0, 0, 14); glVertex3f(-7, 7, 0); glVertex3f(-7, -7, 0)
-                glEnd()
-            glPopMatrix()
+                gfx.color(1.0, 0.0, 1.0)
+                gfx.begin(GL_QUADS)
+                gfx.vertex(-7, -7, 0)
+                gfx.vertex(7, -7, 0)
+                gfx.vertex(7, 7, 0)
+                gfx.vertex(-7, 7, 0)
+                gfx.end()
+                gfx.begin(GL_TRIANGLES)
+                gfx.vertex(0, 0, 14); gfx.vertex(-7, -7, 0); gfx.vertex(7, -7, 0)
+                gfx.vertex(0, 0, 14); gfx.vertex(7, 7, 0); gfx.vertex(-7, 7, 0)
+                gfx.vertex(0, 0, 14); gfx.vertex(7, -7, 0); gfx.vertex(7, 7, 0)
+                gfx.vertex(0, 0, 14); gfx.vertex(-7, 7, 0); gfx.vertex(-7, -7, 0)
+                gfx.end()
+            gfx.pop_matrix()
 
 def draw_special_collectibles():
-    current_time = time.time()
+    current_time = clock.now
     for sc in special_collectibles:
         if not sc['collected']:
-            glPushMatrix()
+            gfx.push_matrix()
             x, y, base_z = sc['pos']
-            sc['glow'] += 0.1
-            sc['rotation'] += 3.0
             glow_intensity = 0.5 + 0.5 * math.sin(sc['glow'])
             float_z = base_z + 8 * math.sin(current_time * 1.5)
-            glTranslatef(x, y, float_z)
-            glRotatef(sc['rotation'], 0, 0, 1)
+            gfx.translate(x, y, float_z)
+            gfx.rotate(sc['rotation'], 0, 0, 1)
             effect_colors = {
                 'speed_boost': (0.0, 1.0, 0.0),
                 'slow_time': (0.0, 0.0, 1.0),
@@ -694,90 +2785,85 @@ def draw_special_collectibles():
                 'score_multiplier': (1.0, 0.5, 0.0)
             }
             color = effect_colors.get(sc['effect'], (1.0, 1.0, 1.0))
-            glColor3f(color[0] * glow_intensity, color[1] * glow_intensity, color[2] * glow_intensity)
-            glBegin(GL_TRIANGLE_FAN)
-            glVertex3f(0, 0, 0)
+            gfx.color(color[0] * glow_intensity, color[1] * glow_intensity, color[2] * glow_intensity)
+            gfx.begin(GL_TRIANGLE_FAN)
+            gfx.vertex(0, 0, 0)
             for i in range(11):
                 angle = i * 2 * math.pi / 10
                 radius = 12 if i % 2 == 0 else 6
-                glVertex3f(math.cos(angle) * radius, math.sin(angle) * radius, 0)
-            glEnd()
-            glColor3f(1.0, 1.0, 1.0)
-            glBegin(GL_LINES)
-            glVertex3f(0, 0, 8)
-            glVertex3f(0, 0, 18)
-            glVertex3f(6, 0, 13)
-            glVertex3f(-6, 0, 13)
-            glVertex3f(0, 6, 13)
-            glVertex3f(0, -6, 13)
-            glEnd()
-            glPopMatrix()
+                gfx.vertex(math.cos(angle) * radius, math.sin(angle) * radius, 0)
+            gfx.end()
+            gfx.color(1.0, 1.0, 1.0)
+            gfx.begin(GL_LINES)
+            gfx.vertex(0, 0, 8)
+            gfx.vertex(0, 0, 18)
+            gfx.vertex(6, 0, 13)
+            gfx.vertex(-6, 0, 13)
+            gfx.vertex(0, 6, 13)
+            gfx.vertex(0, -6, 13)
+            gfx.end()
+            gfx.pop_matrix()
 
 def draw_obstacles():
-    current_time = time.time()
     for o in obstacles:
-        glPushMatrix()
+        gfx.push_matrix()
         x, y, z = o['pos']
-        glTranslatef(x, y, z)
-        o['pulse'] += 0.1 * o['aggressiveness']
+        gfx.translate(x, y, z)
         pulse_factor = 0.5 + 0.5 * math.sin(o['pulse'])
         if o['current_size'] <= 0:
             o['current_size'] = o['base_size']
         size_ratio = (o['current_size'] - o['min_size']) / max(1, (o['base_size'] - o['min_size']))
         red_intensity = 0.7 + (1.0 - size_ratio) * 0.3 + pulse_factor * 0.2
         green_blue = 0.05 + size_ratio * 0.15
-        glColor3f(red_intensity, green_blue, green_blue)
-        glutSolidSphere(o['current_size'], 16, 16)
-        if o['current_size'] < o['base_size'] * 0.6:
-            glPushMatrix()
+        gfx.color(red_intensity, green_blue, green_blue)
+        gfx.solid_sphere(o['current_size'], quality['obstacle_detail'], quality['obstacle_detail'])
+        if quality['glow'] and o['current_size'] < o['base_size'] * 0.6:
+            gfx.push_matrix()
             glow_size = o['current_size'] * (1.2 + 0.4 * pulse_factor)
-            glColor4f(1.0, 0.2, 0.2, 0.4 + 0.3 * pulse_factor)
-            glEnable(GL_BLEND)
-            glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
-            glutWireSphere(glow_size, 12, 12)
-            glDisable(GL_BLEND)
-            glPopMatrix()
-        glPopMatrix()
+            gfx.color_alpha(1.0, 0.2, 0.2, 0.4 + 0.3 * pulse_factor)
+            gfx.enable_blend()
+            gfx.wire_sphere(glow_size, 12, 12)
+            gfx.disable_blend()
+            gfx.pop_matrix()
+        gfx.pop_matrix()
 
 def draw_ball():
-    glPushMatrix()
-    glTranslatef(ball_pos[0], ball_pos[1], ball_pos[2])
+    gfx.push_matrix()
+    gfx.translate(ball_pos[0], ball_pos[1], ball_pos[2])
     if shield_active:
-        glow = 0.5 + 0.5 * math.sin(time.time() * 5)
-        glColor3f(0.0, glow, 1.0)
+        glow = 0.5 + 0.5 * math.sin(clock.now * 5)
+        gfx.color(0.0, glow, 1.0)
     elif jumping:
-        glColor3f(1.0, 1.0, 0.0)
+        gfx.color(1.0, 1.0, 0.0)
     elif current_round >= 5:
-        pulse = 0.5 + 0.5 * math.sin(time.time() * 2)
-        glColor3f(1.0, pulse * 0.5, pulse * 0.5)
+        pulse = 0.5 + 0.5 * math.sin(clock.now * 2)
+        gfx.color(1.0, pulse * 0.5, pulse * 0.5)
     else:
-        glColor3f(1.0, 0.0, 0.0)
-    glutSolidSphere(ball_radius, 32, 32)
+        gfx.color(1.0, 0.0, 0.0)
+    gfx.solid_sphere(ball_radius, quality['ball_detail'], quality['ball_detail'])
     if shield_active:
-        glColor4f(0.0, 0.8, 1.0, 0.3)
-        glEnable(GL_BLEND)
-        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
-        glutWireSphere(ball_radius + 5, 16, 16)
-        glDisable(GL_BLEND)
-    glPopMatrix()
+        gfx.color_alpha(0.0, 0.8, 1.0, 0.3)
+        gfx.enable_blend()
+        gfx.wire_sphere(ball_radius + 5, 16, 16)
+        gfx.disable_blend()
+    gfx.pop_matrix()
 
 def draw_shields():
     for shield in shields:
         if not shield['collected']:
-            glPushMatrix()
+            gfx.push_matrix()
             x, y, z = shield['pos']
-            glTranslatef(x, y, z + 5 * math.sin(time.time() * 2))
-            shield['rotation'] += 2.0
-            glRotatef(shield['rotation'], 0, 0, 1)
-            glColor3f(0.0, 1.0, 1.0)
-            glutSolidCube(20)
-            glColor3f(1.0, 1.0, 1.0)
-            glBegin(GL_LINE_LOOP)
+            gfx.translate(x, y, z + 5 * math.sin(clock.now * 2))
+            gfx.rotate(shield['rotation'], 0, 0, 1)
+            gfx.color(0.0, 1.0, 1.0)
+            gfx.solid_cube(20)
+            gfx.color(1.0, 1.0, 1.0)
+            gfx.begin(GL_LINE_LOOP)
             for i in range(8):
                 angle = i * math.pi / 4
-                glVertex3f(math.cos(angle) * 8, math.sin(angle) * 8, 12)
-            glEnd()
-            glPopMatrix()
+                gfx.vertex(math.cos(angle) * 8, math.sin(angle) * 8, 12)
+            gfx.end()
+            gfx.pop_matrix()
 
 def draw_ui():
     glMatrixMode(GL_PROJECTION)
@@ -788,6 +2874,35 @@ def draw_ui():
     glPushMatrix()
     glLoadIdentity()
     glDisable(GL_DEPTH_TEST)
+    draw_hud()
+    glEnable(GL_DEPTH_TEST)
+    glPopMatrix()
+    glMatrixMode(GL_PROJECTION)
+    glPopMatrix()
+    glMatrixMode(GL_MODELVIEW)
+
+hud_list = None
+hud_last_update = 0.0
+
+def draw_hud():
+    """Replays the last recorded HUD until the quality level's update interval passes"""
+    global hud_list, hud_last_update
+    interval = quality['hud_interval']
+    if interval <= 0:
+        draw_hud_text()
+        return
+    now = clock.real
+    if hud_list is not None and now - hud_last_update < interval:
+        glCallList(hud_list)
+        return
+    if hud_list is None:
+        hud_list = glGenLists(1)
+    hud_last_update = now
+    glNewList(hud_list, GL_COMPILE_AND_EXECUTE)
+    draw_hud_text()
+    glEndList()
+
+def draw_hud_text():
     glColor3f(1, 1, 1)
     glRasterPos2f(10, WINDOW_HEIGHT - 25)
     if current_round >= 5:
@@ -797,7 +2912,7 @@ def draw_ui():
         glutBitmapCharacter(GLUT_BITMAP_HELVETICA_18, ord(ch))
     time_left = max(0, bounce_time_limit - bounce_timer)
     if time_left <= 3.0:
-        pulse = 0.5 + 0.5 * math.sin(time.time() * 8)
+        pulse = 0.5 + 0.5 * math.sin(clock.now * 8)
         glColor3f(pulse, 0.2, 0.2)
     elif time_left <= 5.0:
         glColor3f(1.0, 0.6, 0.0)
@@ -807,14 +2922,14 @@ def draw_ui():
     bounce_text = f" BOUNCE TIMER: {time_left:.1f}s / {bounce_time_limit:.0f}s ⚡"
     for ch in bounce_text:
         glutBitmapCharacter(GLUT_BITMAP_HELVETICA_18, ord(ch))
-    elapsed_time = time.time() - game_start_time
+    elapsed_time = clock.now - game_start_time
     glColor3f(0.8, 0.8, 0.8)
     glRasterPos2f(10, WINDOW_HEIGHT - 75)
     timer_text = f"Time: {elapsed_time:.1f}s"
     for ch in timer_text:
         glutBitmapCharacter(GLUT_BITMAP_HELVETICA_12, ord(ch))
     if current_round >= 5:
-        pulse = 0.5 + 0.5 * math.sin(time.time() * 6)
+        pulse = 0.5 + 0.5 * math.sin(clock.now * 6)
         glColor3f(pulse, 0.2, 0.2)
         glRasterPos2f(10, WINDOW_HEIGHT - 100)
         warning_text = " FINAL ROUND! ALL BOUNDARY TREES ARE ACTIVE!"
@@ -850,12 +2965,6 @@ def draw_ui():
         pause_instruction = "Press P to resume"
         for ch in pause_instruction:
             glutBitmapCharacter(GLUT_BITMAP_HELVETICA_18, ord(ch))
-    
-    glEnable(GL_DEPTH_TEST)
-    glPopMatrix()
-    glMatrixMode(GL_PROJECTION)
-    glPopMatrix()
-    glMatrixMode(GL_MODELVIEW)
 
 def draw_game_over():
     if game_over:
@@ -928,15 +3037,14 @@ def update_obstacles(dt):
         if o['current_size'] <= o['min_size']:
             o['current_size'] = o['base_size']
         float_intensity = 1.0 + current_round * 0.3
-        o['pos'][2] = o['float_height'] + 15 * math.sin(time.time() * o['float_speed'] * float_intensity + o['float_offset'])
+        o['pos'][2] = o['float_height'] + 15 * math.sin(clock.hazard_now * o['float_speed'] * float_intensity + o['float_offset'])
 
 def apply_special_effect(effect):
     global speed_multiplier, lives, shield_active, shield_duration, max_tile_time, score
     if effect == 'speed_boost':
         speed_multiplier += 0.3
     elif effect == 'slow_time':
-        for o in obstacles:
-            o['vel'] *= 0.6
+        clock.hazard_scale *= 0.6
     elif effect == 'extra_life':
         lives += 1
     elif effect == 'shield':
@@ -959,20 +3067,19 @@ def check_tile_effects():
         max_tile_time = base_time
 
 def update():
-    global time_last, ball_pos, ball_vel, jumping, jump_start_time, score, lives
+    global ball_pos, ball_vel, jumping, jump_start_time, score, lives
     global game_over, last_tile, time_on_tile, show_timer, game_won, speed_multiplier
     global shield_active, shield_duration, difficulty_timer, difficulty_mode, game_paused
     global max_shield_duration, obstacles, tree_obstacles, projectiles, collectibles
     global special_collectibles, shields, max_tile_time, current_round, boundary_trees
     global obstacle_speed_multiplier, bounce_timer, bounce_time_limit, last_bounce_time
-    global small_obstacle_trees
+    global small_obstacle_trees, death_cause
 
     if game_paused:
         return
 
-    now = time.time()
-    dt = now - time_last
-    time_last = now
+    now = clock.now
+    dt = clock.dt
 
     if game_over or game_won:
         return
@@ -1042,6 +3149,7 @@ def update():
                 shield_duration = 0.0
             else:
                 lives -= 1
+                death_cause = DEATH_CAUSES.index('obstacle')
                 if lives <= 0:
                     game_over = True
                     return
@@ -1053,8 +3161,8 @@ def update():
                     reset_bounce_timer()
             break
 
-    update_tree_obstacles(dt)
-    update_projectiles(dt)
+    update_tree_obstacles(clock.hazard_dt)
+    update_projectiles(clock.hazard_dt)
 
     for proj in projectiles[:]:
         dx = ball_pos[0] - proj['pos'][0]
@@ -1068,6 +3176,7 @@ def update():
                 projectiles.remove(proj)
             else:
                 lives -= 1
+                death_cause = DEATH_CAUSES.index('projectile')
                 if lives <= 0:
                     game_over = True
                     return
@@ -1103,6 +3212,7 @@ def update():
             show_timer = True
             if time_on_tile >= max_tile_time:
                 lives -= 1
+                death_cause = DEATH_CAUSES.index('tile_timer')
                 time_on_tile = 0.0
                 last_tile = None
                 show_timer = False
@@ -1125,6 +3235,7 @@ def update():
             shield_duration = 0.0
         else:
             lives -= 1
+            death_cause = DEATH_CAUSES.index('hole')
             if lives <= 0:
                 game_over = True
             else:
@@ -1132,7 +3243,7 @@ def update():
                 ball_vel[:] = [0.0, 0.0, 0.0]
                 reset_bounce_timer()
 
-    update_obstacles(dt)
+    update_obstacles(clock.hazard_dt)
 
     remaining_collectibles = []
     for c in collectibles:
@@ -1170,7 +3281,43 @@ def update():
 
     update_round_progression()
 
-def display():
+last_display_time = None
+
+def animate_pickups(dt):
+    """Spin and pulse rates are per second; at 60 fps they match the old per-frame steps"""
+    for c in collectibles:
+        c['rotation'] += 120.0 * dt
+    for sc in special_collectibles:
+        sc['glow'] += 6.0 * dt
+        sc['rotation'] += 180.0 * dt
+    for o in obstacles:
+        o['pulse'] += 6.0 * o['aggressiveness'] * dt
+    for shield in shields:
+        shield['rotation'] += 120.0 * dt
+
+def step_simulation():
+    clock.tick()
+    if allocation_tracker is not None:
+        allocation_tracker.frame += 1
+    if not game_paused:  # Only update if game is not paused
+        if threat_field is not None:
+            with allocation_stage('threat'):
+                threat_field.update()
+        if bot is not None:
+            with allocation_stage('bot'):
+                bot.act()
+        with allocation_stage('update'):
+            update()
+        if not game_over:
+            with allocation_stage('snapshot'):
+                record_snapshot()
+    with allocation_stage('animate'):
+        animate_pickups(clock.dt)
+
+def render_frame():
+    render_scale = quality['render_scale'] if scene_framebuffer is not None else 1.0
+    if render_scale < 1.0:
+        scene_framebuffer.bind(max(1, int(WINDOW_WIDTH * render_scale)), max(1, int(WINDOW_HEIGHT * render_scale)))
     setup_scene()
     draw_floor()
     draw_walls()
@@ -1184,22 +3331,398 @@ def display():
     draw_shields()
     draw_obstacles()
     draw_ball()
-    draw_ui()
-    draw_game_over()
-    draw_win_message()
+    gfx.end_frame()
+    if show_threat_overlay and threat_field is not None and not core_profile:
+        threat_field.draw_overlay()
+    if render_scale < 1.0:
+        scene_framebuffer.resolve()
+    if hud_enabled:
+        draw_ui()
+        draw_game_over()
+        draw_win_message()
+    if frame_capture is not None:
+        frame_capture.capture()
+
+def display():
+    global last_display_time
+    frame_start = time.perf_counter()
+    if governor is not None and last_display_time is not None:
+        governor.observe(frame_start - last_display_time, frame_start)
+    if telemetry is not None and last_display_time is not None:
+        telemetry.record(frame_start - last_display_time)
+    last_display_time = frame_start
+    with allocation_stage('render'):
+        render_frame()
     glutSwapBuffers()
+    if sim_link is not None:
+        sim_link.presented(time.perf_counter())
+    if benchmark_frames is not None:
+        report_frame_time(time.perf_counter() - frame_start)
+
+benchmark_frames = None
+benchmark_interval = 5.0
+
+def report_frame_time(frame_time):
+    global benchmark_frames
+    benchmark_frames.append(frame_time)
+    if sum(benchmark_frames) >= benchmark_interval:
+        frames = sorted(benchmark_frames)
+        print(f" [{gfx.name}, quality {quality['name']}] {len(frames)} frames, mean {1000 * sum(frames) / len(frames):.2f} ms, "
+              f"p95 {1000 * frames[int(len(frames) * 0.95)]:.2f} ms")
+        if sim_link is not None and sim_link.latency_report():
+            mean, p95 = sim_link.latency_report()
+            print(f"   input latency mean {1000 * mean:.1f} ms, p95 {1000 * p95:.1f} ms")
+        if isinstance(gfx, RenderQueue):
+            stats = gfx.stats
+            print(f"   {stats['items']} draw items in {stats['batches']} batches, "
+                  f"{stats['state_changes']} state changes ({stats['unsorted_state_changes']} unsorted)")
+        if allocation_tracker is not None:
+            allocation_tracker.report()
+        benchmark_frames = []
+
+# Telemetry file: a header, then a ring of fixed-size per-frame records.  The
+# frame number inside each record orders the ring, so a frame costs one
+# pack_into and readers find the newest record themselves.
+TELEMETRY_MAGIC = b'TTM2'
+telemetry_header = struct.Struct('<4sII')  # magic, record size, capacity
+telemetry_record = struct.Struct('<QdfHHHHbBBBBxII')
+telemetry_offset = 64
+TELEMETRY_HITCH, TELEMETRY_PAUSED, TELEMETRY_GAME_OVER = 1, 2, 4
+
+class TelemetryWriter:
+    """Per-frame counters appended to a memory-mapped ring file.
+
+    Records hold the frame time, entity counts, lives and lives lost with
+    the cause of the last death, the current round, draw batches submitted
+    by the renderer, GL entry point calls and a hitch flag for frames over
+    `hitch_threshold` seconds.  GL calls are only counted when PyOpenGL's
+    call profiler is on (PYOPENGL_PROFILE_CALLS), and are 0 otherwise.
+    Readers can tail the file while the game is running.
+    """
+
+    def __init__(self, path, capacity=65536, hitch_threshold=2 / 60):
+        import mmap
+        self.capacity = capacity
+        self.hitch_threshold = hitch_threshold
+        size = telemetry_offset + capacity * telemetry_record.size
+        with open(path, 'w+b') as f:
+            f.truncate(size)
+            self.map = mmap.mmap(f.fileno(), size)
+        telemetry_header.pack_into(self.map, 0, TELEMETRY_MAGIC, telemetry_record.size, capacity)
+        self.frame = 0
+        self.last_lives = lives
+
+    def record(self, frame_time):
+        self.frame += 1
+        lost = max(0, self.last_lives - lives)
+        self.last_lives = lives
+        flags = ((frame_time > self.hitch_threshold) * TELEMETRY_HITCH | game_paused * TELEMETRY_PAUSED
+                 | game_over * TELEMETRY_GAME_OVER)
+        stats = getattr(gfx, 'stats', None)
+        gl_calls = gl_profiler.frames[-1][1] if gl_profiler is not None and gl_profiler.frames else 0
+        telemetry_record.pack_into(
+            self.map, telemetry_offset + (self.frame % self.capacity) * telemetry_record.size,
+            self.frame, time.time(), frame_time, len(obstacles), len(projectiles),
+            len(tree_obstacles) + len(small_obstacle_trees) + len(boundary_trees),
+            len(collectibles) + len(special_collectibles) + len(shields),
+            lives, lost, death_cause if lost else 0, current_round, flags,
+            stats['batches'] if stats else 0, gl_calls)
+
+    def close(self):
+        self.map.close()
+
+def read_telemetry(path):
+    """All records in the ring, oldest first"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    magic, size, capacity = telemetry_header.unpack_from(data, 0)
+    if magic != TELEMETRY_MAGIC or size != telemetry_record.size:
+        raise ValueError(f"{path} is not a telemetry file")
+    records = [record for record in telemetry_record.iter_unpack(
+        data[telemetry_offset:telemetry_offset + capacity * size]) if record[0]]
+    records.sort()
+    return records
+
+def summarize_telemetry(records):
+    if not records:
+        print(" No telemetry recorded")
+        return
+    times = sorted(record[2] for record in records)
+    minutes = max((records[-1][1] - records[0][1]) / 60, 1e-9)
+    hitches = sum(1 for record in records if record[11] & TELEMETRY_HITCH)
+    print(f" {len(records)} frames over {60 * minutes:.1f}s (frames {records[0][0]}-{records[-1][0]})")
+    print("   frame time " + ", ".join(
+        f"p{p} {1000 * times[min(len(times) - 1, int(len(times) * p / 100))]:.2f} ms" for p in (50, 90, 95, 99))
+          + f", max {1000 * times[-1]:.2f} ms")
+    print(f"   {hitches} hitches, {hitches / minutes:.1f} per minute")
+    deaths = collections.Counter()
+    for record in records:
+        if record[8]:
+            deaths[DEATH_CAUSES[record[9]]] += record[8]
+    if deaths:
+        print("   lives lost: " + ", ".join(f"{cause} {count}" for cause, count in deaths.most_common()))
+    print(f"   peak entities: {max(r[4] for r in records)} projectiles, {max(r[3] for r in records)} obstacles, "
+          f"mean {sum(r[12] for r in records) / len(records):.0f} draw batches, "
+          f"{sum(r[13] for r in records) / len(records):.0f} GL calls")
+
+def tail_telemetry(path, interval=0.5):
+    last = 0
+    while True:
+        for record in read_telemetry(path):
+            if record[0] > last:
+                last = record[0]
+                frame, stamp, frame_time, obstacle_count, projectile_count, trees, pickups, life, lost, cause, \
+                    round_number, flags, draw_batches, gl_calls = record
+                print(f"{frame:8d} {1000 * frame_time:7.2f} ms  round {round_number} lives {life}"
+                      f"  {obstacle_count} obst {projectile_count} proj {draw_batches} batches {gl_calls} calls"
+                      + ("  HITCH" if flags & TELEMETRY_HITCH else "")
+                      + (f"  lost {lost} ({DEATH_CAUSES[cause]})" if lost else ""))
+        time.sleep(interval)
+
+telemetry = None
+
+# PyOpenGL's call profiler files a frame at every glutSwapBuffers; headless
+# runs have no swap and file their frames themselves
+from OpenGL import _configflags
+if _configflags.PROFILE_CALLS or _configflags.PROFILE_TIMING:
+    from OpenGL.profiler import profiler as gl_profiler
+else:
+    gl_profiler = None
+
+class AllocationStage:
+    """Context manager measuring one stage of the frame for AllocationTracker"""
+
+    def __init__(self, tracker, name):
+        self.tracker = tracker
+        self.name = name
+        self.frames = 0
+        self.objects = 0
+        self.net_bytes = 0
+        self.peak_bytes = 0
+        self.clean_frames = 0
+        self.top = []
+
+    def __enter__(self):
+        tracker = self.tracker
+        self.sampling = tracker.frame % tracker.snapshot_interval == 0
+        if self.sampling:
+            self.before = tracker.tracemalloc.take_snapshot()
+        tracker.tracemalloc.reset_peak()
+        self.start_bytes = tracker.tracemalloc.get_traced_memory()[0]
+        self.start_objects = tracker.gc_objects()
+        return self
+
+    def __exit__(self, *exc):
+        tracker = self.tracker
+        objects = tracker.gc_objects() - self.start_objects
+        current, peak = tracker.tracemalloc.get_traced_memory()
+        self.frames += 1
+        self.objects += objects
+        self.net_bytes += current - self.start_bytes
+        self.peak_bytes = max(self.peak_bytes, peak - self.start_bytes)
+        self.clean_frames += objects <= 0 and peak == self.start_bytes
+        if self.sampling:
+            after = tracker.tracemalloc.take_snapshot().filter_traces(tracker.filters)
+            stats = after.compare_to(self.before.filter_traces(tracker.filters), 'lineno')
+            stats = [stat for stat in stats if stat.size_diff > 0 and not tracker.is_own(stat.traceback[0])]
+            self.top = [(str(stat.traceback[0]), stat.count_diff, stat.size_diff)
+                        for stat in stats[:tracker.top_count]]
+            self.top_frame = tracker.frame
+
+class AllocationTracker:
+    """Allocation and garbage collection accounting per frame stage.
+
+    Each stage records the GC-tracked objects it leaves allocated (what
+    drives generation 0 collections), its net and peak traced bytes and how
+    many frames it allocated nothing at all.  Every `snapshot_interval`
+    frames the stages also diff tracemalloc snapshots to name the lines
+    responsible.  Collections are timed through gc.callbacks and logged
+    against the frame they interrupted.
+    """
+
+    def __init__(self, snapshot_interval=300, top_count=3, frames=1):
+        import gc, tracemalloc
+        self.gc = gc
+        self.tracemalloc = tracemalloc
+        tracemalloc.start(frames)
+        self.filters = [tracemalloc.Filter(False, tracemalloc.__file__)]
+        import inspect
+        self.own_lines = set()
+        for cls in (AllocationStage, AllocationTracker):
+            lines, first = inspect.getsourcelines(cls)
+            self.own_lines.update(range(first, first + len(lines)))
+        self.snapshot_interval = snapshot_interval
+        self.top_count = top_count
+        self.frame = 0
+        self.stages = {}
+        self.collected = 0
+        self.pauses = []
+        self.pause_start = None
+        gc.callbacks.append(self.on_gc)
+
+    def stage(self, name):
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages[name] = AllocationStage(self, name)
+        return stage
+
+    def is_own(self, frame):
+        """True for allocations made by the measurements themselves"""
+        return frame.filename == __file__ and frame.lineno in self.own_lines
+
+    def gc_objects(self):
+        # The generation 0 count restarts at every collection, so add what was collected
+        return self.gc.get_count()[0] + self.collected
+
+    def on_gc(self, phase, info):
+        if phase == 'start':
+            self.collected += self.gc.get_count()[0]
+            self.pause_start = time.perf_counter()
+        elif self.pause_start is not None:
+            self.pauses.append((self.frame, info['generation'], time.perf_counter() - self.pause_start,
+                                info['collected']))
+            self.pause_start = None
+
+    def report(self):
+        frames = max((stage.frames for stage in self.stages.values()), default=0)
+        if not frames:
+            return
+        print(f"   allocations per frame over {frames} frames (GC-tracked objects, net bytes, peak bytes):")
+        for stage in self.stages.values():
+            count = max(stage.frames, 1)
+            print(f"     {stage.name:<10} {stage.objects / count:7.1f} objects {stage.net_bytes / count:9.0f} B "
+                  f"{stage.peak_bytes:9d} B peak, {100 * stage.clean_frames / count:.0f}% allocation-free")
+            for where, blocks, size in stage.top:
+                print(f"       frame {stage.top_frame}: {where} +{blocks} blocks, +{size} B")
+            stage.frames = stage.objects = stage.net_bytes = stage.peak_bytes = stage.clean_frames = 0
+        if self.pauses:
+            generations = collections.Counter(generation for _, generation, _, _ in self.pauses)
+            frame, generation, longest, collected = max(self.pauses, key=lambda pause: pause[2])
+            print(f"   {len(self.pauses)} collections ("
+                  + ", ".join(f"gen{g} {n}" for g, n in sorted(generations.items()))
+                  + f"), {1000 * sum(p[2] for p in self.pauses):.2f} ms total, longest {1000 * longest:.2f} ms "
+                  f"(gen{generation}, {collected} collected) in frame {frame}")
+        self.pauses = []
+
+    def stop(self):
+        self.gc.callbacks.remove(self.on_gc)
+        self.tracemalloc.stop()
+
+allocation_tracker = None
+
+class UntrackedStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+untracked_stage = UntrackedStage()
+
+def allocation_stage(name):
+    return untracked_stage if allocation_tracker is None else allocation_tracker.stage(name)
 
 def idle():
     """Idle function that runs continuously - fixed pause functionality"""
-    if not game_paused:  # Only update if game is not paused
-        update()
+    if sim_link is not None:
+        clock.tick()
+        if allocation_tracker is not None:
+            allocation_tracker.frame += 1
+        with allocation_stage('sync'):
+            sim_link.sync()
+    else:
+        step_simulation()
     glutPostRedisplay()
 
+shutdown_requested = False
+game_loop_running = False
+background_tasks = []
+pending_background = []
+
+def request_shutdown():
+    """Stop the main loop; shutdown() runs once it has returned"""
+    global shutdown_requested
+    shutdown_requested = True
+    if game_loop_running:
+        return
+    if HAVE_FREEGLUT:
+        glutLeaveMainLoop()
+    else:
+        # Classic GLUT never returns from glutMainLoop
+        shutdown()
+        sys.exit()
+
+def shutdown():
+    """Release everything that outlives the window"""
+    global sim_link, frame_capture, telemetry, allocation_tracker
+    if sim_link is not None:
+        sim_link.stop()
+        sim_link = None
+    if frame_capture is not None:
+        frame_capture.finish()
+        frame_capture = None
+    if telemetry is not None:
+        telemetry.close()
+        telemetry = None
+    if allocation_tracker is not None:
+        allocation_tracker.stop()
+        allocation_tracker = None
+
+def spawn_background(coroutine):
+    """Run a coroutine alongside the game on its event loop until shutdown"""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        pending_background.append(coroutine)
+        return None
+    task = loop.create_task(coroutine)
+    background_tasks.append(task)
+    return task
+
+async def run_game_loop(rate=0):
+    """Pump GLUT events and frames from a coroutine, `rate` frames per second (0 for unthrottled)
+
+    Each pass steps the game and posts a redisplay like idle() under
+    glutMainLoop, lets glutMainLoopEvent dispatch input and display, then
+    yields to the other tasks until the next frame is due.
+    """
+    global game_loop_running
+    game_loop_running = True
+    while pending_background:
+        spawn_background(pending_background.pop(0))
+    interval = 1.0 / rate if rate else 0.0
+    next_frame = time.perf_counter()
+    try:
+        while not shutdown_requested:
+            idle()
+            glutMainLoopEvent()
+            now = time.perf_counter()
+            next_frame = max(next_frame + interval, now)
+            await asyncio.sleep(next_frame - now)
+    finally:
+        game_loop_running = False
+        for task in background_tasks:
+            task.cancel()
+        await asyncio.gather(*background_tasks, return_exceptions=True)
+        background_tasks.clear()
+
+def toggle_threat_overlay():
+    global threat_field, show_threat_overlay
+    show_threat_overlay = not show_threat_overlay
+    if threat_field is None:
+        threat_field = ThreatField()
+
 def keyboard(k, x, y):
-    global space_pressed, theme, difficulty_timer, difficulty_mode, speed_multiplier, game_paused, time_last
+    global space_pressed, theme, difficulty_timer, difficulty_mode, speed_multiplier, game_paused
     
     if k == b'\x1b':
-        sys.exit()
+        request_shutdown()
+        return
+    if sim_link is not None:
+        sim_link.send_key(k, True)
+        if k == b't':
+            theme = "dark" if theme == "default" else "default"
+        return
     if k == b' ':
         if not game_paused:
             space_pressed = True
@@ -1208,16 +3731,24 @@ def keyboard(k, x, y):
             move_keys[k.decode()] = True
     if k == b'r':   
         reset_game()
+    if k == b'b':
+        rewind_game()
+    if k == b'k':
+        dump_snapshots()
+    if k == b'o':
+        toggle_threat_overlay()
     if k == b't': 
         theme = "dark" if theme == "default" else "default"
     if k == b'p':
         game_paused = not game_paused
-        if not game_paused:
-            time_last = time.time()
+        clock.paused = game_paused
 
 def keyboard_up(k, x, y):
     global space_pressed
     
+    if sim_link is not None:
+        sim_link.send_key(k, False)
+        return
     if k == b' ':
         space_pressed = False
     if k in [b'a', b'd', b'w', b's']:
@@ -1249,7 +3780,285 @@ def mouse(button, state, x, y):
         camera_distance = 500.0
         camera_angle = 0
 
+def write_png(path, width, height, pixels):
+    """RGBA rows from glReadPixels are bottom-up; PNG wants them top-down"""
+    stride = width * 4
+    rows = b''.join(b'\x00' + pixels[y * stride:(y + 1) * stride] for y in range(height - 1, -1, -1))
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+    with open(path, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n')
+        f.write(chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0)))
+        f.write(chunk(b'IDAT', zlib.compress(rows, 6)))
+        f.write(chunk(b'IEND', b''))
+
+def write_raw(path, width, height, pixels):
+    with open(path, 'wb') as f:
+        f.write(pixels)
+
+class FrameCapture:
+    """Records every rendered frame to disk without stalling on readback.
+
+    glReadPixels goes into one of a ring of pixel-pack buffers and returns
+    at once; a buffer is only mapped once two newer reads are queued behind
+    it, so frame N is copied out while N+2 is being drawn.  Encoding runs on
+    a thread pool (zlib releases the GIL).  Without pixel buffer objects it
+    falls back to a plain synchronous glReadPixels.
+
+    At most ring_size frames wait for the encoder.  When it falls further
+    behind, capture either waits for the oldest encode (the default, no
+    frame is lost) or, with drop=True, cancels the oldest one that has not
+    started; both are counted.
+    """
+    ring_size = 3
+
+    def __init__(self, directory, width, height, fmt='png', workers=2, drop=False):
+        from OpenGL import extensions
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.writer = write_png if fmt == 'png' else write_raw
+        self.extension = 'png' if fmt == 'png' else 'rgba'
+        self.pool = concurrent.futures.ThreadPoolExecutor(workers)
+        self.futures = collections.deque()
+        self.drop = drop
+        self.dropped = 0
+        self.stalls = 0
+        self.use_pbo = bool(extensions.hasGLExtension('GL_VERSION_GL_2_1') or
+                            extensions.hasGLExtension('GL_ARB_pixel_buffer_object'))
+        self.pbos = list(glGenBuffers(self.ring_size)) if self.use_pbo else []
+        self.pending = collections.deque()
+        self.frame = 0
+        self.resize(width, height)
+
+    def resize(self, width, height):
+        self.flush()
+        self.width, self.height = width, height
+        self.size = width * height * 4
+        for pbo in self.pbos:
+            glBindBuffer(GL_PIXEL_PACK_BUFFER, pbo)
+            glBufferData(GL_PIXEL_PACK_BUFFER, self.size, None, GL_STREAM_READ)
+            glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+
+    def capture(self):
+        glPixelStorei(GL_PACK_ALIGNMENT, 1)
+        if not self.use_pbo:
+            pixels = glReadPixels(0, 0, self.width, self.height, GL_RGBA, GL_UNSIGNED_BYTE)
+            self.submit(self.frame, pixels, self.width, self.height)
+            self.frame += 1
+            return
+        pbo = self.pbos[self.frame % self.ring_size]
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, pbo)
+        glReadPixels(0, 0, self.width, self.height, GL_RGBA, GL_UNSIGNED_BYTE, 0)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        self.pending.append((self.frame, pbo))
+        self.frame += 1
+        while len(self.pending) >= self.ring_size:
+            self.collect()
+
+    def collect(self):
+        frame, pbo = self.pending.popleft()
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, pbo)
+        pointer = glMapBuffer(GL_PIXEL_PACK_BUFFER, GL_READ_ONLY)
+        pixels = ctypes.string_at(pointer, self.size)
+        glUnmapBuffer(GL_PIXEL_PACK_BUFFER)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        self.submit(frame, pixels, self.width, self.height)
+
+    def submit(self, frame, pixels, width, height):
+        while self.futures and self.futures[0].done():
+            self.futures.popleft().result()
+        if len(self.futures) >= self.ring_size:
+            if self.drop and self.drop_oldest():
+                self.dropped += 1
+            else:
+                self.stalls += 1
+                self.futures.popleft().result()
+        path = os.path.join(self.directory, f"frame_{frame:06d}.{self.extension}")
+        self.futures.append(self.pool.submit(self.writer, path, width, height, pixels))
+
+    def drop_oldest(self):
+        """Cancel the oldest encode which has not started yet"""
+        for future in self.futures:
+            if future.cancel():
+                self.futures.remove(future)
+                return True
+        return False
+
+    def flush(self):
+        while self.pending:
+            self.collect()
+
+    def finish(self):
+        self.flush()
+        self.pool.shutdown(wait=True)
+        for future in self.futures:
+            future.result()
+        print(f" Captured {self.frame - self.dropped} frames to {self.directory}, "
+              f"{self.dropped} dropped, {self.stalls} encoder stalls")
+
+frame_capture = None
+hud_enabled = True
+core_profile = False
+
+def create_osmesa_context():
+    """Offscreen context for headless runs; the buffer must outlive the context"""
+    from OpenGL import osmesa, arrays
+    context = osmesa.OSMesaCreateContextExt(osmesa.OSMESA_RGBA, 24, 0, 0, None)
+    buffer = arrays.GLubyteArray.zeros((WINDOW_HEIGHT, WINDOW_WIDTH, 4))
+    if not context or not osmesa.OSMesaMakeCurrent(context, buffer, GL_UNSIGNED_BYTE, WINDOW_WIDTH, WINDOW_HEIGHT):
+        raise RuntimeError("could not create an OSMesa context")
+    return context, buffer
+
+def parse_args(argv):
+    import argparse
+    parser = argparse.ArgumentParser(description="Enhanced Tile Tumble")
+    parser.add_argument('--renderer', choices=['fixed', 'mesh', 'shader'], default=None,
+                        help="fixed-function immediate mode (default), fixed-function without "
+                             "GLUT solids (default when headless) or the shader/VBO path")
+    parser.add_argument('--core-profile', action='store_true',
+                        help="with --renderer=shader, ask GLUT for a 3.3 core context; the HUD "
+                             "and threat overlay draw with fixed-function calls and are left out")
+    parser.add_argument('--render-queue', action='store_true',
+                        help="sort and batch draws by render state before submitting them")
+    parser.add_argument('--frame-budget', type=float, default=1000 / 60,
+                        help="target frame time in milliseconds for the quality governor")
+    parser.add_argument('--quality', choices=[level['name'] for level in QUALITY_LEVELS],
+                        help="pin a quality level instead of adapting it to the frame budget")
+    parser.add_argument('--adaptive-resolution', action='store_true',
+                        help="let the quality level lower the 3D render resolution")
+    parser.add_argument('--threaded-sim', type=int, metavar='HZ', nargs='?', const=60,
+                        help="run the simulation in its own process at a fixed rate (default 60 Hz)")
+    parser.add_argument('--headless', type=int, metavar='FRAMES',
+                        help="render FRAMES frames offscreen through OSMesa instead of opening a window")
+    parser.add_argument('--capture', metavar='DIR',
+                        help="write every rendered frame to DIR")
+    parser.add_argument('--capture-format', choices=['png', 'raw'], default='png')
+    parser.add_argument('--capture-workers', type=int, default=2)
+    parser.add_argument('--capture-drop', action='store_true',
+                        help="drop frames instead of waiting when encoding falls behind")
+    parser.add_argument('--bot', action='store_true',
+                        help="let a navigation bot play instead of the keyboard")
+    parser.add_argument('--benchmark', action='store_true',
+                        help="print display() timings every few seconds")
+    parser.add_argument('--layouts', metavar='FILE',
+                        help="take round layouts from a library written by --build-layouts")
+    parser.add_argument('--seed', type=int,
+                        help="always pick the library layout for this seed")
+    parser.add_argument('--build-layouts', metavar='FILE',
+                        help="pregenerate a layout library into FILE and exit")
+    parser.add_argument('--layouts-per-round', type=int, default=1024)
+    parser.add_argument('--telemetry', metavar='FILE',
+                        help="record per-frame telemetry into a ring file")
+    parser.add_argument('--telemetry-frames', type=int, default=65536,
+                        help="number of frames the telemetry ring keeps")
+    parser.add_argument('--track-allocations', type=int, metavar='FRAMES', nargs='?', const=300,
+                        help="report allocations and GC pauses per frame stage with the benchmark output, "
+                             "diffing tracemalloc snapshots every FRAMES frames (default 300)")
+    parser.add_argument('--gc-freeze', action='store_true',
+                        help="move everything alive after level generation out of the collector's reach")
+    parser.add_argument('--fps', type=float, default=0,
+                        help="frame rate of the asyncio main loop (default: as fast as possible)")
+    parser.add_argument('--glut-main-loop', action='store_true',
+                        help="hand control to glutMainLoop instead of running an asyncio loop")
+    parser.add_argument('--serve', metavar='ADDRESS',
+                        help="run the simulation as a network server on host:port or unix:/path")
+    parser.add_argument('--serve-rate', type=int, default=60, help="server tick rate in Hz")
+    parser.add_argument('--test-clients', type=int, default=0,
+                        help="with --serve, connect this many loopback test clients and exit after --test-seconds")
+    parser.add_argument('--test-seconds', type=float, default=10.0)
+    parser.add_argument('--connect', metavar='ADDRESS',
+                        help="render a game simulated by a --serve server")
+    parser.add_argument('--read-telemetry', metavar='FILE',
+                        help="summarize a telemetry file and exit")
+    parser.add_argument('--follow', action='store_true',
+                        help="with --read-telemetry, print frames as they are recorded")
+    return parser.parse_args(argv)
+
+def setup_rendering(args):
+    global gfx, benchmark_frames, quality, governor, scene_framebuffer, frame_capture, telemetry
+    global allocation_tracker, core_profile
+    core_profile = args.core_profile
+    glEnable(GL_DEPTH_TEST)
+    if args.renderer != 'shader':
+        # ShaderRenderer lights in its own program
+        glEnable(GL_LIGHTING)
+        glEnable(GL_LIGHT0)
+        glEnable(GL_COLOR_MATERIAL)
+    if args.renderer == 'shader':
+        gfx = ShaderRenderer()
+    elif args.renderer == 'mesh':
+        gfx = MeshRenderer()
+    if args.render_queue:
+        gfx = RenderQueue(gfx)
+    if args.quality:
+        quality = next(level for level in QUALITY_LEVELS if level['name'] == args.quality)
+    elif args.headless is None:
+        governor = QualityGovernor(args.frame_budget / 1000)
+    if args.adaptive_resolution:
+        scene_framebuffer = SceneFramebuffer()
+    if args.capture:
+        frame_capture = FrameCapture(args.capture, WINDOW_WIDTH, WINDOW_HEIGHT,
+                                     args.capture_format, args.capture_workers, args.capture_drop)
+    if args.benchmark or args.track_allocations:
+        benchmark_frames = []
+    if args.track_allocations:
+        allocation_tracker = AllocationTracker(args.track_allocations)
+    if args.telemetry:
+        telemetry = TelemetryWriter(args.telemetry, args.telemetry_frames, 2 * args.frame_budget / 1000)
+
+def main_headless(args):
+    global hud_enabled
+    hud_enabled = False  # bitmap fonts need GLUT
+    if args.renderer is None:
+        args.renderer = 'mesh'
+    context, buffer = create_osmesa_context()
+    setup_rendering(args)
+    setup_projection()
+    clock.simulate(1.0 / 60)
+    reset_game()
+    for _ in range(args.headless):
+        step_simulation()
+        frame_start = time.perf_counter()
+        with allocation_stage('render'):
+            render_frame()
+        glFinish()
+        if gl_profiler is not None:
+            gl_profiler.frame()
+        if telemetry is not None:
+            telemetry.record(time.perf_counter() - frame_start)
+        if benchmark_frames is not None:
+            report_frame_time(time.perf_counter() - frame_start)
+    shutdown()
+
 def main():
+    global sim_link, bot, threat_field, layout_library, layout_seed, gc_freeze_layouts, hud_enabled
+    args = parse_args(sys.argv[1:])
+    if args.core_profile and (args.renderer != 'shader' or args.headless is not None):
+        sys.exit("--core-profile needs --renderer=shader and a GLUT window")
+    gc_freeze_layouts = args.gc_freeze
+    if args.read_telemetry:
+        if args.follow:
+            tail_telemetry(args.read_telemetry)
+        else:
+            summarize_telemetry(read_telemetry(args.read_telemetry))
+        return
+    if args.build_layouts:
+        build_layout_library(args.build_layouts, args.layouts_per_round,
+                             args.seed if args.seed is not None else 0)
+        return
+    if args.layouts:
+        layout_library = LayoutLibrary(args.layouts)
+    layout_seed = args.seed
+    if args.bot and not args.threaded_sim:
+        bot = BotPolicy()
+        if np is not None:
+            threat_field = ThreatField()
+    if args.serve:
+        main_server(args)
+        return
+    if args.headless is not None:
+        main_headless(args)
+        return
     print(" === ENHANCED TILE TUMBLE - 5 ROUND CHALLENGE WITH BOUNCE TIMER ===")
     print("Controls:")
     print("  WASD - Move ball")
@@ -1258,6 +4067,9 @@ def main():
     print("  T - Toggle theme")
     print("  P - Pause/unpause")
     print("  R - Restart game")
+    print("  B - Rewind 2 seconds")
+    print("  K - Save recent snapshots to disk")
+    print("  O - Toggle the threat overlay")
     print("  ESC - Exit")
     print("\n OBJECTIVE: Survive 5 increasingly difficult rounds!")
     print("Each round: Collect 4 points to advance")
@@ -1271,19 +4083,32 @@ def main():
     print(" STRATEGY: Obstacles hurt when ON GROUND, Projectiles hurt when IN AIR!")
     print(" Win by completing all 5 rounds!\n")
     
+    if args.threaded_sim:
+        sim_link = SimulationLink()
+        sim_link.start(args.threaded_sim, args.layouts, args.seed, args.bot)
+    elif args.connect:
+        if not HAVE_FREEGLUT or args.glut_main_loop:
+            sys.exit("--connect needs freeglut's asyncio main loop")
+        sim_link = NetClient(args.connect)
+        spawn_background(sim_link.run())
     glutInit()
+    if args.renderer == 'shader':
+        # Compatibility profile unless asked otherwise, so the HUD can keep
+        # using bitmap fonts
+        glutInitContextVersion(3, 3)
+        if args.core_profile:
+            hud_enabled = False
+            glutInitContextProfile(GLUT_CORE_PROFILE)
+        else:
+            glutInitContextProfile(GLUT_COMPATIBILITY_PROFILE)
     glutInitDisplayMode(GLUT_DOUBLE | GLUT_RGB | GLUT_DEPTH)
     glutInitWindowSize(WINDOW_WIDTH, WINDOW_HEIGHT)
     glutInitWindowPosition(100, 100)
     glutCreateWindow(b"Enhanced Tile Tumble - 5 Round Challenge with Bounce Timer")
-    glEnable(GL_DEPTH_TEST)
-    glEnable(GL_LIGHTING)
-    glEnable(GL_LIGHT0)
-    glEnable(GL_COLOR_MATERIAL)
+    setup_rendering(args)
 
     glutReshapeFunc(reshape)
     glutDisplayFunc(display)
-    glutIdleFunc(idle)
     glutKeyboardFunc(keyboard)
     glutKeyboardUpFunc(keyboard_up)
     glutSpecialFunc(special_keys)
@@ -1294,7 +4119,16 @@ def main():
     print(" Game initialized! Round 1 begins!")
     print(" Collect 4 points to advance to Round 2!")
     print(" REMEMBER: Must jump every 10 seconds!")
-    glutMainLoop()
+    if HAVE_FREEGLUT and not args.glut_main_loop:
+        glutSetOption(GLUT_ACTION_ON_WINDOW_CLOSE, GLUT_ACTION_CONTINUE_EXECUTION)
+        glutCloseFunc(request_shutdown)
+        asyncio.run(run_game_loop(args.fps))
+    else:
+        if HAVE_FREEGLUT:
+            glutSetOption(GLUT_ACTION_ON_WINDOW_CLOSE, GLUT_ACTION_GLUTMAINLOOP_RETURNS)
+        glutIdleFunc(idle)
+        glutMainLoop()
+    shutdown()
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
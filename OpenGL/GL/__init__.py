@@ -1,49 +1,89 @@
 """OpenGL.GL, the core GL library and extensions to it"""
 # early import of our modules to prevent import loops...
 from OpenGL import error as _error
-from OpenGL.GL.VERSION.GL_1_1 import *
-from OpenGL.GL.pointers import *
-from OpenGL.GL.images import *
-
-from OpenGL.GL.exceptional import *
-
-from OpenGL.GL.glget import *
-
-from OpenGL.GL.VERSION.GL_1_2 import *
-from OpenGL.GL.VERSION.GL_1_3 import *
-from OpenGL.GL.VERSION.GL_1_4 import *
-from OpenGL.GL.VERSION.GL_1_5 import *
-from OpenGL.GL.VERSION.GL_2_0 import *
-from OpenGL.GL.VERSION.GL_2_1 import *
-from OpenGL.GL.VERSION.GL_3_0 import *
-from OpenGL.GL.VERSION.GL_3_1 import *
-from OpenGL.GL.VERSION.GL_3_2 import *
-from OpenGL.GL.VERSION.GL_3_3 import *
-from OpenGL.GL.VERSION.GL_4_0 import *
-from OpenGL.GL.VERSION.GL_4_1 import *
-from OpenGL.GL.VERSION.GL_4_2 import *
-from OpenGL.GL.VERSION.GL_4_3 import *
-from OpenGL.GL.VERSION.GL_4_4 import *
-from OpenGL.GL.VERSION.GL_4_5 import *
-from OpenGL.GL.VERSION.GL_4_6 import *
-
-from OpenGL.error import *
-GLerror = GLError
-
-# Now the aliases...
-glRotate = glRotated
-glTranslate = glTranslated
-glLight = glLightfv
-glTexCoord = glTexCoord2d
-glScale = glScaled
-#glColor = glColor3f
-glNormal = glNormal3d
-
-glGetBoolean = glGetBooleanv
-glGetDouble = glGetDoublev
-glGetFloat = glGetFloatv
-glGetInteger = glGetIntegerv 
-glGetPolygonStippleub = glGetPolygonStipple
+from OpenGL import _configflags as _flags
+
+if _flags.LAZY_NAMESPACES:
+    from OpenGL import lazynamespace as _lazynamespace
+    __getattr__, __dir__, __all__ = _lazynamespace.install(
+        __name__,
+        [
+            'OpenGL.GL.VERSION.GL_1_1',
+            'OpenGL.GL.pointers',
+            'OpenGL.GL.images',
+            'OpenGL.GL.exceptional',
+            'OpenGL.GL.glget',
+        ] + [
+            'OpenGL.GL.VERSION.GL_%s'%( version, )
+            for version in (
+                '1_2', '1_3', '1_4', '1_5', '2_0', '2_1', '3_0', '3_1', '3_2', '3_3',
+                '4_0', '4_1', '4_2', '4_3', '4_4', '4_5', '4_6',
+            )
+        ] + [
+            'OpenGL.error',
+        ],
+        aliases = {
+            'GLerror': 'GLError',
+            'glRotate': 'glRotated',
+            'glTranslate': 'glTranslated',
+            'glLight': 'glLightfv',
+            'glTexCoord': 'glTexCoord2d',
+            'glScale': 'glScaled',
+            'glNormal': 'glNormal3d',
+            'glGetBoolean': 'glGetBooleanv',
+            'glGetDouble': 'glGetDoublev',
+            'glGetFloat': 'glGetFloatv',
+            'glGetInteger': 'glGetIntegerv',
+            'glGetPolygonStippleub': 'glGetPolygonStipple',
+        },
+    )
+else:
+    from OpenGL.GL.VERSION.GL_1_1 import *
+    from OpenGL.GL.pointers import *
+    from OpenGL.GL.images import *
+
+    from OpenGL.GL.exceptional import *
+
+    from OpenGL.GL.glget import *
+
+    from OpenGL.GL.VERSION.GL_1_2 import *
+    from OpenGL.GL.VERSION.GL_1_3 import *
+    from OpenGL.GL.VERSION.GL_1_4 import *
+    from OpenGL.GL.VERSION.GL_1_5 import *
+    from OpenGL.GL.VERSION.GL_2_0 import *
+    from OpenGL.GL.VERSION.GL_2_1 import *
+    from OpenGL.GL.VERSION.GL_3_0 import *
+    from OpenGL.GL.VERSION.GL_3_1 import *
+    from OpenGL.GL.VERSION.GL_3_2 import *
+    from OpenGL.GL.VERSION.GL_3_3 import *
+    from OpenGL.GL.VERSION.GL_4_0 import *
+    from OpenGL.GL.VERSION.GL_4_1 import *
+    from OpenGL.GL.VERSION.GL_4_2 import *
+    from OpenGL.GL.VERSION.GL_4_3 import *
+    from OpenGL.GL.VERSION.GL_4_4 import *
+    from OpenGL.GL.VERSION.GL_4_5 import *
+    from OpenGL.GL.VERSION.GL_4_6 import *
+
+    from OpenGL.error import *
+    GLerror = GLError
+
+    # Now the aliases...
+    glRotate = glRotated
+    glTranslate = glTranslated
+    glLight = glLightfv
+    glTexCoord = glTexCoord2d
+    glScale = glScaled
+    #glColor = glColor3f
+    glNormal = glNormal3d
+
+    glGetBoolean = glGetBooleanv
+    glGetDouble = glGetDoublev
+    glGetFloat = glGetFloatv
+    glGetInteger = glGetIntegerv
+    glGetPolygonStippleub = glGetPolygonStipple
 
 from OpenGL.GL import vboimplementation as _core_implementation
 from OpenGL.GL.ARB import vboimplementation as _arb_implementation
+if _flags.LAZY_NAMESPACES:
+    # bound on the package by the import above, where a star import sees it
+    __all__.append( 'vboimplementation' )
@@ -262,3 +262,296 @@ def glAreTexturesResident( baseFunction, *args ):
         for i in range(len(output)):
             output[i] = 1
     return output
+
+if _configflags.BATCH_IMMEDIATE:
+    import array as _array
+    from OpenGL.platform import baseplatform as _baseplatform
+
+    class ImmediateBatch( object ):
+        """Records glBegin/glEnd geometry into client-side vertex arrays
+
+        Vertices are stored interleaved as GL_C4F_N3F_V3F in a growable
+        array.array, consecutive blocks of independent primitives (points,
+        lines, triangles, quads) in the same mode are merged into a single
+        draw, and everything recorded is drawn with glDrawArrays as soon as
+        any other entry point is called (see BasePlatform.wrapBatching),
+        which includes glutSwapBuffers at the end of a frame.
+
+        glColor and glNormal outside of glBegin/glEnd only update the
+        recorded current values, which are passed to GL before any other
+        call, so per-block colour changes do not break up a batch.
+
+        Any other call inside glBegin/glEnd (glTexCoord, glMaterial...)
+        replays the block so far as real immediate-mode calls and lets the
+        rest of the block through untouched.
+        """
+        MERGEABLE = {
+            full.GL_POINTS: 1,
+            full.GL_LINES: 2,
+            full.GL_TRIANGLES: 3,
+            full.GL_QUADS: 4,
+        }
+        STRIDE = 10
+        def __init__( self ):
+            self.data = _array.array( 'f' )
+            self.batches = []
+            self.mode = None
+            self.first = 0
+            self.passthrough = False
+            self.active = False
+            self.color = self.normal = None
+            self.colorDirty = self.normalDirty = False
+            self.attributes = None
+            self.stats = {
+                'vertices': 0,
+                'blocks': 0,
+                'draws': 0,
+                'flushes': 0,
+                'fallbacks': 0,
+            }
+        def setColor( self, color ):
+            self.color = color
+            self.colorDirty = self.active = True
+            if self.mode is not None:
+                self.attributes = color + self.normal
+        def setNormal( self, normal ):
+            self.normal = normal
+            self.normalDirty = self.active = True
+            if self.mode is not None:
+                self.attributes = self.color + normal
+        def query( self ):
+            """Fetch whichever of the current colour and normal we do not know"""
+            active, self.active = self.active, False
+            try:
+                if self.color is None:
+                    value = (full.GLfloat * 4)()
+                    full.glGetFloatv( full.GL_CURRENT_COLOR, value )
+                    self.color = tuple( value )
+                if self.normal is None:
+                    value = (full.GLfloat * 3)()
+                    full.glGetFloatv( full.GL_CURRENT_NORMAL, value )
+                    self.normal = tuple( value )
+            finally:
+                self.active = active
+        def begin( self, mode ):
+            if self.color is None or self.normal is None:
+                self.query()
+            self.attributes = self.color + self.normal
+            self.mode = mode
+            self.first = len( self.data ) // self.STRIDE
+            self.active = True
+        def end( self ):
+            mode, first = self.mode, self.first
+            self.mode = None
+            count = len( self.data ) // self.STRIDE - first
+            size = self.MERGEABLE.get( mode )
+            if size:
+                extra = count % size
+                if extra:
+                    # GL drops an incomplete primitive, so must we before merging
+                    del self.data[ (first + count - extra) * self.STRIDE: ]
+                    count -= extra
+            if not count:
+                return
+            self.stats['vertices'] += count
+            self.stats['blocks'] += 1
+            batches = self.batches
+            if size and batches and batches[-1][0] == mode:
+                batches[-1][2] += count
+            else:
+                batches.append( [mode, first, count] )
+        def flush( self ):
+            """Draw everything recorded so far (self.active must be False)"""
+            if not self.batches:
+                return
+            self.stats['flushes'] += 1
+            data = self.data
+            full.glPushClientAttrib( full.GL_CLIENT_VERTEX_ARRAY_BIT )
+            try:
+                if _glBindBuffer:
+                    _glBindBuffer( _GL_ARRAY_BUFFER, 0 )
+                full.glInterleavedArrays(
+                    full.GL_C4F_N3F_V3F, 0, ctypes.c_void_p( data.buffer_info()[0] )
+                )
+                for mode, first, count in self.batches:
+                    full.glDrawArrays( mode, first, count )
+                    self.stats['draws'] += 1
+            finally:
+                full.glPopClientAttrib()
+                del data[:]
+                del self.batches[:]
+            # the current colour and normal are undefined after drawing arrays
+            self.colorDirty = self.normalDirty = True
+        def interrupt( self ):
+            """Bring GL up to date before some other entry point is called"""
+            self.active = False
+            if self.mode is not None:
+                return self.fallback()
+            self.flush()
+            if self.colorDirty:
+                full.glColor4f( *self.color )
+            if self.normalDirty:
+                full.glNormal3f( *self.normal )
+            # the coming call may change either, so forget them
+            self.color = self.normal = None
+            self.colorDirty = self.normalDirty = False
+        def fallback( self ):
+            """Replay the open block through real immediate-mode calls"""
+            self.stats['fallbacks'] += 1
+            mode, stride = self.mode, self.STRIDE
+            block = self.data[ self.first * stride: ]
+            del self.data[ self.first * stride: ]
+            self.mode = None
+            self.flush()
+            if _configflags.ERROR_CHECKING:
+                _errors._error_checker.onBegin( )
+            full.glBegin( mode )
+            color = normal = None
+            for i in range( 0, len( block ), stride ):
+                vertex = block[ i:i + stride ]
+                if vertex[0:4] != color:
+                    color = vertex[0:4]
+                    full.glColor4f( *color )
+                if vertex[4:7] != normal:
+                    normal = vertex[4:7]
+                    full.glNormal3f( *normal )
+                full.glVertex3f( *vertex[7:10] )
+            full.glColor4f( *self.color )
+            full.glNormal3f( *self.normal )
+            self.color = self.normal = None
+            self.colorDirty = self.normalDirty = False
+            self.passthrough = True
+
+    immediateBatch = ImmediateBatch()
+    _baseplatform._BatchInterrupt.batch = immediateBatch
+    try:
+        from OpenGL.raw.GL.VERSION.GL_1_5 import glBindBuffer as _glBindBuffer, GL_ARRAY_BUFFER as _GL_ARRAY_BUFFER
+    except ImportError:
+        _glBindBuffer = None
+
+    def glBegin( mode ):
+        """Start recording a block of immediate-mode geometry"""
+        batch = immediateBatch
+        if batch.passthrough or batch.mode is not None:
+            return full.glBegin( mode )
+        batch.begin( mode )
+    def glEnd( ):
+        """Finish a recorded block, merging it with the previous one if possible"""
+        batch = immediateBatch
+        if batch.passthrough:
+            batch.passthrough = False
+            if _configflags.ERROR_CHECKING:
+                _errors._error_checker.onEnd( )
+            return full.glEnd( )
+        if batch.mode is None:
+            return full.glEnd( )
+        batch.end()
+
+    def _named( function, baseFunction ):
+        function.__name__ = baseFunction.__name__
+        function.baseFunction = baseFunction
+        return function
+
+    def _recordVertex( baseFunction, size, vector=False ):
+        """Vertex call which appends to the open block, if any"""
+        if vector:
+            def glVertex( v ):
+                batch = immediateBatch
+                if batch.mode is None:
+                    return baseFunction( v )
+                data = batch.data
+                data.extend( batch.attributes )
+                data.extend( v )
+                if size == 2:
+                    data.append( 0.0 )
+        elif size == 2:
+            def glVertex( x, y ):
+                batch = immediateBatch
+                if batch.mode is None:
+                    return baseFunction( x, y )
+                data = batch.data
+                data.extend( batch.attributes )
+                data.extend( (x, y, 0.0) )
+        else:
+            def glVertex( x, y, z ):
+                batch = immediateBatch
+                if batch.mode is None:
+                    return baseFunction( x, y, z )
+                data = batch.data
+                data.extend( batch.attributes )
+                data.extend( (x, y, z) )
+        return _named( glVertex, baseFunction )
+
+    def _recordColor( baseFunction, size, scale=None, vector=False ):
+        """Colour call which updates the recorded current colour"""
+        def glColor( *args ):
+            batch = immediateBatch
+            if batch.passthrough:
+                return baseFunction( *args )
+            values = tuple( args[0] ) if vector else args
+            if scale:
+                values = tuple([ value / scale for value in values ])
+            if size == 3:
+                values = values + (1.0,)
+            batch.setColor( tuple([ float( value ) for value in values ]))
+        return _named( glColor, baseFunction )
+
+    def _recordNormal( baseFunction, vector=False ):
+        """Normal call which updates the recorded current normal"""
+        def glNormal( *args ):
+            batch = immediateBatch
+            if batch.passthrough:
+                return baseFunction( *args )
+            values = args[0] if vector else args
+            batch.setNormal( tuple([ float( value ) for value in values ]))
+        return _named( glNormal, baseFunction )
+
+    glVertex2d = _recordVertex( full.glVertex2d, 2 )
+    glVertex2f = _recordVertex( full.glVertex2f, 2 )
+    glVertex2i = _recordVertex( full.glVertex2i, 2 )
+    glVertex2s = _recordVertex( full.glVertex2s, 2 )
+    glVertex3d = _recordVertex( full.glVertex3d, 3 )
+    glVertex3f = _recordVertex( full.glVertex3f, 3 )
+    glVertex3i = _recordVertex( full.glVertex3i, 3 )
+    glVertex3s = _recordVertex( full.glVertex3s, 3 )
+    glVertex2dv = _recordVertex( full.glVertex2dv, 2, vector=True )
+    glVertex2fv = _recordVertex( full.glVertex2fv, 2, vector=True )
+    glVertex3dv = _recordVertex( full.glVertex3dv, 3, vector=True )
+    glVertex3fv = _recordVertex( full.glVertex3fv, 3, vector=True )
+    glColor3d = _recordColor( full.glColor3d, 3 )
+    glColor3f = _recordColor( full.glColor3f, 3 )
+    glColor3ub = _recordColor( full.glColor3ub, 3, scale=255.0 )
+    glColor4d = _recordColor( full.glColor4d, 4 )
+    glColor4f = _recordColor( full.glColor4f, 4 )
+    glColor4ub = _recordColor( full.glColor4ub, 4, scale=255.0 )
+    glColor3dv = _recordColor( full.glColor3dv, 3, vector=True )
+    glColor3fv = _recordColor( full.glColor3fv, 3, vector=True )
+    glColor4dv = _recordColor( full.glColor4dv, 4, vector=True )
+    glColor4fv = _recordColor( full.glColor4fv, 4, vector=True )
+    glNormal3d = _recordNormal( full.glNormal3d )
+    glNormal3f = _recordNormal( full.glNormal3f )
+    glNormal3dv = _recordNormal( full.glNormal3dv, vector=True )
+    glNormal3fv = _recordNormal( full.glNormal3fv, vector=True )
+
+    glVertexDispatch.update({
+        2: glVertex2d,
+        3: glVertex3d,
+    })
+    def glColor( *args ):
+        """glColor*d* -- record the current colour for batched geometry, see glColor3d/glColor4d"""
+        if len(args) == 1:
+            args = tuple( args[0] )
+        if len(args) == 3:
+            return glColor3d( *args )
+        elif len(args) == 4:
+            return glColor4d( *args )
+        raise ValueError( """Don't know how to handle arguments: %s"""%(args,))
+
+    __all__ += [
+        'glVertex2d', 'glVertex2f', 'glVertex2i', 'glVertex2s',
+        'glVertex3d', 'glVertex3f', 'glVertex3i', 'glVertex3s',
+        'glVertex2dv', 'glVertex2fv', 'glVertex3dv', 'glVertex3fv',
+        'glColor3d', 'glColor3f', 'glColor3ub', 'glColor4d', 'glColor4f', 'glColor4ub',
+        'glColor3dv', 'glColor3fv', 'glColor4dv', 'glColor4fv',
+        'glNormal3d', 'glNormal3f', 'glNormal3dv', 'glNormal3fv',
+    ]
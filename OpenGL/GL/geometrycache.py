@@ -0,0 +1,236 @@
+"""Replay static immediate-mode geometry from display lists or VBOs
+
+Walls, grid lines and other geometry that looks the same every frame can be
+wrapped like this:
+
+    from OpenGL.GL.geometrycache import geometry_cache
+
+    with geometry_cache( 'walls', key=(level, wall_colour) ) as record:
+        if record:
+            draw_walls()
+
+The first time, or whenever the key changes, `record` is True and the calls
+made in the block are recorded (while also being drawn).  On later frames
+`record` is False and the recording is replayed with a single call, the
+block being expected to skip its drawing.  Keys are compared by content,
+buffers such as numpy arrays by a digest of their bytes.
+
+Two recording modes are available:
+
+    'list' -- a GL_COMPILE_AND_EXECUTE display list, capturing every call
+        in the block, state changes included; the default whenever
+        display lists are available
+    'vbo' -- the vertices the immediate-mode batching layer (BATCH_IMMEDIATE,
+        see OpenGL.GL.exceptional) collects in the block are uploaded into
+        a buffer object and replayed with glDrawArrays; blocks which make
+        other calls (and so flush the batch) are not cached
+
+Recordings are kept per context in an LRU of GeometryCache.size entries,
+stored with OpenGL.contextdata so that cleaning up the context drops them.
+"""
+import ctypes, hashlib, logging
+from collections import OrderedDict
+from OpenGL import contextdata, _configflags
+from OpenGL.raw.GL.VERSION import GL_1_1 as _simple
+from OpenGL.raw.GL.VERSION import GL_1_5 as _buffers
+from OpenGL.raw.GL._types import GLuint
+_log = logging.getLogger( 'OpenGL.GL.geometrycache' )
+
+__all__ = [
+    'geometry_cache',
+    'GeometryCache',
+    'getCache',
+]
+
+CONTEXT_KEY = 'OpenGL.GL.geometrycache'
+
+def contentKey( key ):
+    """Hashable value standing for the content of key"""
+    if isinstance( key, (tuple, list) ):
+        return tuple([ contentKey( item ) for item in key ])
+    if not isinstance( key, (str, int, float) ) and key is not None:
+        try:
+            view = memoryview( key )
+        except TypeError:
+            pass
+        else:
+            return ( 'buffer', view.format, view.shape, hashlib.sha1( view.tobytes() ).hexdigest() )
+    return key
+
+class _Entry( object ):
+    """GL-side recording of one named piece of geometry"""
+    __slots__ = ('name', 'key', 'list', 'buffer', 'batches', 'color', 'normal')
+    def __init__( self, name ):
+        self.name = name
+        self.key = None
+        self.list = None
+        self.buffer = None
+        self.batches = None
+        self.color = self.normal = None
+
+class _Recording( object ):
+    """Context manager returned by GeometryCache.cache"""
+    def __init__( self, cache, name, key ):
+        self.cache = cache
+        self.name = name
+        self.key = key
+        self.entry = None
+        self.flushes = None
+    def __enter__( self ):
+        """Replay a matching recording or start a new one, return whether the block should draw"""
+        return self.cache.enter( self )
+    def __exit__( self, exc_type=None, exc_val=None, exc_tb=None ):
+        """Finish the recording started by __enter__, if any"""
+        if self.entry is not None:
+            self.cache.exit( self, exc_type is None )
+        return False # do not supress exceptions...
+
+class GeometryCache( object ):
+    """Least-recently-used recordings of named geometry for one context
+
+    size -- maximum number of recordings kept
+    mode -- 'list', 'vbo' or None to choose from what the context supports
+    """
+    def __init__( self, size=64, mode=None ):
+        self.size = size
+        self.mode = mode or self.defaultMode()
+        self.entries = OrderedDict()
+        self.recording = None
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'uncached': 0,
+        }
+    def defaultMode( self ):
+        if not _configflags.FORWARD_COMPATIBLE_ONLY and _simple.glNewList:
+            return 'list'
+        if _configflags.BATCH_IMMEDIATE and _buffers.glBindBuffer:
+            return 'vbo'
+        return None
+    def cache( self, name, key=None ):
+        """Context manager recording or replaying the geometry called name"""
+        return _Recording( self, name, contentKey( key ))
+    def enter( self, recording ):
+        if self.mode is None or self.recording is not None:
+            # nothing to record with, or already inside a recording which
+            # will capture this block as well
+            self.stats['uncached'] += 1
+            return True
+        entry = self.entries.get( recording.name )
+        if entry is not None:
+            self.entries.move_to_end( recording.name )
+            if entry.key == recording.key and (entry.list or entry.batches is not None):
+                self.stats['hits'] += 1
+                self.replay( entry )
+                return False
+        else:
+            entry = self.entries[recording.name] = _Entry( recording.name )
+            self.evict()
+        self.stats['misses'] += 1
+        entry.key = recording.key
+        recording.entry = entry
+        self.recording = recording
+        if self.mode == 'list':
+            if not entry.list:
+                entry.list = _simple.glGenLists( 1 )
+            _simple.glNewList( entry.list, _simple.GL_COMPILE_AND_EXECUTE )
+        else:
+            batch = self.immediateBatch()
+            if batch.active:
+                batch.interrupt()
+            recording.flushes = batch.stats['flushes']
+        return True
+    def exit( self, recording, success ):
+        self.recording = None
+        entry = recording.entry
+        if self.mode == 'list':
+            _simple.glEndList()
+            if not success:
+                self.release( entry.name )
+            return
+        batch = self.immediateBatch()
+        if not success or batch.mode is not None or batch.stats['flushes'] != recording.flushes:
+            _log.info( "Geometry %r made calls other than vertex data, not cached", entry.name )
+            self.stats['uncached'] += 1
+            self.release( entry.name )
+            return
+        self.upload( entry, batch )
+        self.replay( entry )
+    def immediateBatch( self ):
+        from OpenGL.GL import exceptional
+        return exceptional.immediateBatch
+    def upload( self, entry, batch ):
+        """Move the batch's pending vertices into entry's buffer object"""
+        data = batch.data
+        # our own calls must not make the batch draw what we are taking
+        batch.active = False
+        if entry.buffer is None:
+            buffer = (GLuint * 1)()
+            _buffers.glGenBuffers( 1, buffer )
+            entry.buffer = buffer[0]
+        _buffers.glBindBuffer( _buffers.GL_ARRAY_BUFFER, entry.buffer )
+        _buffers.glBufferData(
+            _buffers.GL_ARRAY_BUFFER,
+            len( data ) * data.itemsize,
+            ctypes.c_void_p( data.buffer_info()[0] ),
+            _buffers.GL_STATIC_DRAW,
+        )
+        _buffers.glBindBuffer( _buffers.GL_ARRAY_BUFFER, 0 )
+        entry.batches = [ tuple( item ) for item in batch.batches ]
+        entry.color, entry.normal = batch.color, batch.normal
+        del data[:]
+        del batch.batches[:]
+        batch.colorDirty = batch.normalDirty = False
+        batch.color = batch.normal = None
+    def replay( self, entry ):
+        """Draw a stored recording"""
+        if entry.list:
+            _simple.glCallList( entry.list )
+            return
+        if not entry.batches:
+            return
+        _simple.glPushClientAttrib( _simple.GL_CLIENT_VERTEX_ARRAY_BIT )
+        try:
+            _buffers.glBindBuffer( _buffers.GL_ARRAY_BUFFER, entry.buffer )
+            _simple.glInterleavedArrays( _simple.GL_C4F_N3F_V3F, 0, ctypes.c_void_p( 0 ))
+            for mode, first, count in entry.batches:
+                _simple.glDrawArrays( mode, first, count )
+        finally:
+            _simple.glPopClientAttrib()
+        # leave the current colour and normal as the recorded block did
+        if entry.color is not None:
+            _simple.glColor4f( *entry.color )
+        if entry.normal is not None:
+            _simple.glNormal3f( *entry.normal )
+    def evict( self ):
+        while len( self.entries ) > self.size:
+            name = next( iter( self.entries ))
+            self.release( name )
+            self.stats['evictions'] += 1
+    def release( self, name=None ):
+        """Delete the recording called name (or all of them) from the current context"""
+        names = [ name ] if name is not None else list( self.entries )
+        for name in names:
+            entry = self.entries.pop( name, None )
+            if entry is None:
+                continue
+            if entry.list:
+                _simple.glDeleteLists( entry.list, 1 )
+            if entry.buffer is not None:
+                _buffers.glDeleteBuffers( 1, (GLuint * 1)( entry.buffer ))
+
+def getCache( context=None ):
+    """The GeometryCache for the given (default current) context"""
+    cache = contextdata.getValue( CONTEXT_KEY, context=context )
+    if cache is None:
+        cache = GeometryCache()
+        contextdata.setValue( CONTEXT_KEY, cache, context=context )
+    return cache
+
+def geometry_cache( name, key=None ):
+    """Record or replay the geometry called name in the current context's cache
+
+    key -- anything describing the geometry's content, a new key re-records
+    """
+    return getCache().cache( name, key )
@@ -1,5 +1,20 @@
 """OpenGL.EGL the portable interface to GL environments"""
-from OpenGL.raw.GLES2._types import *
-from OpenGL.GLES2.VERSION.GLES2_2_0 import *
+from OpenGL import _configflags as _flags
+
+if _flags.LAZY_NAMESPACES:
+    from OpenGL import lazynamespace as _lazynamespace
+    __getattr__, __dir__, __all__ = _lazynamespace.install(
+        __name__,
+        [
+            'OpenGL.raw.GLES2._types',
+            'OpenGL.GLES2.VERSION.GLES2_2_0',
+        ],
+    )
+else:
+    from OpenGL.raw.GLES2._types import *
+    from OpenGL.GLES2.VERSION.GLES2_2_0 import *
 
 from OpenGL.GLES2 import vboimplementation as _gles2_implementation
+if _flags.LAZY_NAMESPACES:
+    # bound on the package by the import above, where a star import sees it
+    __all__.append( 'vboimplementation' )
@@ -1,10 +1,10 @@
 from OpenGL.arrays import vbo
-from OpenGL.GLES2.VERSION import GLES2_2_0
-from OpenGL.GLES2.OES import mapbuffer
 
 class Implementation( vbo.Implementation ):
     """OpenGL-based implementation of VBO interfaces"""
     def __init__( self ):
+        from OpenGL.GLES2.VERSION import GLES2_2_0
+        from OpenGL.GLES2.OES import mapbuffer
         for name in self.EXPORTED_NAMES:
             for source in [ GLES2_2_0, mapbuffer ]:
                 for possible in (name,name+'OES'):
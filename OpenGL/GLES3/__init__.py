@@ -1,5 +1,19 @@
 """OpenGL.EGL the portable interface to GL environments"""
-from OpenGL.raw.GLES3._types import *
-from OpenGL.GLES2.VERSION.GLES2_2_0 import *
-from OpenGL.GLES3.VERSION.GLES3_3_0 import *
-from OpenGL.GLES3.VERSION.GLES3_3_1 import *
+from OpenGL import _configflags as _flags
+
+if _flags.LAZY_NAMESPACES:
+    from OpenGL import lazynamespace as _lazynamespace
+    __getattr__, __dir__, __all__ = _lazynamespace.install(
+        __name__,
+        [
+            'OpenGL.raw.GLES3._types',
+            'OpenGL.GLES2.VERSION.GLES2_2_0',
+            'OpenGL.GLES3.VERSION.GLES3_3_0',
+            'OpenGL.GLES3.VERSION.GLES3_3_1',
+        ],
+    )
+else:
+    from OpenGL.raw.GLES3._types import *
+    from OpenGL.GLES2.VERSION.GLES2_2_0 import *
+    from OpenGL.GLES3.VERSION.GLES3_3_0 import *
+    from OpenGL.GLES3.VERSION.GLES3_3_1 import *
@@ -1,14 +1,42 @@
 """The GLU library implementation via ctypes"""
 from OpenGL import platform
 from OpenGL.error import *
-from OpenGL.raw.GLU import *
-from OpenGL.raw.GLU.annotations import *
-
-from OpenGL.GLU.quadrics import *
-from OpenGL.GLU.projection import *
-from OpenGL.GLU.tess import *
-from OpenGL.GLU.glunurbs import *
+from OpenGL import _configflags as _flags
 import ctypes
 
-gluErrorString.restype = ctypes.c_char_p
-gluGetString.restype = ctypes.c_char_p
\ No newline at end of file
+if _flags.LAZY_NAMESPACES:
+    from OpenGL import lazynamespace as _lazynamespace
+    def _stringResult( name ):
+        def compute( module ):
+            from OpenGL.raw import GLU as raw
+            function = getattr( raw, name )
+            function.restype = ctypes.c_char_p
+            return function
+        return compute
+    __getattr__, __dir__, __all__ = _lazynamespace.install(
+        __name__,
+        [
+            'OpenGL.error',
+            'OpenGL.raw.GLU',
+            'OpenGL.raw.GLU.annotations',
+            'OpenGL.GLU.quadrics',
+            'OpenGL.GLU.projection',
+            'OpenGL.GLU.tess',
+            'OpenGL.GLU.glunurbs',
+        ],
+        computed = {
+            'gluErrorString': _stringResult( 'gluErrorString' ),
+            'gluGetString': _stringResult( 'gluGetString' ),
+        },
+    )
+else:
+    from OpenGL.raw.GLU import *
+    from OpenGL.raw.GLU.annotations import *
+
+    from OpenGL.GLU.quadrics import *
+    from OpenGL.GLU.projection import *
+    from OpenGL.GLU.tess import *
+    from OpenGL.GLU.glunurbs import *
+
+    gluErrorString.restype = ctypes.c_char_p
+    gluGetString.restype = ctypes.c_char_p
@@ -1,12 +1,30 @@
 """The GLUT library implementation via ctypes"""
-from OpenGL.raw.GLUT import *
+from OpenGL import _configflags as _flags
 
-from OpenGL.GLUT.special import *
-from OpenGL.GLUT.fonts import *
-from OpenGL.GLUT.freeglut import *
-from OpenGL.GLUT.osx import *
-
-if glutLeaveMainLoop:
-    HAVE_FREEGLUT = True 
+if _flags.LAZY_NAMESPACES:
+    from OpenGL import lazynamespace as _lazynamespace
+    __getattr__, __dir__, __all__ = _lazynamespace.install(
+        __name__,
+        [
+            'OpenGL.raw.GLUT',
+            'OpenGL.GLUT.special',
+            'OpenGL.GLUT.fonts',
+            'OpenGL.GLUT.freeglut',
+            'OpenGL.GLUT.osx',
+        ],
+        computed = {
+            'HAVE_FREEGLUT': lambda module: bool( module.glutLeaveMainLoop ),
+        },
+    )
 else:
-    HAVE_FREEGLUT = False 
+    from OpenGL.raw.GLUT import *
+
+    from OpenGL.GLUT.special import *
+    from OpenGL.GLUT.fonts import *
+    from OpenGL.GLUT.freeglut import *
+    from OpenGL.GLUT.osx import *
+
+    if glutLeaveMainLoop:
+        HAVE_FREEGLUT = True 
+    else:
+        HAVE_FREEGLUT = False 
@@ -22,7 +22,7 @@ platform module *not* in the module here!
 """
 from OpenGL.platform import CurrentContextIsValid, GLUT_GUARD_CALLBACKS, PLATFORM
 GLUT = PLATFORM.GLUT
-from OpenGL import contextdata, error, platform, logs
+from OpenGL import contextdata, error, platform, logs, _configflags
 from OpenGL.raw import GLUT as _simple
 from OpenGL._bytes import bytes, unicode,as_8_bit
 import ctypes, os, sys, traceback
@@ -350,3 +350,18 @@ def glutDestroyWindow( window ):
         _log.error( """Error attempting to clean up context data for GLUT window %s: %s""", window, result )
     return _base_glutDestroyWindow( window )
 glutDestroyWindow.wrappedOperation = _simple.glutDestroyWindow
+
+_DEFERRED = _configflags.ERROR_CHECKING and _configflags.DEFERRED_ERROR_CHECKING
+_PROFILING = _configflags.PROFILE_CALLS or _configflags.PROFILE_TIMING
+if _DEFERRED or _PROFILING:
+    if _PROFILING:
+        from OpenGL import profiler as _profiler
+    def glutSwapBuffers( ):
+        """Check the errors deferred during this frame, swap, then end the profiler frame"""
+        if _DEFERRED:
+            error.checkDeferredErrors()
+        result = _simple.glutSwapBuffers()
+        if _PROFILING:
+            _profiler.frame()
+        return result
+    glutSwapBuffers.wrappedOperation = _simple.glutSwapBuffers
@@ -35,6 +35,16 @@ import occurs the flags should no longer be changed.
 
         Default: True
 
+    DEFERRED_ERROR_CHECKING -- if True (and ERROR_CHECKING is True),
+        glGetError is not called after every entry point.  Instead the
+        most recent calls are kept in a ring buffer and errors are only
+        checked at sync points: glFinish, glutSwapBuffers, or an explicit
+        OpenGL.error.checkDeferredErrors().  A GLError raised there lists
+        the calls made since the previous sync point.  Where the context
+        supports KHR_debug its messages are collected as well.
+
+        Default: False
+
     ERROR_LOGGING -- If True, then wrap array-handler
         functions with  error-logging operations so that all exceptions
         will be reported to log objects in OpenGL.logs, note that
@@ -128,6 +138,19 @@ import occurs the flags should no longer be changed.
 
         Default: False
 
+    PROFILE_CALLS -- If True, wrap functions with a proxy which
+        only counts calls per entry point, bucketed into frames by
+        OpenGL.profiler.frame() (called for you by glutSwapBuffers).
+        This is cheap enough to leave on while measuring, unlike
+        FULL_LOGGING; see OpenGL.profiler for the reports.
+
+        Default: False
+
+    PROFILE_TIMING -- If True, as PROFILE_CALLS but also accumulate
+        the time spent in each entry point (implies PROFILE_CALLS).
+
+        Default: False
+
     ALLOW_NUMPY_SCALARS -- if True, we will wrap
         all GLint/GLfloat calls conversions with wrappers
         that allow for passing numpy scalar values.
@@ -177,6 +200,38 @@ import occurs the flags should no longer be changed.
         annotations dictionary are generally either ctypes types or 
         ArrayDataType references, so this isn't *likely* to be all that useful
         without further work.
+
+    CODEGEN_WRAPPERS -- if True, and OpenGL_accelerate is not in use,
+        finalise wrappers into generated straight-line Python functions
+        (see OpenGL.codegen) instead of the generic converter pipelines.
+        Compiled shapes are cached on disk, see PYOPENGL_CODEGEN_CACHE.
+
+        Default: False
+
+    LAZY_NAMESPACES -- if True, OpenGL.GL, GLU, GLUT, GLES2 and GLES3 do
+        not import all of their version modules up front, but resolve names
+        on first use from an index cached beside the generated wrappers
+        (see OpenGL.lazynamespace).  ``from OpenGL.GL import *`` still
+        binds every name; entry points are stubs until first called.
+
+        Default: False
+
+    BATCH_IMMEDIATE -- if True, glBegin/glEnd blocks built with the
+        glVertex, glColor and glNormal entry points exported from
+        OpenGL.GL are recorded into client-side vertex arrays and drawn
+        with glDrawArrays when any other entry point is called, merging
+        consecutive independent primitives (see OpenGL.GL.exceptional).
+        Compatibility-profile contexts only.
+
+        Default: False
+
+    PRELOAD_FUNCTIONS -- if True, resolve every entry point as its raw
+        module is imported instead of on first call, logging those which
+        cannot be resolved (on the OpenGL.platform.baseplatform logger).
+        This is a debugging aid for validating declarations; extension
+        entry points generally need a current context to resolve.
+
+        Default: False
 """
 from OpenGL.version import __version__
 import os
@@ -194,6 +249,7 @@ def environ_key(name, default):
 
 
 ERROR_CHECKING = environ_key("ERROR_CHECKING", True)
+DEFERRED_ERROR_CHECKING = environ_key("DEFERRED_ERROR_CHECKING", False)
 ERROR_LOGGING = environ_key("ERROR_LOGGING", False)
 ERROR_ON_COPY = environ_key("ERROR_ON_COPY", False)
 ARRAY_SIZE_CHECKING = environ_key("ARRAY_SIZE_CHECKING", True)
@@ -205,10 +261,16 @@ USE_ACCELERATE = environ_key("USE_ACCELERATE", True)
 CONTEXT_CHECKING = environ_key("CONTEXT_CHECKING", False)
 
 FULL_LOGGING = environ_key("FULL_LOGGING", False)
+PROFILE_CALLS = environ_key("PROFILE_CALLS", False)
+PROFILE_TIMING = environ_key("PROFILE_TIMING", False)
 ALLOW_NUMPY_SCALARS = environ_key("ALLOW_NUMPY_SCALARS", False)
 UNSIGNED_BYTE_IMAGES_AS_STRING = environ_key("UNSIGNED_BYTE_IMAGES_AS_STRING", True)
 MODULE_ANNOTATIONS = False
 TYPE_ANNOTATIONS = False
+CODEGEN_WRAPPERS = environ_key("CODEGEN_WRAPPERS", False)
+LAZY_NAMESPACES = environ_key("LAZY_NAMESPACES", False)
+PRELOAD_FUNCTIONS = environ_key("PRELOAD_FUNCTIONS", False)
+BATCH_IMMEDIATE = environ_key("BATCH_IMMEDIATE", False)
 
 
 # Declarations of plugins provided by PyOpenGL itself
@@ -1,6 +1,7 @@
 """Holds the import-time constants for various configuration flags"""
 from OpenGL import (
     ERROR_CHECKING,
+    DEFERRED_ERROR_CHECKING,
     ERROR_LOGGING,
     ERROR_ON_COPY,
     ARRAY_SIZE_CHECKING,
@@ -12,8 +13,14 @@ from OpenGL import (
     CONTEXT_CHECKING,
 
     FULL_LOGGING,
+    PROFILE_CALLS,
+    PROFILE_TIMING,
     ALLOW_NUMPY_SCALARS,
     UNSIGNED_BYTE_IMAGES_AS_STRING,
     MODULE_ANNOTATIONS,
     TYPE_ANNOTATIONS,
+    CODEGEN_WRAPPERS,
+    LAZY_NAMESPACES,
+    PRELOAD_FUNCTIONS,
+    BATCH_IMMEDIATE,
 )
@@ -35,12 +35,12 @@ from OpenGL.arrays.formathandler import FormatHandler
 from OpenGL.raw.GL import _types 
 from OpenGL import error
 from OpenGL._bytes import bytes,unicode,as_8_bit
-import ctypes,logging
+import ctypes,logging,bisect
 _log = logging.getLogger( 'OpenGL.arrays.vbo' )
 from OpenGL._bytes import long, integer_types
 
 import weakref
-__all__ = ('VBO','VBOHandler','mapVBO')
+__all__ = ('VBO','VBOHandler','mapVBO','StreamingVBO')
 
 class Implementation( object ):
     """Abstraction point for the various implementations that can be used
@@ -127,6 +127,42 @@ class Implementation( object ):
 
 get_implementation = Implementation.get_implementation
 
+class _DirtyRanges( object ):
+    """Sorted, non-overlapping [start,stop) byte ranges needing upload
+
+    Adding a range merges it with any range it overlaps or touches.
+    """
+    def __init__( self ):
+        self.starts = []
+        self.stops = []
+    def add( self, start, stop ):
+        """Mark [start,stop) dirty"""
+        starts, stops = self.starts, self.stops
+        first = bisect.bisect_left( stops, start )
+        last = bisect.bisect_right( starts, stop )
+        if first < last:
+            start = min( start, starts[first] )
+            stop = max( stop, stops[last-1] )
+        starts[first:last] = [start]
+        stops[first:last] = [stop]
+    def clear( self ):
+        del self.starts[:]
+        del self.stops[:]
+    def __len__( self ):
+        return len( self.starts )
+    def total( self ):
+        """Number of dirty bytes"""
+        return sum( self.stops ) - sum( self.starts )
+    def coalesced( self, gap ):
+        """Ranges with those separated by at most gap clean bytes joined"""
+        result = []
+        for start, stop in zip( self.starts, self.stops ):
+            if result and start - result[-1][1] <= gap:
+                result[-1][1] = stop
+            else:
+                result.append( [start, stop] )
+        return result
+
 from OpenGL import acceleratesupport
 VBO = None
 if acceleratesupport.ACCELERATE_AVAILABLE:
@@ -151,6 +187,10 @@ if VBO is None:
         """
         copied = False
         _no_cache_ = True # do not cache in context data arrays
+        # Estimated fixed cost of one glBufferSubData call, in bytes uploaded;
+        # dirty ranges closer than this are uploaded as one, and the whole
+        # buffer is orphaned and re-uploaded when that is cheaper in total
+        upload_call_bytes = 4096
         def __init__(
             self, data, usage='GL_DYNAMIC_DRAW',
             target='GL_ARRAY_BUFFER', size=None,
@@ -193,10 +233,17 @@ if VBO is None:
                 (such as ctypes pointers) as the array data-source.
             """
             self.usage = usage
+            self._dirty = _DirtyRanges()
+            self.stats = {
+                'bytes_dirtied': 0,
+                'bytes_uploaded': 0,
+                'sub_uploads': 0,
+                'full_uploads': 0,
+                'orphans': 0,
+            }
             self.set_array( data, size )
             self.target = target
             self.buffers = []
-            self._copy_segments = []
         _I_ = None
         implementation = property( get_implementation, )
         def resolve( self, value ):
@@ -214,6 +261,7 @@ if VBO is None:
             """
             self.data = data
             self.copied = False
+            self._dirty.clear()
             if size is not None:
                 self.size = size
             elif self.data is not None:
@@ -232,6 +280,10 @@ if VBO is None:
             of state-aware changes to correctly map the source into the low-level
             OpenGL view of the buffer (which is just bytes as far as the GL
             is concerned).
+
+            The changed byte range is merged into the set of dirty ranges,
+            which copy_data uploads (or replaces with a full upload) at the
+            next bind.
             """
             if slice.step and not slice.step == 1:
                 raise NotImplemented( """Don't know how to map stepped arrays yet""" )
@@ -246,34 +298,25 @@ if VBO is None:
             if stop < 0:
                 stop += len(self.data)
                 stop = max((stop,0))
+            stop = min((stop,len(self.data)))
             self.data[ slice ] = data
-            if self.copied and self.buffers:
-                if start-stop == len(self.data):
+            if self.copied and self.buffers and stop > start:
+                # find the step size from the dimensions and base size...
+                size = ArrayDatatype.arrayByteCount( self.data[0] )
+                self.stats['bytes_dirtied'] += (stop-start) * size
+                if stop-start == len(self.data):
                     # re-copy the whole data-set
                     self.copied = False
-                elif len(data):
-                    # now the fun part, we need to make the array match the
-                    # structure of the array we're going to copy into and make
-                    # the "size" parameter match the value we're going to copy in,
-                    # note that a 2D array (rather than a 1D array) may require
-                    # multiple mappings to copy into the memory area...
-
-                    # find the step size from the dimensions and base size...
-                    size = ArrayDatatype.arrayByteCount( self.data[0] )
-                    #baseSize = ArrayDatatype.unitSize( data )
-                    # now create the start and distance values...
-                    start *= size
-                    stop *= size
+                    self._dirty.clear()
+                else:
                     # wait until the last moment (bind) to copy the data...
-                    self._copy_segments.append(
-                        (start,(stop-start), data)
-                    )
+                    self._dirty.add( start * size, stop * size )
         def __len__( self ):
             """Delegate length/truth checks to our data-array"""
             return len( self.data )
         def __getattr__( self, key ):
             """Delegate failing attribute lookups to our data-array"""
-            if key not in ('data','usage','target','buffers', 'copied','_I_','implementation','_copy_segments' ):
+            if key not in ('data','usage','target','buffers', 'copied','_I_','implementation','_dirty','stats' ):
                 return getattr( self.data, key )
             else:
                 raise AttributeError( key )
@@ -292,15 +335,31 @@ if VBO is None:
             internal view of the data, either by copying the entire data-set 
             over with glBufferData or by updating the already-transferred 
             data with glBufferSubData.
+
+            Dirty ranges closer together than upload_call_bytes are sent
+            as one glBufferSubData, and if the per-call cost plus the bytes
+            to send exceed a full upload, the buffer is orphaned and
+            re-uploaded with glBufferData instead.
             """
             assert self.buffers, """Should do create_buffers before copy_data"""
             if self.copied:
-                if self._copy_segments:
-                    while self._copy_segments:
-                        start,size,data  = self._copy_segments.pop(0)
-                        dataptr = ArrayDatatype.voidDataPointer( data )
-                        self.implementation.glBufferSubData(self.target, start, size, dataptr)
-            else:
+                if self._dirty:
+                    ranges = self._dirty.coalesced( self.upload_call_bytes )
+                    self._dirty.clear()
+                    dirty = sum([ stop-start for (start,stop) in ranges ])
+                    cost = self.upload_call_bytes
+                    if len(ranges) * cost + dirty >= cost + self.size:
+                        self.stats['orphans'] += 1
+                        self.copied = False
+                    else:
+                        base = ArrayDatatype.dataPointer( self.data )
+                        for start,stop in ranges:
+                            self.implementation.glBufferSubData(
+                                self.target, start, stop-start, ctypes.c_void_p( base + start ),
+                            )
+                        self.stats['sub_uploads'] += len(ranges)
+                        self.stats['bytes_uploaded'] += dirty
+            if not self.copied:
                 if self.data is not None and self.size is None:
                     self.size = ArrayDatatype.arrayByteCount( self.data )
                 self.implementation.glBufferData(
@@ -309,6 +368,9 @@ if VBO is None:
                     self.data,
                     self.usage,
                 )
+                self._dirty.clear()
+                self.stats['full_uploads'] += 1
+                self.stats['bytes_uploaded'] += self.size
                 self.copied = True
         def delete( self ):
             """Delete this buffer explicitly"""
@@ -430,6 +492,208 @@ if VBO is None:
             """Returns a c_void_p( instance.offset )"""
             return ctypes.c_void_p( instance.offset )
 
+class StreamingVBO( object ):
+    """Ring of frame-sized regions in one buffer for per-frame dynamic data
+
+    Basic usage:
+
+        stream = vbo.StreamingVBO( (1024, 6), 'f', frames=3 )
+        ...
+        region = stream.next_region() # numpy view to write this frame's data
+        region[:count] = particles
+        stream.commit( count )
+        with stream:
+            glVertexPointer( 3, GL_FLOAT, 24, stream.pointer() )
+            glNormalPointer( GL_FLOAT, 24, stream.pointer( 12 ) )
+            glDrawArrays( GL_POINTS, 0, count )
+        stream.fence() # after the last draw reading this region
+
+    Where glBufferStorage and fence syncs are available the buffer is
+    allocated once as immutable storage, mapped persistently and coherently,
+    and the regions are views straight into the mapping; next_region()
+    waits on the fence placed when that region was last drawn, counting a
+    stall if the GL has not finished with it yet.
+
+    Otherwise (or with persistent=False) the region is a client-side array
+    and commit() orphans the buffer with glBufferData( NULL ) before
+    uploading the written rows with glBufferSubData.
+    """
+    ALIGNMENT = 256
+    _no_cache_ = True # do not cache in context data arrays
+    def __init__(
+        self, shape, dtype='f', frames=3,
+        target='GL_ARRAY_BUFFER', persistent=None,
+    ):
+        """Initialize the ring
+
+        shape, dtype -- numpy shape and dtype of one frame's region
+        frames -- number of regions in flight before next_region() may wait
+        target -- VBO target to which to bind, as for VBO
+        persistent -- True/False to force the mapping or orphaning strategy,
+            None to choose from what the context supports on first use
+        """
+        import numpy
+        self.shape = shape
+        self.dtype = numpy.dtype( dtype )
+        self.frames = frames
+        self.target = target
+        self.persistent = persistent
+        self.nbytes = int( numpy.prod( shape )) * self.dtype.itemsize
+        self.stride = -(-self.nbytes // self.ALIGNMENT) * self.ALIGNMENT
+        self.buffers = []
+        self.regions = []
+        self.fences = [ None ] * frames
+        self.current = -1
+        self.stats = {
+            'frames': 0,
+            'stalls': 0,
+            'stall_ns': 0,
+            'orphans': 0,
+        }
+    implementation = property( get_implementation, )
+    def resolve( self, value ):
+        """Resolve string constant to constant"""
+        if isinstance( value, (bytes,unicode)):
+            return getattr( self.implementation, self.implementation.basename( value ) )
+        return value
+    def create_buffers( self ):
+        """Create and (where possible) persistently map the buffer"""
+        assert not self.buffers, """Already created the buffer"""
+        import numpy
+        from OpenGL.raw.GL.VERSION import GL_3_0, GL_3_2, GL_4_4
+        self.target = self.resolve( self.target )
+        if self.persistent is None:
+            self.persistent = bool(
+                GL_4_4.glBufferStorage and GL_3_0.glMapBufferRange and GL_3_2.glFenceSync
+            )
+        self.buffers = [ long(self.implementation.glGenBuffers(1)) ]
+        self.implementation.glBindBuffer( self.target, self.buffers[0] )
+        if self.persistent:
+            total = self.stride * self.frames
+            flags = GL_4_4.GL_MAP_WRITE_BIT | GL_4_4.GL_MAP_PERSISTENT_BIT | GL_4_4.GL_MAP_COHERENT_BIT
+            GL_4_4.glBufferStorage( self.target, total, None, flags )
+            pointer = GL_3_0.glMapBufferRange( self.target, 0, total, flags )
+            if not pointer:
+                raise error.Error( """Unable to map streaming buffer persistently""" )
+            mapped = numpy.frombuffer( (ctypes.c_byte * total).from_address( pointer ), 'B' )
+            self.regions = [
+                mapped[ i * self.stride: i * self.stride + self.nbytes ].view( self.dtype ).reshape( self.shape )
+                for i in range( self.frames )
+            ]
+        else:
+            self.implementation.glBufferData(
+                self.target, self.stride, None, self.resolve( 'GL_STREAM_DRAW' ),
+            )
+            self.regions = [ numpy.zeros( self.shape, self.dtype ) ]
+        self.implementation.glBindBuffer( self.target, 0 )
+        return self.buffers
+    def next_region( self ):
+        """Advance to the next region and return it as a numpy view for writing
+
+        With persistent mapping, waits until the GL has finished drawing
+        from the region the last time it was used.
+        """
+        if not self.buffers:
+            self.create_buffers()
+        self.current = (self.current + 1) % self.frames
+        self.stats['frames'] += 1
+        if self.persistent:
+            fence = self.fences[ self.current ]
+            if fence is not None:
+                self.fences[ self.current ] = None
+                self.wait( fence )
+            return self.regions[ self.current ]
+        return self.regions[0]
+    def wait( self, fence ):
+        """Block until fence is signalled, counting a stall if it was not already"""
+        from OpenGL.raw.GL.VERSION import GL_3_2
+        try:
+            status = GL_3_2.glClientWaitSync( fence, 0, 0 )
+            if status not in (GL_3_2.GL_ALREADY_SIGNALED, GL_3_2.GL_CONDITION_SATISFIED):
+                self.stats['stalls'] += 1
+                import time
+                start = time.perf_counter_ns()
+                while status == GL_3_2.GL_TIMEOUT_EXPIRED:
+                    status = GL_3_2.glClientWaitSync(
+                        fence, GL_3_2.GL_SYNC_FLUSH_COMMANDS_BIT, 1000000000,
+                    )
+                self.stats['stall_ns'] += time.perf_counter_ns() - start
+                if status == GL_3_2.GL_WAIT_FAILED:
+                    _log.warning( "Wait on streaming buffer fence failed" )
+        finally:
+            GL_3_2.glDeleteSync( fence )
+    def commit( self, count=None ):
+        """Make the rows written to the current region visible to the GL
+
+        count -- number of leading rows written, default the whole region
+
+        A no-op for persistent (coherent) mappings, otherwise orphans the
+        buffer and uploads the rows.
+        """
+        if self.persistent:
+            return
+        region = self.regions[0]
+        nbytes = self.nbytes if count is None else region[:count].nbytes
+        self.implementation.glBindBuffer( self.target, self.buffers[0] )
+        self.implementation.glBufferData(
+            self.target, self.stride, None, self.resolve( 'GL_STREAM_DRAW' ),
+        )
+        if nbytes:
+            self.implementation.glBufferSubData(
+                self.target, 0, nbytes, ArrayDatatype.voidDataPointer( region ),
+            )
+        self.implementation.glBindBuffer( self.target, 0 )
+        self.stats['orphans'] += 1
+    def fence( self ):
+        """Mark the end of the GL commands reading the current region"""
+        if self.persistent and self.current >= 0:
+            from OpenGL.raw.GL.VERSION import GL_3_2
+            if self.fences[ self.current ] is not None:
+                GL_3_2.glDeleteSync( self.fences[ self.current ] )
+            self.fences[ self.current ] = GL_3_2.glFenceSync( GL_3_2.GL_SYNC_GPU_COMMANDS_COMPLETE, 0 )
+    @property
+    def offset( self ):
+        """Byte offset of the current region within the buffer"""
+        if self.persistent:
+            return max( self.current, 0 ) * self.stride
+        return 0
+    def pointer( self, offset=0 ):
+        """c_void_p for passing the current region (plus offset bytes) to gl*Pointer calls"""
+        return ctypes.c_void_p( self.offset + offset )
+    def __int__( self ):
+        """Get our VBO id"""
+        if not self.buffers:
+            self.create_buffers()
+        return self.buffers[0]
+    def bind( self ):
+        """Bind the buffer, creating it if necessary"""
+        self.implementation.glBindBuffer( self.target, int( self ))
+    def unbind( self ):
+        """Unbind the buffer (make normal array operations active)"""
+        self.implementation.glBindBuffer( self.target, 0 )
+    __enter__ = bind
+    def __exit__( self, exc_type=None, exc_val=None, exc_tb=None ):
+        """Context manager exit"""
+        self.unbind()
+        return False # do not supress exceptions...
+    def delete( self ):
+        """Unmap and delete the buffer and any outstanding fences explicitly"""
+        from OpenGL.raw.GL.VERSION import GL_3_2
+        for i, fence in enumerate( self.fences ):
+            if fence is not None:
+                GL_3_2.glDeleteSync( fence )
+                self.fences[i] = None
+        self.regions = []
+        if self.buffers:
+            try:
+                if self.persistent:
+                    self.implementation.glBindBuffer( self.target, self.buffers[0] )
+                    self.implementation.glUnmapBuffer( self.target )
+                    self.implementation.glBindBuffer( self.target, 0 )
+                self.implementation.glDeleteBuffers( 1, self.buffers.pop(0) )
+            except (AttributeError,error.NullFunctionError) as err:
+                pass
+
 _cleaners = {}
 def _cleaner( vbo ):
     """Construct a mapped-array cleaner function to unmap vbo.target"""
@@ -0,0 +1,309 @@
+"""Generated straight-line call functions for finalised wrappers
+
+Without OpenGL_accelerate, Wrapper.finaliseCall returns one of a few dozen
+hand-expanded closures which run the converter pipelines through generators
+and materialise a tuple per stage on every call.  When CODEGEN_WRAPPERS is
+set, this module instead writes a Python function for the wrapper's exact
+shape (which argument has a converter, which C argument is a constant,
+whether values are stored or returned), with every converter called by
+index and intermediate tuples only built where a converter or an error
+report needs them.
+
+Shapes are shared by many entry points, so each shape's source is compiled
+once per process, and the compiled code is kept in a marshal file keyed by
+the PyOpenGL version, the Python cache tag and the configuration flags so
+that later runs skip the compile as well.  Set PYOPENGL_CODEGEN_CACHE to a
+directory to move the cache, or to an empty string to disable it.
+
+Run ``python -m OpenGL.codegen`` for a per-call comparison with the
+closure-based wrappers.
+"""
+import ctypes, logging, marshal, os, sys, hashlib
+from OpenGL import error, _configflags
+from OpenGL._null import NULL
+from OpenGL.version import __version__
+_log = logging.getLogger( 'OpenGL.codegen' )
+
+_builders = {}
+_cache = None
+_cacheDirty = False
+
+def shape( wrapper ):
+    """Describe the parts of wrapper that decide the generated code"""
+    pyConverters = getattr( wrapper, 'pyConverters', None ) or None
+    cConverters = getattr( wrapper, 'cConverters', None ) or None
+    cResolvers = getattr( wrapper, 'cResolvers', None ) or None
+    return (
+        pyConverters and ''.join([ '-' if c is None else 'c' for c in pyConverters ]),
+        pyConverters and len([p for p in pyConverters if not getattr( p, 'optional', False)]),
+        cConverters and ''.join([ 'f' if hasattr( c, '__call__' ) else 'k' for c in cConverters ]),
+        cResolvers and ''.join([ '-' if c is None else 'r' for c in cResolvers ]),
+        getattr( wrapper, 'storeValues', None ) is not None,
+        getattr( wrapper, 'returnValues', None ) is not None,
+    )
+
+def _tuple( names ):
+    if len(names) == 1:
+        return '(%s,)'%(names[0],)
+    return '(%s)'%( ', '.join( names ))
+
+def source( key ):
+    """Python source of a builder function for the given shape"""
+    pyShape, required, cShape, rShape, store, ret = key
+    lines = [
+        'def build( self, wrappedOperation, pyConverters, cConverters, cResolvers, storeValues, returnValues ):',
+    ]
+    body = []
+    # Python-level arguments
+    if pyShape is not None:
+        body.append( 'if len(args) < %d:'%( required, ))
+        body.append( '    raise argumentCountError( self, %d, args )'%( required, ))
+        pyNames = []
+        for i, kind in enumerate( pyShape ):
+            name = 'p%d'%( i, )
+            pyNames.append( name )
+            if kind == '-':
+                body.append( '%s = args[%d]'%( name, i ))
+            else:
+                lines.append( '    py%d = pyConverters[%d]'%( i, i ))
+                body.extend([
+                    'try:',
+                    '    %s = py%d( args[%d], self, args )'%( name, i, i ),
+                    'except IndexError:',
+                    '    %s = NULL'%( name, ),
+                    'except Exception as err:',
+                    '    if hasattr( err, "args" ):',
+                    '        err.args += ( py%d, )'%( i, ),
+                    '    raise',
+                ])
+        pyArgs = _tuple( pyNames )
+    else:
+        pyNames = None
+        pyArgs = 'args'
+    needPyTuple = (cShape is not None and 'f' in cShape) or store or ret
+    if needPyTuple and pyNames is not None:
+        body.append( 'pyArgs = %s'%( pyArgs, ))
+        pyArgs = 'pyArgs'
+    # C-level arguments
+    if cShape is not None:
+        cNames = []
+        for i, kind in enumerate( cShape ):
+            if kind == 'k':
+                lines.append( '    k%d = cConverters[%d]'%( i, i ))
+                cNames.append( 'k%d'%( i, ))
+            else:
+                lines.append( '    c%d = cConverters[%d]'%( i, i ))
+                body.extend([
+                    'try:',
+                    '    a%d = c%d( %s, %d, self )'%( i, i, pyArgs, i ),
+                    'except Exception as err:',
+                    '    if hasattr( err, "args" ):',
+                    '        err.args += ( "Failure in cConverter %%r"%%( c%d, ), %s, %d, self )'%( i, pyArgs, i ),
+                    '    raise',
+                ])
+                cNames.append( 'a%d'%( i, ))
+    elif pyNames is not None:
+        cNames = pyNames
+    else:
+        cNames = None
+    # ctypes-level arguments
+    if rShape is not None:
+        callNames = []
+        for i, kind in enumerate( rShape ):
+            value = cNames[i] if cNames is not None else 'args[%d]'%( i, )
+            if kind == '-':
+                callNames.append( value )
+            else:
+                lines.append( '    r%d = cResolvers[%d]'%( i, i ))
+                body.extend([
+                    'try:',
+                    '    x%d = r%d( %s )'%( i, i, value ),
+                    'except Exception as err:',
+                    '    err.args += ( r%d, )'%( i, ),
+                    '    raise',
+                ])
+                callNames.append( 'x%d'%( i, ))
+    else:
+        callNames = cNames
+    cArgs = _tuple( cNames ) if cNames is not None else 'args'
+    if callNames is not None:
+        call = 'wrappedOperation( %s )'%( ', '.join( callNames ), )
+        cArguments = _tuple( callNames ) if callNames else '()'
+    else:
+        call = 'wrappedOperation( *args )'
+        cArguments = 'args'
+    body.extend([
+        'try:',
+        '    result = %s'%( call, ),
+        'except ctypes.ArgumentError as err:',
+        '    err.args = err.args + ( %s, )'%( cArguments, ),
+        '    raise err',
+        'except GLError as err:',
+        '    err.cArgs = %s'%( cArgs, ),
+        '    err.pyArgs = %s'%( pyArgs, ),
+        '    raise err',
+    ])
+    if store or ret:
+        if cNames is not None and cNames is not pyNames:
+            body.append( 'cArgs = %s'%( cArgs, ))
+            cArgs = 'cArgs'
+        elif cNames is pyNames:
+            cArgs = pyArgs
+    if store:
+        body.append( 'storeValues( result, self, %s, %s )'%( pyArgs, cArgs ))
+    if ret:
+        body.append( 'return returnValues( result, self, %s, %s )'%( pyArgs, cArgs ))
+    else:
+        body.append( 'return result' )
+    lines.append( '    def wrapperCall( *args ):' )
+    lines.extend([ '        ' + line for line in body ])
+    lines.append( '    return wrapperCall' )
+    return '\n'.join( lines ) + '\n'
+
+def argumentCountError( wrapper, required, args ):
+    return ValueError(
+        """%s requires %r arguments (%s), received %s: %r"""%(
+            wrapper.wrappedOperation.__name__,
+            required,
+            ", ".join( wrapper.pyConverterNames ),
+            len(args),
+            args
+        )
+    )
+
+def cacheFile( prefix='wrappers' ):
+    """Location of the marshal cache for this version and configuration, or None"""
+    directory = os.environ.get( 'PYOPENGL_CODEGEN_CACHE' )
+    if directory is None:
+        base = os.environ.get( 'XDG_CACHE_HOME' ) or os.path.join( os.path.expanduser( '~' ), '.cache' )
+        directory = os.path.join( base, 'pyopengl' )
+    if not directory:
+        return None
+    flags = repr(sorted(
+        (name, value) for (name, value) in vars( _configflags ).items()
+        if name.isupper()
+    ))
+    digest = hashlib.sha1( flags.encode( 'utf-8' )).hexdigest()[:12]
+    return os.path.join( directory, '%s-%s-%s-%s.marshal'%(
+        prefix, __version__, sys.implementation.cache_tag, digest,
+    ))
+
+def _loadCache( ):
+    global _cache
+    _cache = {}
+    filename = cacheFile()
+    if filename and os.path.exists( filename ):
+        try:
+            with open( filename, 'rb' ) as handle:
+                _cache = marshal.load( handle )
+        except Exception as err:
+            _log.info( "Ignoring unreadable wrapper cache %s: %s", filename, err )
+            _cache = {}
+        else:
+            _log.debug( "Loaded %s generated wrapper shapes from %s", len(_cache), filename )
+    return _cache
+
+def saveCache( ):
+    """Write newly compiled shapes to the on-disk cache"""
+    global _cacheDirty
+    filename = cacheFile()
+    if not (_cacheDirty and filename):
+        return
+    try:
+        os.makedirs( os.path.dirname( filename ), exist_ok=True )
+        temporary = '%s.%d'%( filename, os.getpid())
+        with open( temporary, 'wb' ) as handle:
+            marshal.dump( _cache, handle )
+        os.replace( temporary, filename )
+        _cacheDirty = False
+    except Exception as err:
+        _log.info( "Unable to write wrapper cache %s: %s", filename, err )
+
+def builder( key ):
+    """Retrieve the builder function for a shape, compiling it if necessary"""
+    global _cacheDirty
+    function = _builders.get( key )
+    if function is None:
+        cache = _cache if _cache is not None else _loadCache()
+        cacheKey = repr( key )
+        code = cache.get( cacheKey )
+        if code is None:
+            code = compile( source( key ), '<OpenGL.codegen %s>'%( cacheKey, ), 'exec' )
+            cache[cacheKey] = code
+            if not _cacheDirty:
+                _cacheDirty = True
+                import atexit
+                atexit.register( saveCache )
+        namespace = {
+            'ctypes': ctypes,
+            'GLError': error.GLError,
+            'NULL': NULL,
+            'argumentCountError': argumentCountError,
+        }
+        exec( code, namespace )
+        function = _builders[key] = namespace['build']
+    return function
+
+def generate( wrapper ):
+    """Produce the specialised call function for a finalised wrapper"""
+    return builder( shape( wrapper ))(
+        wrapper,
+        wrapper.wrappedOperation,
+        getattr( wrapper, 'pyConverters', None ),
+        getattr( wrapper, 'cConverters', None ),
+        getattr( wrapper, 'cResolvers', None ),
+        getattr( wrapper, 'storeValues', None ),
+        getattr( wrapper, 'returnValues', None ),
+    )
+
+def benchmark( count=100000 ):
+    """Compare per-call overhead of closure-based and generated wrappers
+
+    The wrapped ctypes functions are swapped for a no-op so the numbers
+    only cover argument conversion, which is what the wrappers add.  With
+    no current context a stand-in context id keeps pointer storage working.
+    """
+    import numpy
+    from OpenGL import GL, platform, wrapper as wrappermodule
+    getCurrentContext = platform.GetCurrentContext
+    if not getCurrentContext():
+        platform.GetCurrentContext = lambda: 1
+    vertices = numpy.zeros( (64,3), dtype='f' )
+    pixels = numpy.zeros( (64,64,4), dtype='B' )
+    cases = [
+        ('glVertexPointer', (3, GL.GL_FLOAT, 0, vertices)),
+        ('glGetDoublev', (GL.GL_MODELVIEW_MATRIX,)),
+        ('glTexImage2D', (GL.GL_TEXTURE_2D, 0, GL.GL_RGBA, 64, 64, 0, GL.GL_RGBA, GL.GL_UNSIGNED_BYTE, pixels)),
+    ]
+    def noop( *args ):
+        return None
+    results = {}
+    try:
+        for name, args in cases:
+            results[name] = _compare( getattr( GL, name ), args, count, noop, wrappermodule )
+    finally:
+        platform.GetCurrentContext = getCurrentContext
+    return results
+
+def _compare( function, args, count, noop, wrappermodule ):
+    import timeit
+    finalCall = function.getFinalCall()
+    original = function.wrappedOperation
+    function.wrappedOperation = noop
+    try:
+        closure = wrappermodule.Wrapper.finaliseCall( function )
+        generated = generate( function )
+        timings = []
+        for call in (closure, generated):
+            call( *args )
+            timings.append( min( timeit.repeat( lambda: call( *args ), number=count, repeat=5 )) / count )
+    finally:
+        function.wrappedOperation = original
+        function.setFinalCall( finalCall )
+    print( '%-16s closure %7.3f us  generated %7.3f us  (%.0f%% faster)'%(
+        function.__name__, timings[0] * 1e6, timings[1] * 1e6, 100 * (1 - timings[1] / timings[0]),
+    ))
+    return timings
+
+if __name__ == "__main__":
+    benchmark()
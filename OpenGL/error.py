@@ -57,7 +57,15 @@ class GLError( Error ):
         cArguments -- ctypes-level arguments to the operation,
             often raw integers for pointers and the like
         description -- OpenGL description of the error (textual)
+        recentCalls -- with DEFERRED_ERROR_CHECKING, the (baseOperation,
+            cArguments) pairs issued since the previous sync point, any
+            of which may have raised the error
+        debugMessages -- (message, baseOperation) pairs for the KHR_debug
+            errors reported in that window, baseOperation being the call
+            which raised each (None if it was not error-checked)
     """
+    recentCalls = None
+    debugMessages = None
     def __init__( 
         self, 
         err=None, 
@@ -86,6 +94,8 @@ class GLError( Error ):
         'cArgs',
         'cArguments',
         'result', 
+        'debugMessages',
+        'recentCalls',
     )
     def __str__( self ):
         """Create a fully formatted representation of the error"""
@@ -151,6 +161,21 @@ class GLError( Error ):
             return '%s = %s'%( property, value.__name__ )
         else:
             return '%s = %r'%( property, value )
+    def format_recentCalls( self, property, value ):
+        """Format the deferred-checking call window, oldest first"""
+        return '%s = [\n\t\t%s\n\t]'%( property, ',\n\t\t'.join([
+            '%s( %s )'%( 
+                getattr( operation, '__name__', operation ), 
+                ', '.join([ self.shortRepr( arg, False ) for arg in arguments or () ]),
+            )
+            for (operation, arguments) in value
+        ]))
+    def format_debugMessages( self, property, value ):
+        """Format KHR_debug messages with the call which raised each"""
+        return '%s = [\n\t\t%s\n\t]'%( property, ',\n\t\t'.join([
+            '%s (in %s)'%( message, getattr( operation, '__name__', operation ) )
+            for (message, operation) in value
+        ]))
 
 class GLUError( Error ):
     """GLU error implementation class"""
@@ -163,7 +188,7 @@ class EGLError( GLError ):
 if _configflags.ERROR_CHECKING:
     from OpenGL import acceleratesupport
     _ErrorChecker = None
-    if acceleratesupport.ACCELERATE_AVAILABLE:
+    if acceleratesupport.ACCELERATE_AVAILABLE and not _configflags.DEFERRED_ERROR_CHECKING:
         try:
             from OpenGL_accelerate.errorchecker import _ErrorChecker
         except ImportError as err:
@@ -240,8 +265,149 @@ if _configflags.ERROR_CHECKING:
             def onEnd( self ):
                 """Called by glEnd to record the fact that glGetError will work"""
                 self._currentChecker = self._registeredChecker
+        if _configflags.DEFERRED_ERROR_CHECKING:
+            import collections
+            GL_DEBUG_TYPE_ERROR = 0x824C
+            class _DeferredErrorChecker( _ErrorChecker ):
+                """Error checker which only calls glGetError at sync points
+                
+                Every checked call is appended to a ring buffer shared by
+                all checkers (so GL and GLU calls interleave correctly),
+                and check() examines the error state, raising a GLError
+                which carries the calls made since the previous check.
+                
+                Where the context supports KHR_debug a synchronous debug
+                callback is installed on the first recorded call.  Its 
+                error messages arrive while the offending call is still 
+                running, so they wait in a pending slot until that call's 
+                glCheckError attributes them to it.
+                
+                Attributes:
+                    HISTORY -- number of calls kept in the ring buffer
+                    SYNC_POINTS -- entry points which trigger a check 
+                        after they return
+                """
+                HISTORY = 64
+                SYNC_POINTS = frozenset(( 'glFinish', ))
+                recent = collections.deque( maxlen=HISTORY )
+                debugMessages = []
+                _pendingMessages = []
+                _debugContexts = {}
+                _debugInstalled = False
+                def glCheckError( 
+                    self,
+                    result,
+                    baseOperation=None,
+                    cArguments=None,
+                    *args
+                ):
+                    """Record the call, checking errors only for sync points"""
+                    if not _DeferredErrorChecker._debugInstalled:
+                        self._enableDebugOutput()
+                    self.recent.append( (baseOperation, cArguments) )
+                    if self._pendingMessages:
+                        self._attributeMessages( baseOperation, cArguments )
+                    if getattr( baseOperation, '__name__', None ) in self.SYNC_POINTS:
+                        self.check()
+                    return result
+                @classmethod
+                def setHistory( cls, count ):
+                    """Change the number of calls remembered between sync points"""
+                    cls.recent = collections.deque( cls.recent, maxlen=count )
+                    cls.HISTORY = count
+                def check( self ):
+                    """Sync point, raise GLError if the GL reports an error
+                    
+                    Does nothing inside glBegin/glEnd.  Otherwise the call 
+                    window is cleared whether or not an error is found, 
+                    and any further queued error flags are drained.  The 
+                    error's baseOperation and cArguments are those of the 
+                    call a KHR_debug error message was attributed to, or 
+                    None when no message identifies the call.
+                    """
+                    if self._currentChecker is self.nullGetError:
+                        return None
+                    # picks up contexts made current since the first call
+                    self._enableDebugOutput()
+                    err = self._currentChecker()
+                    if err is None:
+                        return None
+                    recent = list( self.recent )
+                    self.recent.clear()
+                    if self._pendingMessages:
+                        # raised by calls which are not error-checked
+                        self._attributeMessages( None, None )
+                    messages = self.debugMessages[:]
+                    del self.debugMessages[:]
+                    if err == self._noErrorResult:
+                        return None
+                    for i in range( 8 ):
+                        if self._currentChecker() in (None, self._noErrorResult):
+                            break
+                    message, baseOperation, cArguments = messages[0] if messages else (None, None, None)
+                    error = self._errorClass(
+                        err,
+                        cArguments = cArguments,
+                        baseOperation = baseOperation,
+                        description = message,
+                    )
+                    error.recentCalls = recent
+                    error.debugMessages = [
+                        (message, operation) for (message, operation, arguments) in messages
+                    ] or None
+                    raise error
+                def _attributeMessages( self, baseOperation, cArguments ):
+                    """Move pending debug messages to debugMessages as raised by baseOperation"""
+                    for message in self._pendingMessages:
+                        self.debugMessages.append( (message, baseOperation, cArguments) )
+                    del self._pendingMessages[:]
+                def _enableDebugOutput( self ):
+                    """Route KHR_debug error messages into debugMessages, once per context"""
+                    if self._getErrors is None:
+                        return
+                    context = platform.GetCurrentContext()
+                    if not context or context in self._debugContexts:
+                        return
+                    _DeferredErrorChecker._debugInstalled = True
+                    # the calls below are checked too, and must not recurse
+                    self._debugContexts[context] = None
+                    callback = None
+                    try:
+                        from OpenGL.raw.GL.VERSION import GL_1_0, GL_4_3
+                        from OpenGL.raw.GL.KHR import debug
+                        from OpenGL.raw.GL._types import GLDEBUGPROC
+                        for register in (GL_4_3.glDebugMessageCallback, debug.glDebugMessageCallbackKHR):
+                            if register:
+                                callback = GLDEBUGPROC( self._debugMessage )
+                                register( callback, None )
+                                GL_1_0.glEnable( GL_4_3.GL_DEBUG_OUTPUT )
+                                # deliver messages inside the offending call
+                                GL_1_0.glEnable( GL_4_3.GL_DEBUG_OUTPUT_SYNCHRONOUS )
+                                break
+                    except Exception as err:
+                        _log.info( "Unable to install KHR_debug message callback: %s", err )
+                        callback = None
+                    # keeps the callback alive for the life of the context
+                    self._debugContexts[context] = callback
+                def _debugMessage( self, source, type, id, severity, length, message, userParam ):
+                    """KHR_debug callback, holds errors until the running call is recorded"""
+                    if type == GL_DEBUG_TYPE_ERROR:
+                        if length >= 0:
+                            message = message[:length]
+                        self._pendingMessages.append( message.decode( 'utf-8', 'replace' ) )
+            _ErrorChecker = _DeferredErrorChecker
 else:
     _ErrorChecker = None
+
+def checkDeferredErrors( ):
+    """Sync point for DEFERRED_ERROR_CHECKING, raises GLError for pending errors
+    
+    A no-op unless deferred checking is enabled.
+    """
+    from OpenGL.raw.GL import _errors
+    check = getattr( _errors._error_checker, 'check', None )
+    if check is not None:
+        check()
 # Compatibility with PyOpenGL 2.x series
 GLUerror = GLUError
 GLerror = GLError 
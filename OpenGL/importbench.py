@@ -0,0 +1,217 @@
+"""Import-time benchmarks for the PyOpenGL namespace packages
+
+Each sample imports one subpackage (``from OpenGL.GL import *`` and so on)
+in a fresh interpreter and reports the wall time of the import statement,
+the growth in resident memory, the number of modules loaded and, once the
+import is done, how many Constant objects, entry points and wrappers exist.
+
+Cold samples get an empty bytecode cache (PYTHONPYCACHEPREFIX) and empty
+PyOpenGL caches (PYOPENGL_CODEGEN_CACHE), so everything is compiled from
+source.  Warm samples share caches primed by a first, discarded run.  The
+operating system's file cache is not flushed in either case.
+
+Usage:
+
+    python -m OpenGL.importbench [--output results.json]
+        [--baseline baseline.json] [--threshold 10] [--repeat 5]
+        [--packages GL,GLU,GLUT,GLES2,EGL,osmesa]
+
+With --baseline the warm median times are compared to a previously saved
+result, and the exit status is 1 if any package got slower by more than
+the threshold (in percent).  Configuration flags such as
+PYOPENGL_LAZY_NAMESPACES are passed through from the environment.
+"""
+import json, os, subprocess, sys, tempfile, shutil
+import OpenGL
+from OpenGL.version import __version__
+
+PACKAGES = ('GL', 'GLU', 'GLUT', 'GLES2', 'EGL', 'osmesa')
+# PYOPENGL_PLATFORM used for packages which only load on their own platform
+PLATFORMS = {
+    'EGL': 'egl',
+    'osmesa': 'osmesa',
+}
+
+CHILD = r'''
+import sys, time, gc, json
+def rss():
+    try:
+        with open( '/proc/self/status' ) as handle:
+            for line in handle:
+                if line.startswith( 'VmRSS:' ):
+                    return int( line.split()[1] )
+    except (IOError, OSError):
+        pass
+    import resource
+    usage = resource.getrusage( resource.RUSAGE_SELF ).ru_maxrss
+    return usage // 1024 if sys.platform == 'darwin' else usage
+statement = sys.argv[1]
+before_rss = rss()
+before_modules = len( sys.modules )
+start = time.perf_counter()
+exec( statement, {} )
+elapsed = time.perf_counter() - start
+after_rss = rss()
+after_modules = len( sys.modules )
+from OpenGL import constant, wrapper
+from OpenGL.platform import baseplatform
+objects = gc.get_objects()
+entryPoints = [ o for o in objects if isinstance( o, baseplatform._NullFunctionPointer ) ]
+json.dump( {
+    'time': elapsed,
+    'rss_kb': after_rss - before_rss,
+    'modules': after_modules - before_modules,
+    'constants': len([ o for o in objects if isinstance( o, constant.Constant ) ]),
+    'entry_points': len( entryPoints ),
+    'resolved': len([ o for o in entryPoints if o.resolved ]),
+    'wrappers': len([ o for o in objects if isinstance( o, wrapper.Wrapper ) ]),
+}, sys.stdout )
+'''
+
+def statement( package ):
+    return 'from OpenGL.%s import *'%( package, )
+
+def sample( package, pycache, cache ):
+    """Run one fresh-interpreter import of package, returning the child's report"""
+    environment = dict( os.environ )
+    root = os.path.dirname( os.path.dirname( os.path.abspath( OpenGL.__file__ )))
+    environment['PYTHONPATH'] = os.pathsep.join(
+        [ root ] + [ p for p in [ environment.get( 'PYTHONPATH' ) ] if p ]
+    )
+    environment['PYTHONPYCACHEPREFIX'] = pycache
+    environment.pop( 'PYTHONDONTWRITEBYTECODE', None )
+    environment['PYOPENGL_CODEGEN_CACHE'] = cache
+    if package in PLATFORMS:
+        environment['PYOPENGL_PLATFORM'] = PLATFORMS[package]
+    process = subprocess.run(
+        [ sys.executable, '-c', CHILD, statement( package ) ],
+        env = environment,
+        stdout = subprocess.PIPE,
+        stderr = subprocess.PIPE,
+        universal_newlines = True,
+    )
+    if process.returncode:
+        lines = process.stderr.strip().splitlines() or [ 'exit status %s'%( process.returncode, ) ]
+        raise RuntimeError( lines[-1] )
+    return json.loads( process.stdout )
+
+def median( values ):
+    values = sorted( values )
+    middle = len( values ) // 2
+    if len( values ) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2.0
+
+def measure( package, repeat=5 ):
+    """Cold and warm samples for one package"""
+    scratch = tempfile.mkdtemp( prefix='pyopengl-importbench-' )
+    try:
+        cold = []
+        for i in range( repeat ):
+            cold.append( sample(
+                package,
+                os.path.join( scratch, 'cold-pycache-%d'%( i, )),
+                os.path.join( scratch, 'cold-cache-%d'%( i, )),
+            ))
+        warmPycache = os.path.join( scratch, 'warm-pycache' )
+        warmCache = os.path.join( scratch, 'warm-cache' )
+        sample( package, warmPycache, warmCache )
+        warm = [ sample( package, warmPycache, warmCache ) for i in range( repeat ) ]
+    finally:
+        shutil.rmtree( scratch, ignore_errors=True )
+    result = {
+        'statement': statement( package ),
+        'cold': [ s['time'] for s in cold ],
+        'warm': [ s['time'] for s in warm ],
+        'cold_median': median([ s['time'] for s in cold ]),
+        'warm_median': median([ s['time'] for s in warm ]),
+        'rss_kb': median([ s['rss_kb'] for s in warm ]),
+    }
+    for key in ('modules', 'constants', 'entry_points', 'resolved', 'wrappers'):
+        result[key] = warm[-1][key]
+    return result
+
+def run( packages=PACKAGES, repeat=5, report=None ):
+    """Benchmark each package, returning a JSON-compatible description"""
+    from OpenGL import _configflags
+    results = {}
+    for package in packages:
+        try:
+            results[package] = measure( package, repeat )
+        except RuntimeError as err:
+            results[package] = { 'statement': statement( package ), 'error': str( err ) }
+        if report:
+            report( package, results[package] )
+    return {
+        'version': __version__,
+        'python': sys.version.split()[0],
+        'platform': sys.platform,
+        'repeat': repeat,
+        'flags': dict([
+            (name, value) for (name, value) in sorted( vars( _configflags ).items())
+            if name.isupper()
+        ]),
+        'results': results,
+    }
+
+def summary( package, result ):
+    if 'error' in result:
+        return '%-7s failed: %s'%( package, result['error'] )
+    return '%-7s cold %7.1f ms  warm %7.1f ms  rss %+7d kB  modules %4d  constants %5d  entry points %5d (%d resolved)  wrappers %4d'%(
+        package,
+        result['cold_median'] * 1e3,
+        result['warm_median'] * 1e3,
+        result['rss_kb'],
+        result['modules'],
+        result['constants'],
+        result['entry_points'],
+        result['resolved'],
+        result['wrappers'],
+    )
+
+def compare( current, baseline, threshold=10.0 ):
+    """Print warm-time changes against baseline, return names of regressed packages"""
+    regressed = []
+    for package, result in sorted( current['results'].items()):
+        previous = baseline.get( 'results', {} ).get( package )
+        if 'error' in result or not previous or 'error' in previous:
+            print( '%-7s not comparable'%( package, ))
+            continue
+        change = 100.0 * (result['warm_median'] / previous['warm_median'] - 1.0)
+        print( '%-7s warm %7.1f -> %7.1f ms (%+6.1f%%)  rss %+7d -> %+7d kB  modules %4d -> %4d'%(
+            package,
+            previous['warm_median'] * 1e3, result['warm_median'] * 1e3, change,
+            previous['rss_kb'], result['rss_kb'],
+            previous['modules'], result['modules'],
+        ))
+        if change > threshold:
+            regressed.append( package )
+    return regressed
+
+def main( argv=None ):
+    import argparse
+    parser = argparse.ArgumentParser( description='Measure PyOpenGL import times in fresh interpreters' )
+    parser.add_argument( '--packages', default=','.join( PACKAGES ),
+        help='comma-separated subpackages of OpenGL to import' )
+    parser.add_argument( '--repeat', type=int, default=5, help='samples per package and mode' )
+    parser.add_argument( '--output', help='write the results to this JSON file' )
+    parser.add_argument( '--baseline', help='compare against a previously written JSON file' )
+    parser.add_argument( '--threshold', type=float, default=10.0,
+        help='percent slowdown in warm median time counted as a regression' )
+    args = parser.parse_args( argv )
+    packages = [ p.strip() for p in args.packages.split( ',' ) if p.strip() ]
+    results = run( packages, args.repeat, report=lambda package, result: print( summary( package, result )))
+    if args.output:
+        with open( args.output, 'w' ) as handle:
+            json.dump( results, handle, indent=2, sort_keys=True )
+    if args.baseline:
+        with open( args.baseline ) as handle:
+            baseline = json.load( handle )
+        regressed = compare( results, baseline, args.threshold )
+        if regressed:
+            print( 'Regressed: %s'%( ', '.join( regressed ), ))
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit( main())
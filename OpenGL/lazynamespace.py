@@ -0,0 +1,270 @@
+"""Lazily populated package namespaces (OpenGL.GL, GLU, GLUT, GLES2, GLES3)
+
+With LAZY_NAMESPACES set, a namespace package like OpenGL.GL does not
+star-import its source modules.  It installs a module-level __getattr__
+backed by an index of every name those modules would have provided:
+
+    * constants are rebuilt straight from the values stored in the index
+    * entry points become LazyEntryPoint stubs which import their source
+      module on first call and then put the real function in their place
+    * modules that leak into the namespace, including the package's own
+      submodules which importing the sources binds on it, are bound as
+      lazy-loading modules
+    * anything else (classes, font handles...) is fetched from its defining
+      module, or failing that by importing the source
+
+``from OpenGL.GL import *`` therefore still binds every name it binds
+without LAZY_NAMESPACES (underscore names are left out, as a star import
+of a package without __all__ leaves them out), but only the source modules
+whose entry points actually get called are imported.
+
+The index is built the slow way (by importing everything) the first time
+and cached next to the generated wrappers, see OpenGL.codegen.cacheFile.
+"""
+import importlib, importlib.util, logging, marshal, os, sys, types
+from OpenGL import constant
+_log = logging.getLogger( 'OpenGL.lazynamespace' )
+
+# bump when the index records change, so older cached indices are rebuilt
+INDEX_FORMAT = 2
+
+CONSTANT_TYPES = {
+    cls.__name__: cls
+    for cls in (constant.IntConstant, constant.LongConstant, constant.FloatConstant, constant.StringConstant)
+}
+
+def exportedNames( module ):
+    """The names ``from module import *`` binds"""
+    names = getattr( module, '__all__', None )
+    if names is None:
+        names = [ name for name in vars( module ) if not name.startswith( '_' ) ]
+    return names
+
+def isEntryPoint( value ):
+    """Whether value is a function-like object worth deferring"""
+    return callable( value ) and not isinstance( value, (type, types.ModuleType) )
+
+def describe( name, value, source, holders=() ):
+    """Index record for one exported value
+
+    holders -- other module names, in order of preference, searched for the
+        value so it can be fetched without importing the source
+    """
+    if isinstance( value, constant.Constant ):
+        return ('k', source, type(value).__name__, value.name, value.__getnewargs__()[1])
+    if value is None or isinstance( value, (int, float, str, bytes) ):
+        return ('v', source, value)
+    if isinstance( value, types.ModuleType ):
+        return ('m', source, value.__name__)
+    if isEntryPoint( value ):
+        return ('f', source)
+    module = getattr( value, '__module__', None )
+    qualname = getattr( value, '__qualname__', None )
+    if isinstance( module, str ) and isinstance( qualname, str ) and '.' not in qualname:
+        try:
+            if getattr( importlib.import_module( module ), qualname ) is value:
+                return ('r', source, module, qualname)
+        except Exception:
+            pass
+    for module in holders:
+        if vars( sys.modules[module] ).get( name, describe ) is value:
+            return ('r', source, module, name)
+    return ('s', source)
+
+def buildIndex( namespace, sources, aliases ):
+    """Import every source and record where each exported name comes from
+
+    Later sources override earlier ones as with sequential star imports, but
+    an object re-exported unchanged is credited to the first source that
+    provides it, so it can be fetched without importing the later one.
+    Importing the sources binds the namespace's submodules on it as well,
+    so they are indexed as modules.
+    """
+    def candidates( ):
+        return set([
+            name for (name, module) in list( sys.modules.items())
+            if name.startswith( 'OpenGL.' ) and name != namespace and '__getattr__' not in vars( module )
+        ])
+    loaded = candidates()
+    final = {}
+    for position, source in enumerate( sources ):
+        module = importlib.import_module( source )
+        for name in exportedNames( module ):
+            value = getattr( module, name )
+            if name in final and final[name][1] is value:
+                continue
+            final[name] = (position, value)
+    # modules the namespace imports anyway come first, then the smallest
+    # modules, which are the likeliest to define rather than re-export
+    holders = sorted( loaded ) + sorted(
+        candidates() - loaded - set( sources ),
+        key = lambda name: (len( vars( sys.modules[name] )), name),
+    )
+    index = dict([
+        (name, describe( name, value, sources[position], holders ))
+        for name, (position, value) in final.items()
+    ])
+    for alias, target in (aliases or {}).items():
+        index[alias] = index[target]
+    prefix = namespace + '.'
+    for child in sorted( candidates() | loaded ):
+        if child.startswith( prefix ) and '.' not in child[len(prefix):]:
+            index.setdefault( child[len(prefix):], ('m', child, child) )
+    return index
+
+def sourceStamp( sources ):
+    """Modification times of the source files, to notice edits to the tree"""
+    stamps = []
+    for source in sources:
+        module = sys.modules.get( source )
+        filename = getattr( module, '__file__', None )
+        if filename is None:
+            spec = importlib.util.find_spec( source )
+            filename = spec and spec.origin
+        try:
+            stamps.append( int( os.stat( filename ).st_mtime ))
+        except (OSError, TypeError):
+            stamps.append( 0 )
+    return stamps
+
+def loadIndex( name, sources, aliases ):
+    """Cached index for the namespace, building and storing it if needed"""
+    from OpenGL.codegen import cacheFile
+    from OpenGL import platform
+    filename = cacheFile( 'namespace-%s-%s'%( name, type( platform.PLATFORM ).__name__ ))
+    stamp = sourceStamp( sources )
+    if filename and os.path.exists( filename ):
+        try:
+            with open( filename, 'rb' ) as handle:
+                cachedFormat, cachedStamp, cachedSources, index = marshal.load( handle )
+            if cachedFormat == INDEX_FORMAT and cachedStamp == stamp and cachedSources == list( sources ):
+                return index
+        except Exception as err:
+            _log.info( "Rebuilding unreadable namespace index %s: %s", filename, err )
+    index = buildIndex( name, sources, aliases )
+    if filename:
+        try:
+            os.makedirs( os.path.dirname( filename ), exist_ok=True )
+            temporary = '%s.%d'%( filename, os.getpid())
+            with open( temporary, 'wb' ) as handle:
+                marshal.dump( (INDEX_FORMAT, stamp, list( sources ), index), handle )
+            os.replace( temporary, filename )
+        except Exception as err:
+            _log.info( "Unable to write namespace index %s: %s", filename, err )
+    return index
+
+class LazyEntryPoint( object ):
+    """Stand-in for an entry point whose module has not been imported yet
+
+    The first call (or attribute access, or truth test) imports the source
+    module, stores the real function in the namespace, and swaps it in for
+    the stub under every name the namespace bound it to (aliases such as
+    glRotate for glRotated included) in every module that star-imported
+    it.  Stubs held anywhere else keep forwarding to the real function.
+    """
+    __slots__ = ('__name__', 'namespace', 'source', 'target', 'names')
+    def __init__( self, name, namespace, source ):
+        self.__name__ = name
+        self.namespace = namespace
+        self.source = source
+        self.target = None
+        self.names = set()
+    def resolve( self ):
+        target = self.target
+        if target is None:
+            target = self.target = getattr( importlib.import_module( self.source ), self.__name__ )
+            names = self.names
+            for module in list( sys.modules.values()):
+                if not isLoaded( module ):
+                    # a LazyLoader module which has not run yet cannot hold
+                    # the stub, and any attribute access would load it
+                    continue
+                values = getattr( module, '__dict__', None )
+                if values is not None:
+                    for name in names:
+                        if values.get( name ) is self:
+                            values[name] = target
+        return target
+    def __call__( self, *args, **named ):
+        target = self.target
+        if target is None:
+            target = self.resolve()
+        return target( *args, **named )
+    def __getattr__( self, key ):
+        return getattr( self.resolve(), key )
+    def __bool__( self ):
+        return bool( self.resolve())
+    __nonzero__ = __bool__
+    def __repr__( self ):
+        if self.target is not None:
+            return repr( self.target )
+        return '<lazy %s from %s>'%( self.__name__, self.source )
+
+def isLoaded( module ):
+    """Whether module has run, as opposed to a LazyLoader module still waiting for its first access"""
+    return type( module ).__getattribute__ is types.ModuleType.__getattribute__
+
+def lazyModule( name ):
+    """The module `name`, loaded on first attribute access if not yet imported"""
+    module = sys.modules.get( name )
+    if module is None:
+        spec = importlib.util.find_spec( name )
+        loader = importlib.util.LazyLoader( spec.loader )
+        spec.loader = loader
+        module = importlib.util.module_from_spec( spec )
+        sys.modules[name] = module
+        loader.exec_module( module )
+    return module
+
+def install( name, sources, aliases=None, computed=None ):
+    """Build __getattr__, __dir__ and __all__ for the namespace module `name`
+
+    sources -- module names in star-import order
+    aliases -- {alias: name} for names re-bound after the star imports
+    computed -- {name: function(module)} for values the package derives
+    """
+    module = sys.modules[name]
+    index = loadIndex( name, sources, aliases )
+    aliasTargets = dict( aliases or {} )
+    computed = dict( computed or {} )
+    values = module.__dict__
+    stubs = {}
+    def resolve( key ):
+        record = index[key]
+        kind, source = record[0], record[1]
+        if kind == 'k':
+            return CONSTANT_TYPES[record[2]]( record[3], record[4] )
+        if kind == 'v':
+            return record[2]
+        if kind == 'm':
+            return lazyModule( record[2] )
+        if kind == 'r':
+            return getattr( importlib.import_module( record[2] ), record[3] )
+        target = aliasTargets.get( key, key )
+        loaded = sys.modules.get( source )
+        if loaded is not None and not isLoaded( loaded ):
+            # bound lazily as a submodule, importing it is still to come
+            loaded = None
+        if loaded is not None or kind == 's':
+            return getattr( loaded or importlib.import_module( source ), target )
+        # an alias shares its target's stub, so resolving either swaps both
+        stub = stubs.get( target )
+        if stub is None:
+            stub = stubs[target] = LazyEntryPoint( target, name, source )
+        stub.names.add( key )
+        return stub
+    def __getattr__( key ):
+        if key in computed:
+            value = computed[key]( module )
+        elif key in index:
+            value = resolve( key )
+        else:
+            raise AttributeError( "module %r has no attribute %r"%( name, key ))
+        values[key] = value
+        return value
+    def __dir__( ):
+        return sorted( set( values ) | set( index ) | set( computed ))
+    exported = sorted([
+        key for key in set( index ) | set( computed ) if not key.startswith( '_' )
+    ])
+    return __getattr__, __dir__, exported
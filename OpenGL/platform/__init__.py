@@ -84,7 +84,7 @@ def unpack_constants( constants, namespace ):
 
 def createFunction( function, dll,extension, deprecated=False, error_checker=None, force_extension=False ):
     """Allows the more compact declaration format to use the old-style constructor"""
-    return nullFunction(
+    return deferredFunction(
         function.__name__,
         dll or PLATFORM.GL,
         resultType = function.resultType,
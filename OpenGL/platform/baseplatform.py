@@ -3,7 +3,7 @@
 import ctypes
 from OpenGL.platform import ctypesloader
 from OpenGL._bytes import as_8_bit
-import sys, logging
+import sys, logging, types
 from OpenGL import _configflags
 from OpenGL import logs, MODULE_ANNOTATIONS
 log = logging.getLogger(__name__)
@@ -40,6 +40,30 @@ class _CheckContext( object ):
             raise error.NoContext( self.func.__name__, args, named )
         return self.func( *args, **named )
 
+class _BatchInterrupt( object ):
+    """Lets recorded immediate-mode geometry be drawn before the call
+
+    batch is the OpenGL.GL.exceptional.ImmediateBatch, installed when that
+    module is imported with BATCH_IMMEDIATE set.
+    """
+    batch = None
+    def __init__( self, func ):
+        self.__dict__['func'] = func
+    def __setattr__( self, key, value ):
+        if key != 'func':
+            return setattr( self.func, key, value )
+        else:
+            self.__dict__[key] = value
+    def __getattr__( self, key ):
+        if key != 'func':
+            return getattr( self.func, key )
+        raise AttributeError( key )
+    def __call__( self, *args ):
+        batch = _BatchInterrupt.batch
+        if batch is not None and batch.active:
+            batch.interrupt()
+        return self.func( *args )
+
 def _find_module( exclude = (__name__,)):
     frame = sys._getframe()
     while frame and '__name__' in frame.f_globals:
@@ -83,6 +107,7 @@ class BasePlatform( object ):
         'copyBaseFunction',
         'getGLUTFontPointer',
         'nullFunction',
+        'deferredFunction',
         'GLUT_GUARD_CALLBACKS',
     ]
 
@@ -126,6 +151,17 @@ class BasePlatform( object ):
     def wrapLogging( self, func ):
         """Wrap function with logging operations if appropriate"""
         return logs.logOnFail( func, logs.getLog( 'OpenGL.errors' ))
+    def wrapBatching( self, func ):
+        """Wrap function to flush batched immediate-mode geometry if appropriate"""
+        if _configflags.BATCH_IMMEDIATE:
+            return _BatchInterrupt( func )
+        return func
+    def wrapProfiling( self, func ):
+        """Wrap function with call counting/timing if appropriate"""
+        if _configflags.PROFILE_CALLS or _configflags.PROFILE_TIMING:
+            from OpenGL import profiler
+            return profiler.profiler.wrap( func )
+        return func
     
     def finalArgType( self, typ ):
         """Retrieve a final type for arg-type"""
@@ -181,12 +217,12 @@ class BasePlatform( object ):
         func.DLL = dll
         func.extension = extension
         func.deprecated = deprecated
-        func = self.wrapLogging( 
+        func = self.wrapProfiling( self.wrapBatching( self.wrapLogging( 
             self.wrapContextCheck(
                 self.errorChecking( func, dll, error_checker=error_checker ),
                 dll,
             )
-        )
+        )))
         if MODULE_ANNOTATIONS:
             if not module:
                 module = _find_module( )
@@ -340,6 +376,43 @@ class BasePlatform( object ):
             functionName, dll, resultType, argTypes, argNames, extension=extension, doc=doc,
             error_checker = error_checker, force_extension=force_extension,
         )
+    def deferredFunction( 
+        self,
+        functionName, dll,
+        resultType=ctypes.c_int, 
+        argTypes=(),
+        doc = None, argNames = (),
+        extension = None,
+        deprecated = False,
+        module = None,
+        error_checker = None,
+        force_extension = False,
+    ):
+        """Construct a function pointer which is only resolved on first use
+        
+        Unlike nullFunction this doesn't create a class per entry point,
+        see _DeferredFunctionPointer.  With PRELOAD_FUNCTIONS set the 
+        pointer is resolved immediately and failures are logged, to 
+        validate the declarations against the loaded libraries.
+        """
+        if deprecated:
+            return self.nullFunction(
+                functionName, dll=dll,
+                resultType=resultType, argTypes=argTypes,
+                doc = doc, argNames = argNames,
+                extension = extension,
+                deprecated = deprecated,
+                module = module,
+                error_checker = error_checker,
+                force_extension = force_extension,
+            )
+        result = _DeferredFunctionPointer(
+            functionName, dll, resultType, argTypes, argNames, extension=extension, doc=doc,
+            error_checker = error_checker, force_extension=force_extension,
+        )
+        if _configflags.PRELOAD_FUNCTIONS and not result.load():
+            log.info( "Unable to resolve %s (%s)", functionName, extension )
+        return result
     def GetCurrentContext( self ):
         """Retrieve opaque pointer for the current context"""
         raise NotImplementedError( 
@@ -383,8 +456,8 @@ class _NullFunctionPointer( object ):
             self.load()
         return self.resolved
     __bool__ = __nonzero__
-    def load( self ):
-        """Attempt to load the function again, presumably with a context this time"""
+    def construct( self ):
+        """Build the real function, or None if it is (still) unavailable"""
         try:
             from OpenGL import platform
         except ImportError:
@@ -392,7 +465,7 @@ class _NullFunctionPointer( object ):
                 log.info('Platform import failed (likely during shutdown)')
             return None
         try:
-            func = platform.PLATFORM.constructFunction(
+            return platform.PLATFORM.constructFunction(
                 self.__name__, self.DLL, 
                 resultType=self.restype, 
                 argTypes=self.argtypes,
@@ -404,12 +477,14 @@ class _NullFunctionPointer( object ):
             )
         except AttributeError as err:
             return None 
-        else:
+    def load( self ):
+        """Attempt to load the function again, presumably with a context this time"""
+        func = self.construct()
+        if func is not None:
             # now short-circuit so that we don't need to check again...
             self.__class__.__call__ = staticmethod( func.__call__ )
             self.resolved = True
-            return func
-        return None
+        return func
     def __call__( self, *args, **named ):
         if self.load():
             return self( *args, **named )
@@ -426,6 +501,49 @@ class _NullFunctionPointer( object ):
                     )
                 )
 
+class _DeferredFunctionPointer( _NullFunctionPointer ):
+    """Entry point whose ctypes prototype is built on first call
+    
+    All unresolved entry points share this class, the per-function class
+    (which lets the resolved call skip any Python-level dispatch) is only
+    created by load().  Once loaded, the real function also replaces the
+    stub in any non-PyOpenGL module namespace which bound it by name, e.g.
+    after ``from OpenGL.GL import *``.  PyOpenGL's own modules keep the 
+    stub, as wrappers introspect its declared (not finalised) argtypes.
+    """
+    def __init__( self, name, dll, resultType, argTypes, argNames, **named ):
+        super( _DeferredFunctionPointer, self ).__init__( 
+            name, dll, resultType, argTypes, argNames, **named 
+        )
+        self.__doc__ = self.doc
+    def load( self ):
+        func = self.construct()
+        if func is not None:
+            self.__class__ = type( self.__name__, (_DeferredFunctionPointer,), {
+                '__call__': staticmethod( func.__call__ ),
+                '__module__': self.__class__.__module__,
+            } )
+            self.resolved = True
+            self.replace( func )
+        return func
+    def replace( self, func ):
+        """Substitute func for this stub in user module namespaces
+        
+        Modules with their own __getattribute__ are left alone; for a 
+        LazyLoader module which has not run yet, even reading __dict__ 
+        would execute it (and it cannot have bound the stub anyway).
+        """
+        name = self.__name__
+        plain = types.ModuleType.__getattribute__
+        for moduleName, module in list( sys.modules.items() ):
+            if moduleName.startswith( 'OpenGL.' ):
+                continue
+            if type( module ).__getattribute__ is not plain:
+                continue
+            namespace = getattr( module, '__dict__', None )
+            if namespace is not None and namespace.get( name ) is self:
+                namespace[ name ] = func
+
 class _DeprecatedFunctionPointer( _NullFunctionPointer ):
     deprecated = True
     def __call__( self, *args, **named ):
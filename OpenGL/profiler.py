@@ -0,0 +1,203 @@
+"""Aggregating call counter and timer for platform entry points
+
+FULL_LOGGING formats every call, which is fine for reading a trace but far
+too slow for performance work.  With PROFILE_CALLS set, each entry point
+built by BasePlatform.constructFunction is instead wrapped in a proxy
+which only increments a per-function counter; PROFILE_TIMING additionally
+accumulates time.perf_counter_ns() around the call.
+
+Counts are cumulative until a frame boundary, marked by frame() (called
+automatically after glutSwapBuffers), which files the per-function deltas
+into a bounded frame history.  From that you can ask for:
+
+    top( count, key ) -- the busiest functions by 'calls' or 'time'
+    histogram( name ) -- per-frame call counts for one function, or
+        per-frame totals with no name
+    report( count ) -- a printable top-N table
+    export( filename ) -- all of the above as JSON
+
+Only resolved entry points are counted, and raw calls made through Python
+wrappers are counted once at the ctypes level, which is what ends up
+talking to the driver.
+"""
+import json, time
+from OpenGL import _configflags
+
+class _Entry( object ):
+    """Running totals for one entry point"""
+    __slots__ = ('name', 'count', 'time', 'frameCount', 'frameTime', 'history')
+    def __init__( self, name ):
+        self.name = name
+        self.count = self.time = 0
+        self.frameCount = self.frameTime = 0
+        self.history = []
+
+class _ProfiledFunction( object ):
+    """Proxy which forwards attribute access to the base function
+
+    As with logs._LoggedFunction, later tweaks such as setting restype or
+    errcheck on the entry point have to reach the ctypes function.
+    """
+    def __init__( self, base, entry ):
+        self.__dict__[''] = base
+        self.__dict__['entry'] = entry
+    def __setattr__( self, key, value ):
+        if key != '':
+            setattr( self.__dict__[''], key, value )
+        else:
+            self.__dict__[''] = value
+    def __getattr__( self, key ):
+        if key == '':
+            return self.__dict__['']
+        else:
+            return getattr( self.__dict__[''], key )
+class _CountedFunction( _ProfiledFunction ):
+    """Counts calls to the base function"""
+    def __call__( self, *args ):
+        self.entry.count += 1
+        return self.__dict__['']( *args )
+class _TimedFunction( _ProfiledFunction ):
+    """Counts and times calls to the base function"""
+    clock = staticmethod( time.perf_counter_ns )
+    def __call__( self, *args ):
+        clock = self.clock
+        start = clock()
+        try:
+            return self.__dict__['']( *args )
+        finally:
+            entry = self.entry
+            entry.time += clock() - start
+            entry.count += 1
+
+class CallProfiler( object ):
+    """Per-function call counts (and optionally times), bucketed into frames
+
+    timing -- if True, wrap() measures call durations as well as counts,
+        only entry points wrapped afterwards are affected
+    maxFrames -- number of frames kept for histograms
+    """
+    def __init__( self, timing=False, maxFrames=1000 ):
+        self.timing = timing
+        self.maxFrames = maxFrames
+        self.entries = {}
+        self.reset()
+    def reset( self ):
+        """Forget all counts and frames (wrapped functions keep counting)"""
+        for entry in self.entries.values():
+            entry.count = entry.time = entry.frameCount = entry.frameTime = 0
+            del entry.history[:]
+        self.frames = []
+        self.frameStart = time.perf_counter_ns()
+    def entry( self, name ):
+        entry = self.entries.get( name )
+        if entry is None:
+            entry = self.entries[name] = _Entry( name )
+        return entry
+    def wrap( self, function ):
+        """Counting (or timing) proxy for function"""
+        entry = self.entry( function.__name__ )
+        if self.timing:
+            return _TimedFunction( function, entry )
+        return _CountedFunction( function, entry )
+    def frame( self ):
+        """End the current frame, filing each function's calls since the last one"""
+        now = time.perf_counter_ns()
+        calls = spent = 0
+        for entry in self.entries.values():
+            count = entry.count - entry.frameCount
+            if count or entry.history:
+                elapsed = entry.time - entry.frameTime
+                entry.frameCount, entry.frameTime = entry.count, entry.time
+                entry.history.append( count )
+                if len( entry.history ) > self.maxFrames:
+                    del entry.history[0]
+                calls += count
+                spent += elapsed
+        self.frames.append( (now - self.frameStart, calls, spent) )
+        if len( self.frames ) > self.maxFrames:
+            del self.frames[0]
+        self.frameStart = now
+        return calls
+    def top( self, count=20, key='time' ):
+        """Busiest entry points as dicts, sorted by 'time' or 'calls'"""
+        frames = max( len( self.frames ), 1 )
+        rows = [
+            {
+                'name': entry.name,
+                'calls': entry.count,
+                'time_ms': entry.time / 1e6,
+                'calls_per_frame': entry.count / float( frames ),
+                'time_per_call_us': entry.time / 1e3 / entry.count,
+                'max_calls_per_frame': max( entry.history or [0] ),
+            }
+            for entry in self.entries.values() if entry.count
+        ]
+        sortKey = 'time_ms' if key == 'time' and self.timing else 'calls'
+        rows.sort( key=lambda row: (-row[sortKey], row['name']) )
+        return rows[:count]
+    def histogram( self, name=None, bins=10 ):
+        """(low, high, frames) buckets of per-frame call counts
+
+        name -- entry point to describe, or None for all calls per frame
+        """
+        if name is None:
+            values = [ calls for (duration, calls, spent) in self.frames ]
+        else:
+            values = list( self.entry( name ).history )
+        if not values:
+            return []
+        low, high = min( values ), max( values )
+        width = max( (high - low + bins) // bins, 1 )
+        buckets = [ 0 ] * bins
+        for value in values:
+            buckets[ min( (value - low) // width, bins - 1 ) ] += 1
+        return [
+            (low + i * width, low + (i + 1) * width - 1, frames)
+            for i, frames in enumerate( buckets ) if frames
+        ]
+    def summary( self ):
+        """Averages over the recorded frames"""
+        frames = len( self.frames ) or 1
+        return {
+            'frames': len( self.frames ),
+            'timing': self.timing,
+            'calls_per_frame': sum( f[1] for f in self.frames ) / float( frames ),
+            'gl_ms_per_frame': sum( f[2] for f in self.frames ) / 1e6 / frames,
+            'frame_ms': sum( f[0] for f in self.frames ) / 1e6 / frames,
+        }
+    def report( self, count=20, key='time' ):
+        """Printable table of the busiest entry points"""
+        summary = self.summary()
+        lines = [
+            '%(frames)d frames, %(calls_per_frame).1f GL calls and %(gl_ms_per_frame).3f ms in GL per %(frame_ms).2f ms frame'%summary,
+            '%-32s %10s %10s %10s %10s'%( 'function', 'calls', 'per frame', 'ms', 'us/call' ),
+        ]
+        for row in self.top( count, key ):
+            lines.append( '%-32s %10d %10.1f %10.3f %10.3f'%(
+                row['name'], row['calls'], row['calls_per_frame'], row['time_ms'], row['time_per_call_us'],
+            ))
+        return '\n'.join( lines )
+    def export( self, filename=None, count=50 ):
+        """Summary, top-N table and histograms as JSON (written to filename if given)"""
+        data = {
+            'summary': self.summary(),
+            'top': self.top( count ),
+            'frames': self.histogram(),
+            'histograms': dict([
+                (row['name'], self.histogram( row['name'] )) for row in self.top( count )
+            ]),
+        }
+        if filename:
+            with open( filename, 'w' ) as handle:
+                json.dump( data, handle, indent=2 )
+        return data
+
+profiler = CallProfiler( timing=_configflags.PROFILE_TIMING )
+
+# Module-level conveniences for the shared profiler
+frame = profiler.frame
+reset = profiler.reset
+top = profiler.top
+histogram = profiler.histogram
+report = profiler.report
+export = profiler.export
@@ -2,7 +2,7 @@
 import ctypes, logging
 from OpenGL import platform, error
 assert platform
-from OpenGL._configflags import STORE_POINTERS, ERROR_ON_COPY, SIZE_1_ARRAY_UNPACK
+from OpenGL._configflags import STORE_POINTERS, ERROR_ON_COPY, SIZE_1_ARRAY_UNPACK, CODEGEN_WRAPPERS
 from OpenGL import converters
 from OpenGL.converters import DefaultCConverter
 from OpenGL.converters import returnCArgument,returnPyArgument
@@ -392,7 +392,11 @@ class Wrapper( LateBind ):
             item = getattr( self, attribute, None )
             if hasattr( item, 'finalise' ):
                 item.finalise( self )
-        callFunction = self.finaliseCall()
+        if CODEGEN_WRAPPERS and not cWrapper:
+            from OpenGL import codegen
+            callFunction = codegen.generate( self )
+        else:
+            callFunction = self.finaliseCall()
         if not callFunction:
             raise RuntimeError( """Missing finalised call type for %s"""%( self, ))
         else:
@@ -0,0 +1,82 @@
+"""Shared fixtures: make Game.py importable and give tests a fresh game"""
+import os, sys, random
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+# keep generated wrapper code out of the user's cache directory
+os.environ.setdefault('PYOPENGL_CODEGEN_CACHE', '')
+
+@pytest.fixture
+def game():
+    """The Game module with a freshly reset, reproducible round"""
+    import Game
+    random.seed(1234)
+    Game.reset_game()
+    return Game
+
+# OpenGL reads its configuration flags at import time, so tests which need
+# a particular flag set run their GL code in a child process.  The child
+# draws into an EGL pbuffer (or an OSMesa buffer) and prints a JSON result.
+GL_PRELUDE = '''
+import os, sys, json, ctypes
+def make_current(width, height):
+    if os.environ.get('PYOPENGL_PLATFORM') == 'osmesa':
+        from OpenGL import osmesa, arrays
+        from OpenGL.GL import GL_UNSIGNED_BYTE
+        context = osmesa.OSMesaCreateContextExt(osmesa.OSMESA_RGBA, 24, 0, 0, None)
+        buffer = arrays.GLubyteArray.zeros((height, width, 4))
+        return context and osmesa.OSMesaMakeCurrent(context, buffer, GL_UNSIGNED_BYTE, width, height) and buffer
+    from OpenGL import EGL
+    display = EGL.eglGetDisplay(EGL.EGL_DEFAULT_DISPLAY)
+    if not EGL.eglInitialize(display, None, None):
+        return None
+    attributes = (EGL.EGLint * 11)(
+        EGL.EGL_SURFACE_TYPE, EGL.EGL_PBUFFER_BIT, EGL.EGL_RED_SIZE, 8, EGL.EGL_GREEN_SIZE, 8,
+        EGL.EGL_BLUE_SIZE, 8, EGL.EGL_RENDERABLE_TYPE, EGL.EGL_OPENGL_BIT, EGL.EGL_NONE)
+    config, count = EGL.EGLConfig(), EGL.EGLint()
+    if not EGL.eglChooseConfig(display, attributes, ctypes.pointer(config), 1, ctypes.pointer(count)) or not count.value:
+        return None
+    surface = EGL.eglCreatePbufferSurface(
+        display, config, (EGL.EGLint * 5)(EGL.EGL_WIDTH, width, EGL.EGL_HEIGHT, height, EGL.EGL_NONE))
+    EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+    context = EGL.eglCreateContext(display, config, EGL.EGL_NO_CONTEXT, None)
+    return context and EGL.eglMakeCurrent(display, surface, surface, context) and display
+try:
+    context = make_current(64, 64)
+except Exception:
+    context = None
+if not context:
+    print('NO-CONTEXT')
+    sys.exit(0)
+'''
+
+def gl_platforms():
+    """Environments to try a GL child process in, EGL surfaceless first"""
+    return [
+        {'PYOPENGL_PLATFORM': 'egl', 'EGL_PLATFORM': 'surfaceless'},
+        {'PYOPENGL_PLATFORM': 'osmesa'},
+    ]
+
+@pytest.fixture
+def run_gl(tmp_path):
+    """Run script after GL_PRELUDE in a child with the given PYOPENGL_* flags, return its JSON output
+
+    Skips the test when neither EGL nor OSMesa can give the child a context.
+    """
+    import json, subprocess, textwrap
+    def run(script, **flags):
+        path = tmp_path / 'gl_script.py'
+        path.write_text(GL_PRELUDE + textwrap.dedent(script))
+        for platform in gl_platforms():
+            env = dict(os.environ, PYTHONPATH=ROOT, **platform)
+            env.update(('PYOPENGL_%s' % name, str(value)) for name, value in flags.items())
+            result = subprocess.run([sys.executable, str(path)], env=env, capture_output=True, text=True,
+                                    timeout=120)
+            if result.returncode == 0 and result.stdout.startswith('NO-CONTEXT'):
+                continue
+            assert result.returncode == 0, result.stderr
+            return json.loads(result.stdout.strip().splitlines()[-1])
+        pytest.skip("no EGL or OSMesa context available")
+    return run
@@ -0,0 +1,74 @@
+"""BATCH_IMMEDIATE draws the same pixels as plain immediate mode"""
+
+SCRIPT = '''
+import hashlib
+from OpenGL.GL import *
+glViewport(0, 0, 64, 64)
+glMatrixMode(GL_PROJECTION)
+glLoadIdentity()
+glOrtho(0, 64, 0, 64, -1, 1)
+glMatrixMode(GL_MODELVIEW)
+glLoadIdentity()
+glClearColor(0, 0, 0, 1)
+glClear(GL_COLOR_BUFFER_BIT)
+glEnable(GL_LIGHTING)
+glEnable(GL_LIGHT0)
+glEnable(GL_COLOR_MATERIAL)
+# mergeable blocks with colour and normal changes between them
+for k in range(4):
+    glBegin(GL_TRIANGLES)
+    glColor3f(0.2 * k, 1.0 - 0.2 * k, 0.5)
+    glNormal3f(0, 0, 1)
+    glVertex2f(4 + 14 * k, 4)
+    glVertex2f(14 + 14 * k, 4)
+    glColor3ub(255, 0, 64 * k)
+    glVertex2f(9 + 14 * k, 16)
+    glEnd()
+glDisable(GL_LIGHTING)
+glBegin(GL_QUADS)
+glColor4f(0.5, 0.5, 1.0, 1.0)
+for x, y in ((4, 20), (30, 20), (30, 30), (4, 30)):
+    glVertex2f(x, y)
+glEnd()
+# a foreign call between blocks flushes the batch
+glLineWidth(3.0)
+glBegin(GL_LINES)
+glColor3f(1, 1, 0)
+glVertex2i(34, 20)
+glVertex2i(60, 30)
+glEnd()
+glLineWidth(1.0)
+# a foreign call inside a block replays it through real immediate mode
+glBegin(GL_TRIANGLES)
+glColor3f(0, 1, 1)
+glVertex2f(4, 34)
+glTexCoord2f(0, 0)
+glVertex2f(30, 34)
+glVertex2f(17, 60)
+glEnd()
+glBegin(GL_POINTS)
+glColor3f(1, 0, 1)
+for x in range(34, 60, 3):
+    glVertex2f(x, 50)
+glEnd()
+glFinish()
+pixels = glReadPixels(0, 0, 64, 64, GL_RGBA, GL_UNSIGNED_BYTE)
+stats = {}
+try:
+    from OpenGL.GL.exceptional import immediateBatch
+    stats = immediateBatch.stats
+except ImportError:
+    pass
+print(json.dumps({'pixels': hashlib.sha1(bytes(pixels)).hexdigest(), 'lit': sum(bytes(pixels)) > 0, 'stats': stats}))
+'''
+
+def test_batched_readback_matches(run_gl):
+    plain = run_gl(SCRIPT, BATCH_IMMEDIATE=False)
+    batched = run_gl(SCRIPT, BATCH_IMMEDIATE=True)
+    assert plain['lit']
+    assert batched['pixels'] == plain['pixels']
+    assert not plain['stats']
+    stats = batched['stats']
+    assert stats['fallbacks'] == 1
+    assert stats['flushes'] >= 2
+    assert stats['draws'] < stats['blocks']
@@ -0,0 +1,79 @@
+"""FrameCapture keeps a bounded encoder queue"""
+import collections, concurrent.futures, threading
+import pytest
+
+@pytest.fixture
+def capture(game, tmp_path):
+    """A FrameCapture without the GL side, whose encoder blocks until released"""
+    release = threading.Event()
+    written = []
+    def writer(path, width, height, pixels):
+        release.wait(5)
+        written.append(path)
+    capture = game.FrameCapture.__new__(game.FrameCapture)
+    capture.directory = str(tmp_path)
+    capture.writer = writer
+    capture.extension = 'rgba'
+    capture.pool = concurrent.futures.ThreadPoolExecutor(1)
+    capture.futures = collections.deque()
+    capture.dropped = capture.stalls = 0
+    capture.pending = collections.deque()
+    capture.frame = 0
+    capture.release, capture.written = release, written
+    yield capture
+    release.set()
+    capture.pool.shutdown(wait=True)
+
+def test_submit_drops_oldest_queued(capture):
+    capture.drop = True
+    for frame in range(10):
+        capture.submit(frame, b'', 1, 1)
+        assert len(capture.futures) <= capture.ring_size
+    capture.release.set()
+    for future in capture.futures:
+        future.result()
+    assert capture.dropped == 10 - len(capture.written)
+    assert capture.dropped > 0
+    assert capture.written[-1].endswith('frame_000009.rgba')
+
+def test_submit_waits_without_drop(capture):
+    capture.drop = False
+    timer = threading.Timer(0.2, capture.release.set)
+    timer.start()
+    for frame in range(6):
+        capture.submit(frame, b'', 1, 1)
+        assert len(capture.futures) <= capture.ring_size
+    for future in capture.futures:
+        future.result()
+    assert capture.dropped == 0
+    assert capture.stalls > 0
+    assert len(capture.written) == 6
+
+GL_SCRIPT = '''
+import tempfile
+import Game
+from OpenGL import extensions
+from OpenGL.GL import *
+# hide the ARB extension so only the core version check can enable the ring
+hasGLExtension = extensions.hasGLExtension
+extensions.hasGLExtension = lambda name: name != 'GL_ARB_pixel_buffer_object' and hasGLExtension(name)
+version = tuple(int(part) for part in glGetString(GL_VERSION).split()[0].split(b'.')[:2])
+with tempfile.TemporaryDirectory() as directory:
+    capture = Game.FrameCapture(directory, 64, 64, 'raw', 1)
+    glClearColor(1, 0, 0, 1)
+    glClear(GL_COLOR_BUFFER_BIT)
+    for _ in range(capture.ring_size + 1):
+        capture.capture()
+    capture.finish()
+    frames = sorted(os.listdir(directory))
+    first = open(os.path.join(directory, frames[0]), 'rb').read(4)
+print(json.dumps({'version': version, 'use_pbo': capture.use_pbo, 'frames': len(frames), 'first': list(first)}))
+'''
+
+def test_pixel_buffer_ring_on_gl_2_1(run_gl):
+    result = run_gl(GL_SCRIPT)
+    if tuple(result['version']) < (2, 1):
+        pytest.skip("context older than GL 2.1")
+    assert result['use_pbo']
+    assert result['frames'] == 4
+    assert result['first'] == [255, 0, 0, 255]
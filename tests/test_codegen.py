@@ -0,0 +1,75 @@
+"""Generated wrapper call functions behave like the closure-based ones"""
+import ctypes
+import pytest
+numpy = pytest.importorskip('numpy')
+from OpenGL import GL, codegen, platform, wrapper as wrappermodule
+
+def describe(value):
+    """Comparable stand-in for a C argument or result"""
+    if isinstance(value, (int, float, bytes, str)) or value is None:
+        return value
+    try:
+        return (type(value).__name__, bytes(memoryview(value)))
+    except TypeError:
+        pass
+    if isinstance(value, ctypes._Pointer) or isinstance(value, ctypes.c_void_p):
+        return type(value).__name__
+    return repr(type(value))
+
+@pytest.fixture
+def context(monkeypatch):
+    """A stand-in context id so pointer storage works without a real context"""
+    if not platform.GetCurrentContext():
+        monkeypatch.setattr(platform, 'GetCurrentContext', lambda: 1)
+
+CASES = [
+    ('glVertexPointer', (3, GL.GL_FLOAT, 0, numpy.arange(12, dtype='f'))),
+    ('glVertexPointerf', (numpy.arange(12, dtype='f').reshape((4, 3)),)),
+    ('glColor3fv', ((0.25, 0.5, 1.0),)),
+    ('glLightfv', (GL.GL_LIGHT0, GL.GL_POSITION, (1.0, 2.0, 3.0, 0.0))),
+    ('glGetDoublev', (GL.GL_MODELVIEW_MATRIX,)),
+    ('glGetIntegerv', (GL.GL_VIEWPORT,)),
+    ('glGenTextures', (3,)),
+    ('glTexImage2D', (GL.GL_TEXTURE_2D, 0, GL.GL_RGBA, 4, 4, 0, GL.GL_RGBA, GL.GL_UNSIGNED_BYTE,
+                      numpy.arange(64, dtype='B'))),
+    ('glMultMatrixf', (numpy.identity(4, dtype='f'),)),
+]
+
+@pytest.mark.parametrize('name,args', CASES, ids=[case[0] for case in CASES])
+def test_generated_matches_closure(context, name, args):
+    function = getattr(GL, name)
+    if not hasattr(function, 'getFinalCall'):
+        pytest.skip('%s is not a Wrapper' % name)
+    calls = []
+    def record(*cArgs):
+        calls.append([describe(arg) for arg in cArgs])
+        return 0
+    finalCall = function.getFinalCall()
+    original = function.wrappedOperation
+    function.wrappedOperation = record
+    try:
+        closure = wrappermodule.Wrapper.finaliseCall(function)
+        generated = codegen.generate(function)
+        results = [describe(closure(*args)), describe(generated(*args))]
+    finally:
+        function.wrappedOperation = original
+        function.setFinalCall(finalCall)
+    assert calls[0] == calls[1]
+    assert results[0] == results[1]
+
+def test_every_shape_compiles():
+    shapes = set()
+    for name in dir(GL):
+        function = getattr(GL, name)
+        if isinstance(function, wrappermodule.Wrapper) and getattr(function, 'wrappedOperation', None):
+            key = codegen.shape(function)
+            if key not in shapes:
+                shapes.add(key)
+                compile(codegen.source(key), name, 'exec')
+    assert len(shapes) > 10
+
+def test_argument_count_error(context):
+    function = GL.glLightfv
+    generated = codegen.generate(function)
+    with pytest.raises(ValueError):
+        generated(GL.GL_LIGHT0)
@@ -0,0 +1,40 @@
+"""DEFERRED_ERROR_CHECKING: errors surface at sync points, attributed to the call which raised them"""
+
+SCRIPT = '''
+from OpenGL.GL import *
+from OpenGL import error
+glClearColor(0, 0, 0, 1)
+glEnable(0x1234)
+glClear(GL_COLOR_BUFFER_BIT)
+glViewport(0, 0, 8, 8)
+result = {}
+try:
+    glFinish()
+except error.GLError as err:
+    result = {
+        'err': err.err,
+        'operation': getattr(err.baseOperation, '__name__', None),
+        'arguments': list(err.cArguments or ()),
+        'recent': [operation.__name__ for operation, arguments in err.recentCalls],
+        'messages': [(message, getattr(operation, '__name__', None)) for message, operation in err.debugMessages or ()],
+    }
+glFinish()
+result['clean'] = True
+print(json.dumps(result))
+'''
+
+def test_error_raised_at_sync_point(run_gl):
+    result = run_gl(SCRIPT, DEFERRED_ERROR_CHECKING=True)
+    assert result['err'] == 0x0500  # GL_INVALID_ENUM
+    assert result['recent'][-4:] == ['glEnable', 'glClear', 'glViewport', 'glFinish']
+    assert result['clean']
+
+def test_debug_message_attributed_to_failing_call(run_gl):
+    result = run_gl(SCRIPT, DEFERRED_ERROR_CHECKING=True)
+    if not result['messages']:
+        # no KHR_debug, so nothing identifies the call
+        assert result['operation'] is None
+        return
+    assert [operation for message, operation in result['messages']] == ['glEnable']
+    assert result['operation'] == 'glEnable'
+    assert result['arguments'] == [0x1234]
@@ -0,0 +1,77 @@
+"""Replayed geometry draws the same pixels as the immediate-mode block"""
+import pytest
+
+SCRIPT = '''
+import hashlib
+from OpenGL.GL import *
+from OpenGL.GL.geometrycache import GeometryCache
+glViewport(0, 0, 64, 64)
+glMatrixMode(GL_PROJECTION)
+glLoadIdentity()
+glOrtho(0, 64, 0, 64, -1, 1)
+glMatrixMode(GL_MODELVIEW)
+glLoadIdentity()
+glClearColor(0, 0, 0, 1)
+
+def walls(colour):
+    glBegin(GL_TRIANGLES)
+    for k in range(4):
+        glColor3f(colour, 1.0 - 0.2 * k, 0.5)
+        glNormal3f(0, 0, 1)
+        glVertex2f(4 + 14 * k, 4)
+        glVertex2f(14 + 14 * k, 4)
+        glVertex2f(9 + 14 * k, 16)
+    glEnd()
+    glBegin(GL_QUADS)
+    glColor3f(0.5, 0.5, 1.0)
+    for x, y in ((4, 20), (60, 20), (60, 40), (4, 40)):
+        glVertex2f(x, y)
+    glEnd()
+
+def frame(draw):
+    glClear(GL_COLOR_BUFFER_BIT)
+    draw()
+    glFinish()
+    return hashlib.sha1(bytes(glReadPixels(0, 0, 64, 64, GL_RGBA, GL_UNSIGNED_BYTE))).hexdigest()
+
+cache = GeometryCache(size=2, mode=%(mode)r)
+def cached(name, colour):
+    def draw():
+        with cache.cache(name, key=(name, colour)) as record:
+            if record:
+                walls(colour)
+    return draw
+
+direct = frame(lambda: walls(0.2))
+changed = frame(lambda: walls(0.8))
+frames = [frame(cached('walls', 0.2)) for _ in range(3)]
+rekeyed = [frame(cached('walls', 0.8)) for _ in range(2)]
+frame(cached('floor', 0.2))
+frame(cached('walls', 0.8))
+evicted = cache.entries['floor'].list
+frame(cached('trees', 0.2))
+print(json.dumps({
+    'mode': cache.mode,
+    'direct': direct,
+    'changed': changed,
+    'frames': frames,
+    'rekeyed': rekeyed,
+    'stats': cache.stats,
+    'entries': list(cache.entries),
+    'evicted_is_list': bool(evicted and glIsList(evicted)),
+}))
+'''
+
+@pytest.mark.parametrize('mode', ['list', 'vbo'])
+def test_replay_matches_direct_drawing(run_gl, mode):
+    result = run_gl(SCRIPT % {'mode': mode}, BATCH_IMMEDIATE=(mode == 'vbo'))
+    assert result['mode'] == mode
+    assert result['direct'] != result['changed']
+    # recorded on the first frame, replayed on the others
+    assert result['frames'] == [result['direct']] * 3
+    # a new key re-records
+    assert result['rekeyed'] == [result['changed']] * 2
+    # walls was used more recently than floor, so floor is evicted
+    assert result['entries'] == ['walls', 'trees']
+    assert not result['evicted_is_list']
+    assert result['stats'] == {'hits': 4, 'misses': 4, 'evictions': 1, 'uncached': 0}
@@ -0,0 +1,67 @@
+"""Layout generation and replay from a layout library"""
+import collections
+
+def all_tiles(game):
+    return {(i, j) for i in range(game.grid_size_x) for j in range(game.grid_size_y)}
+
+def test_fallback_placement_replays(game, monkeypatch):
+    monkeypatch.setattr(game, 'holes', all_tiles(game))
+    monkeypatch.setattr(game, 'placement_log', [])
+    placed = game.find_safe_tile()
+    logged = game.placement_log
+    assert logged == [game.tile_of((0, 0))]
+    assert game.tile_of(placed) == logged[0]
+    monkeypatch.setattr(game, 'layout_placements', collections.deque(logged))
+    assert game.find_safe_tile() == placed
+
+def test_random_placement_replays(game, monkeypatch):
+    monkeypatch.setattr(game, 'placement_log', [])
+    placed = [game.find_safe_tile() for _ in range(20)]
+    monkeypatch.setattr(game, 'layout_placements', collections.deque(game.placement_log))
+    assert [game.find_safe_tile() for _ in range(20)] == placed
+
+
+def test_validator_round_trips_tiles(game):
+    validator = game.LayoutValidator(5, 4)
+    tiles = [(0, 0), (2, 3), (4, 1)]
+    assert sorted(validator.tiles(validator.mask(tiles))) == tiles
+    assert validator.full == (1 << 20) - 1
+
+def test_validator_grow_stays_in_grid(game):
+    validator = game.LayoutValidator(3, 3)
+    assert sorted(validator.tiles(validator.grow(validator.mask([(0, 2)])))) == [(0, 1), (0, 2), (1, 2)]
+    assert sorted(validator.tiles(validator.grow(validator.mask([(1, 1)])))) == [
+        (0, 1), (1, 0), (1, 1), (1, 2), (2, 1)]
+
+def test_validator_check(game):
+    validator = game.LayoutValidator(3, 3)
+    # a wall across the middle column cuts the right side off
+    wall = validator.mask([(1, 0), (1, 1), (1, 2)])
+    assert not validator.check(wall, (0, 0))
+    assert validator.check(wall, (0, 0), targets=validator.mask([(0, 2)]))
+    assert validator.check(validator.mask([(1, 1)]), (0, 0))
+    # the spawn tile itself must be open
+    assert not validator.check(validator.mask([(0, 0)]), (0, 0))
+
+def test_validator_repair(game):
+    validator = game.LayoutValidator(5, 5)
+    wall = validator.mask([(2, j) for j in range(5)])
+    repaired = validator.repair(wall, (0, 0))
+    assert validator.check(repaired, (0, 0))
+    # one opened tile is enough to reconnect the grid
+    assert len(validator.tiles(repaired)) == 4
+    assert repaired & ~wall == 0
+
+def test_generated_layouts_are_connected(game):
+    for current_round in range(1, game.max_rounds + 1):
+        game.current_round = current_round
+        game.generate_holes()
+        assert game.layout_validator.check(game.layout_validator.mask(game.holes), game.start_tile)
+
+def test_snapshot_masks_use_the_validator_bits(game):
+    tiles = [(0, 0), (1, 2), (game.grid_size_x - 1, game.grid_size_y - 1)]
+    data = game.tiles_to_mask(tiles)
+    assert int.from_bytes(data, 'little') == game.layout_validator.mask(tiles)
+    assert game.mask_to_tiles(data) == tiles
+    # padding bits past the grid are not tiles
+    assert game.mask_to_tiles(b'\xff' * game.grid_mask_bytes) == sorted(all_tiles(game))
@@ -0,0 +1,43 @@
+"""LAZY_NAMESPACES binds the same names as the eager namespaces"""
+import json, os, subprocess, sys, textwrap
+from conftest import ROOT
+
+def run(script, tmp_path, **flags):
+    env = dict(os.environ, PYTHONPATH=ROOT, PYOPENGL_CODEGEN_CACHE=str(tmp_path / 'cache'))
+    env.update(('PYOPENGL_%s' % name, str(value)) for name, value in flags.items())
+    result = subprocess.run([sys.executable, '-c', textwrap.dedent(script)], env=env,
+                            capture_output=True, text=True, timeout=300)
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+STAR_IMPORT = '''
+import json
+namespace = {}
+exec("from OpenGL.GL import *\\nfrom OpenGL.GLU import *\\nfrom OpenGL.GLUT import *", namespace)
+print(json.dumps(sorted(name for name in namespace if name != '__builtins__')))
+'''
+
+def test_star_import_binds_same_names(tmp_path):
+    eager = run(STAR_IMPORT, tmp_path)
+    # the first lazy run builds the index, the second one reads it back
+    assert run(STAR_IMPORT, tmp_path, LAZY_NAMESPACES=True) == eager
+    assert run(STAR_IMPORT, tmp_path, LAZY_NAMESPACES=True) == eager
+
+def test_alias_resolution_swaps_every_name(tmp_path):
+    # building the index imports every source, so build it first
+    run(STAR_IMPORT, tmp_path, LAZY_NAMESPACES=True)
+    result = run('''
+        import json
+        from OpenGL.lazynamespace import LazyEntryPoint
+        from OpenGL.GL import *
+        before = [isinstance(glRotate, LazyEntryPoint), isinstance(glRotated, LazyEntryPoint)]
+        bool(glRotate)  # resolves without a context, unlike a call
+        print(json.dumps({
+            'before': before,
+            'after': [isinstance(glRotate, LazyEntryPoint), isinstance(glRotated, LazyEntryPoint)],
+            'names': [glRotate.__name__, glRotated.__name__],
+        }))
+    ''', tmp_path, LAZY_NAMESPACES=True)
+    assert result['before'] == [True, True]
+    assert result['after'] == [False, False]
+    assert result['names'] == ['glRotated', 'glRotated']
@@ -0,0 +1,109 @@
+"""Snapshot quantization and delta transport used by NetServer/NetClient"""
+import struct, zlib
+import pytest
+
+def snapshot_doubles(game, data):
+    snapshot, wire, doubles = game.net_layout(game.snap_header.unpack_from(data)[-8:])
+    values = snapshot.unpack(data)
+    return [values[k] for k in doubles], [v for k, v in enumerate(values) if k not in doubles]
+
+def test_quantize_round_trip(game):
+    data = game.take_snapshot()
+    restored = game.dequantize_snapshot(game.quantize_snapshot(data))
+    assert len(restored) == len(data)
+    before, before_other = snapshot_doubles(game, data)
+    after, after_other = snapshot_doubles(game, restored)
+    assert before_other == after_other
+    for a, b in zip(before, after):
+        assert b == pytest.approx(a, abs=0.5 / game.net_scale)
+
+def test_quantize_large_values(game):
+    # an obstacle bouncing repeatedly gains 10% speed per bounce without limit
+    game.obstacles[0]['vel'] = 1.0e9
+    game.obstacles[1]['vel'] = -1.0e30
+    game.obstacles[2]['vel'] = float('inf')
+    data = game.take_snapshot()
+    restored = game.dequantize_snapshot(game.quantize_snapshot(data))
+    before, _ = snapshot_doubles(game, data)
+    after, _ = snapshot_doubles(game, restored)
+    index = before.index(1.0e9)
+    assert after[index] == 1.0e9
+    limit = game.net_wire_limit / game.net_scale
+    assert after[before.index(-1.0e30)] == -limit
+    assert after[before.index(float('inf'))] == limit
+
+def test_quantize_value_saturates(game):
+    assert game.quantize_value(float('nan')) == 0
+    assert game.quantize_value(1e300) == game.net_wire_limit
+    assert game.quantize_value(-1e300) == -game.net_wire_limit
+    assert game.quantize_value(1.5) == round(1.5 * game.net_scale)
+
+class FakeWriter:
+    def __init__(self):
+        self.sent = []
+    def write(self, data):
+        self.sent.append(data)
+
+def state_message(game, tick, baseline, state, base=None):
+    payload = state if base is None else game.xor_bytes(state, base[:len(state)])
+    return game.net_state.pack(tick, baseline, zlib.crc32(state), 0) + zlib.compress(payload, 1)
+
+def test_delta_round_trip(game):
+    client = game.NetClient('127.0.0.1:0', apply=False)
+    client.writer = FakeWriter()
+    first = game.quantize_snapshot(game.take_snapshot())
+    client.receive(state_message(game, 1, 0, first))
+    game.ball_pos[0] += 12.5
+    game.obstacles[0]['vel'] = 5.0e8
+    second = game.quantize_snapshot(game.take_snapshot())
+    client.receive(state_message(game, 2, 1, second, first))
+    assert client.errors == 0
+    assert client.states[2] == second
+    assert client.latest == (2, 0)
+    # a delta against a baseline the client no longer has is dropped
+    client.receive(state_message(game, 3, 99, second, first))
+    assert client.errors == 1
+
+def test_client_counts_malformed_states(game):
+    client = game.NetClient('127.0.0.1:0', apply=False)
+    client.writer = FakeWriter()
+    payload = state_message(game, 1, 0, game.quantize_snapshot(game.take_snapshot()))
+    client.receive(payload[:game.net_state.size - 1])
+    client.receive(payload[:-8])
+    client.receive(payload[:game.net_state.size] + b'not zlib')
+    assert client.errors == 3
+    assert client.latest is None
+    client.receive(payload)
+    assert client.errors == 3
+    assert client.latest == (1, 0)
+
+def test_client_prunes_keyframe_states(game):
+    client = game.NetClient('127.0.0.1:0', apply=False)
+    client.writer = FakeWriter()
+    state = game.quantize_snapshot(game.take_snapshot())
+    for tick in range(1, 5 * game.net_history):
+        client.receive(state_message(game, tick, 0, state))
+    assert len(client.states) <= game.net_history + 1
+    assert max(client.states) == 5 * game.net_history - 1
+
+def test_server_rejects_non_movement_keys(game, monkeypatch):
+    import asyncio
+    pressed = []
+    monkeypatch.setattr(game, 'keyboard', lambda k, x, y: pressed.append(k))
+    monkeypatch.setattr(game, 'keyboard_up', lambda k, x, y: pressed.append(k))
+    server = game.NetServer()
+    messages = [
+        game.net_message.pack(game.NET_INPUT, game.net_input.size) + game.net_input.pack(seq, key, True)
+        for seq, key in enumerate([b'w', b'k', b'r', b'b', b' ', b'\x1b'], 1)
+    ]
+    async def run():
+        reader = asyncio.StreamReader()
+        reader.feed_data(b''.join(messages))
+        reader.feed_eof()
+        class Writer(FakeWriter):
+            def close(self):
+                pass
+        await server.handle(reader, Writer())
+    asyncio.run(run())
+    assert pressed == [b'w', b' ']
+    assert server.stats['rejected_inputs'] == 4
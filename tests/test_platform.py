@@ -0,0 +1,22 @@
+"""Deferred entry points replacing themselves in user namespaces"""
+import importlib.util, sys, types
+from OpenGL.platform import baseplatform
+
+def test_replace_swaps_user_bindings_and_skips_lazy_modules(tmp_path, monkeypatch):
+    source = tmp_path / 'untouched_lazy_module.py'
+    source.write_text("raise AssertionError('lazy module was loaded')\n")
+    spec = importlib.util.spec_from_file_location('untouched_lazy_module', str(source))
+    spec.loader = importlib.util.LazyLoader(spec.loader)
+    lazy = importlib.util.module_from_spec(spec)
+    monkeypatch.setitem(sys.modules, 'untouched_lazy_module', lazy)
+    spec.loader.exec_module(lazy)
+
+    stub = types.SimpleNamespace(__name__='glFakeEntryPoint')
+    user = types.ModuleType('user_module')
+    user.glFakeEntryPoint = stub
+    monkeypatch.setitem(sys.modules, 'user_module', user)
+    def func():
+        pass
+    baseplatform._DeferredFunctionPointer.replace(stub, func)
+    assert user.glFakeEntryPoint is func
+    assert type(lazy).__getattribute__ is not types.ModuleType.__getattribute__
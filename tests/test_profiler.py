@@ -0,0 +1,68 @@
+"""Per-frame call accounting in OpenGL.profiler"""
+from OpenGL.profiler import CallProfiler
+
+def fake_function(name):
+    def function(*args):
+        return len(args)
+    function.__name__ = name
+    return function
+
+def test_frame_counts_calls_since_last_frame():
+    profiler = CallProfiler()
+    vertex = profiler.wrap(fake_function('glVertex3f'))
+    color = profiler.wrap(fake_function('glColor3f'))
+    for _ in range(5):
+        vertex(1, 2, 3)
+    color(1, 1, 1)
+    assert profiler.frame() == 6
+    vertex(1, 2, 3)
+    assert profiler.frame() == 1
+    assert profiler.frame() == 0
+    assert profiler.entry('glVertex3f').history == [5, 1, 0]
+    assert profiler.entry('glColor3f').history == [1, 0, 0]
+    assert [calls for duration, calls, spent in profiler.frames] == [6, 1, 0]
+
+def test_wrapped_function_forwards_attributes():
+    profiler = CallProfiler()
+    base = fake_function('glFlush')
+    wrapped = profiler.wrap(base)
+    wrapped.errcheck = 'checker'
+    assert base.errcheck == 'checker'
+    assert wrapped.__name__ == 'glFlush'
+    assert wrapped(1, 2) == 2
+
+def test_histogram_buckets():
+    profiler = CallProfiler()
+    vertex = profiler.wrap(fake_function('glVertex3f'))
+    # frames before the first call are not part of a function's history
+    profiler.frame()
+    for count in (1, 2, 10, 10, 19, 20):
+        for _ in range(count):
+            vertex()
+        profiler.frame()
+    buckets = profiler.histogram('glVertex3f', bins=2)
+    assert buckets == [(1, 10, 4), (11, 20, 2)]
+    assert sum(frames for low, high, frames in profiler.histogram()) == 7
+    assert profiler.histogram('glNothing') == []
+
+def test_max_frames_and_reset():
+    profiler = CallProfiler(maxFrames=3)
+    vertex = profiler.wrap(fake_function('glVertex3f'))
+    for count in range(5):
+        for _ in range(count):
+            vertex()
+        profiler.frame()
+    assert profiler.entry('glVertex3f').history == [2, 3, 4]
+    assert len(profiler.frames) == 3
+    assert profiler.top(1, 'calls')[0]['calls'] == 10
+    profiler.reset()
+    assert profiler.frames == [] and profiler.top() == []
+
+def test_timing():
+    profiler = CallProfiler(timing=True)
+    vertex = profiler.wrap(fake_function('glVertex3f'))
+    vertex()
+    profiler.frame()
+    row = profiler.top(1)[0]
+    assert row['calls'] == 1 and row['time_ms'] >= 0
+    assert profiler.summary()['frames'] == 1
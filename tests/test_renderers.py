@@ -0,0 +1,73 @@
+"""The GLUT-free mesh renderer and the shader renderer on a core context"""
+import pytest
+
+SCRIPT = '''
+import random
+import Game
+from OpenGL.GL import *
+Game.hud_enabled = False
+args = Game.parse_args(['--renderer', 'mesh'])
+Game.setup_rendering(args)
+Game.setup_projection()
+Game.clock.simulate(1.0 / 60)
+random.seed(1234)
+Game.reset_game()
+for _ in range(3):
+    Game.step_simulation()
+    Game.render_frame()
+glFinish()
+pixels = glReadPixels(0, 0, 64, 64, GL_RGB, GL_UNSIGNED_BYTE)
+print(json.dumps({'renderer': Game.gfx.name, 'lists': len(Game.gfx.lists), 'colours': len(set(pixels[k:k + 3] for k in range(0, len(pixels), 3)))}))
+'''
+
+def test_mesh_renderer_draws_solids_without_glut(run_gl):
+    result = run_gl(SCRIPT)
+    assert result['renderer'] == 'mesh'
+    assert result['lists'] > 0
+    assert result['colours'] > 1
+
+SHADER_SCRIPT = '''
+import random
+import Game
+from OpenGL.GL import *
+def render(argv):
+    Game.hud_enabled = False
+    Game.setup_rendering(Game.parse_args(argv))
+    Game.reshape(64, 64)
+    Game.clock.simulate(1.0 / 60)
+    random.seed(1234)
+    Game.reset_game()
+    for _ in range(3):
+        Game.step_simulation()
+        Game.render_frame()
+    glFinish()
+    return glReadPixels(0, 0, 64, 64, GL_RGB, GL_UNSIGNED_BYTE)
+compatibility = render(['--renderer', 'shader'])
+core = None
+if os.environ.get('PYOPENGL_PLATFORM') == 'egl':
+    from OpenGL import EGL
+    config, count = EGL.EGLConfig(), EGL.EGLint()
+    attributes = (EGL.EGLint * 11)(
+        EGL.EGL_SURFACE_TYPE, EGL.EGL_PBUFFER_BIT, EGL.EGL_RED_SIZE, 8, EGL.EGL_GREEN_SIZE, 8,
+        EGL.EGL_BLUE_SIZE, 8, EGL.EGL_RENDERABLE_TYPE, EGL.EGL_OPENGL_BIT, EGL.EGL_NONE)
+    EGL.eglChooseConfig(context, attributes, ctypes.pointer(config), 1, ctypes.pointer(count))
+    surface = EGL.eglCreatePbufferSurface(
+        context, config, (EGL.EGLint * 5)(EGL.EGL_WIDTH, 64, EGL.EGL_HEIGHT, 64, EGL.EGL_NONE))
+    core_context = EGL.eglCreateContext(context, config, EGL.EGL_NO_CONTEXT, (EGL.EGLint * 7)(
+        EGL.EGL_CONTEXT_MAJOR_VERSION, 3, EGL.EGL_CONTEXT_MINOR_VERSION, 3,
+        EGL.EGL_CONTEXT_OPENGL_PROFILE_MASK, EGL.EGL_CONTEXT_OPENGL_CORE_PROFILE_BIT, EGL.EGL_NONE))
+    if core_context and EGL.eglMakeCurrent(context, surface, surface, core_context):
+        core = render(['--renderer', 'shader', '--core-profile'])
+print(json.dumps({
+    'colours': len(set(compatibility[k:k + 3] for k in range(0, len(compatibility), 3))),
+    'core': core is not None and core == compatibility,
+    'has_core': core is not None,
+}))
+'''
+
+def test_shader_renderer_matches_on_core_profile(run_gl):
+    result = run_gl(SHADER_SCRIPT)
+    assert result['colours'] > 1
+    if not result['has_core']:
+        pytest.skip("no 3.3 core context available")
+    assert result['core']
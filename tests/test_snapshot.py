@@ -0,0 +1,83 @@
+"""Snapshot save/restore and the shared-memory simulation link"""
+import pytest
+
+def test_snapshot_round_trip(game):
+    data = game.take_snapshot()
+    holes, zones, ball = set(game.holes), dict(game.zones), list(game.ball_pos)
+    score, lives = game.score, game.lives
+    game.ball_pos[0] += 3.0
+    game.score += 2
+    game.lives -= 1
+    game.restore_snapshot(data)
+    assert game.ball_pos == ball
+    assert (game.score, game.lives) == (score, lives)
+    assert game.holes == holes
+    assert set(game.zones['danger']) == set(zones['danger'])
+    assert game.take_snapshot() == data
+
+def test_restore_keeps_layout_version(game):
+    data = game.take_snapshot()
+    version = game.layout_version
+    game.ball_pos[0] += 1.0
+    game.restore_snapshot(data)
+    assert game.layout_version == version
+
+def test_restore_other_layout_bumps_version(game):
+    data = game.take_snapshot()
+    holes = set(game.holes)
+    game.holes = holes | {(0, 0), (1, 0)}
+    version = game.layout_version
+    game.restore_snapshot(data)
+    assert game.holes == holes
+    assert game.layout_version == version + 1
+
+def test_rejects_foreign_data(game):
+    data = bytearray(game.take_snapshot())
+    data[:4] = b'XXXX'
+    with pytest.raises(ValueError):
+        game.restore_snapshot(bytes(data))
+
+def test_link_publish_and_sync(game):
+    link = game.SimulationLink()
+    try:
+        data = game.take_snapshot()
+        link.publish(data, 7, game.clock.now)
+        game.ball_pos[0] += 2.0
+        assert link.sync()
+        assert link.shown_input_seq == 7
+        assert game.take_snapshot() == data
+        assert not link.sync()
+        with pytest.raises(ValueError):
+            link.publish(bytes(game.link_slot_bytes + 1), 8, 0.0)
+    finally:
+        link.stop()
+
+def test_link_sync_gives_up_on_a_slot_left_mid_publish(game):
+    link = game.SimulationLink()
+    try:
+        link.publish(game.take_snapshot(), 1, game.clock.now)
+        assert link.sync()
+        # a writer which died between its two sequence updates
+        offset = link.slot_offset(link.control()[2])
+        seq = game.link_slot_header.unpack_from(link.buf, offset)[0]
+        game.struct.pack_into('<Q', link.buf, offset, seq + 1)
+        assert not link.sync()
+        assert link.torn_reads == 1
+    finally:
+        link.stop()
+
+def test_link_sync_stops_when_the_simulation_exits(game):
+    class Exited:
+        exitcode = 1
+        def is_alive(self):
+            return False
+        def join(self, timeout=None):
+            pass
+    link = game.SimulationLink()
+    try:
+        link.publish(game.take_snapshot(), 1, game.clock.now)
+        link.process = Exited()
+        assert not link.sync()
+        assert link.exited
+    finally:
+        link.stop()
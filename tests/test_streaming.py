@@ -0,0 +1,78 @@
+"""StreamingVBO regions reach the GL under both update strategies"""
+import pytest
+
+SCRIPT = '''
+import numpy
+from OpenGL.GL import *
+from OpenGL.raw.GL.VERSION import GL_3_2, GL_4_4
+from OpenGL.arrays import vbo
+persistent = %(persistent)r
+if persistent and not GL_4_4.glBufferStorage:
+    print(json.dumps({'skip': 'no glBufferStorage'}))
+    sys.exit(0)
+# the GL is done with every region by the time it comes round again, so
+# make one wait report that it timed out to exercise the stall accounting
+waits = []
+glClientWaitSync = GL_3_2.glClientWaitSync
+def clientWaitSync(fence, flags, timeout):
+    waits.append(timeout)
+    if len(waits) == 1:
+        return GL_3_2.GL_TIMEOUT_EXPIRED
+    return glClientWaitSync(fence, flags, timeout)
+GL_3_2.glClientWaitSync = clientWaitSync
+stream = vbo.StreamingVBO((16, 3), 'f', frames=3, persistent=persistent)
+matches = []
+offsets = []
+fenced = []
+for frame in range(7):
+    region = stream.next_region()
+    count = 16 - frame
+    region[:count] = numpy.arange(count * 3, dtype='f').reshape(count, 3) + 100 * frame
+    stream.commit(count)
+    with stream:
+        written = glGetBufferSubData(GL_ARRAY_BUFFER, stream.offset, count * 12)
+    matches.append(bytes(written) == region[:count].tobytes())
+    offsets.append(stream.offset)
+    stream.fence()
+    fenced.append(sum(fence is not None for fence in stream.fences))
+    glFinish()
+stats = dict(stream.stats)
+stream.delete()
+print(json.dumps({
+    'persistent': stream.persistent,
+    'matches': matches,
+    'offsets': offsets,
+    'fenced': fenced,
+    'stride': stream.stride,
+    'waits': len(waits),
+    'stats': stats,
+}))
+'''
+
+def test_orphaning_uploads_each_frame(run_gl):
+    result = run_gl(SCRIPT % {'persistent': False})
+    assert not result['persistent']
+    assert all(result['matches'])
+    assert result['offsets'] == [0] * 7
+    assert result['fenced'] == [0] * 7
+    assert result['waits'] == 0
+    assert result['stats'] == {'frames': 7, 'stalls': 0, 'stall_ns': 0, 'orphans': 7}
+
+def test_persistent_ring_waits_on_fences(run_gl):
+    result = run_gl(SCRIPT % {'persistent': True})
+    if 'skip' in result:
+        pytest.skip(result['skip'])
+    assert result['persistent']
+    assert all(result['matches'])
+    stride = result['stride']
+    assert stride % 256 == 0
+    assert result['offsets'] == [0, stride, 2 * stride] * 2 + [0]
+    # a fence per region in flight, consumed when the region comes round
+    assert result['fenced'] == [1, 2, 3, 3, 3, 3, 3]
+    # regions 4 to 7 each wait on a fence, the first wait "times out"
+    assert result['waits'] == 5
+    stats = result['stats']
+    assert stats['frames'] == 7
+    assert stats['orphans'] == 0
+    assert stats['stalls'] == 1
+    assert stats['stall_ns'] > 0
@@ -0,0 +1,29 @@
+"""Telemetry ring file written by TelemetryWriter"""
+import pytest
+
+def test_records_round_trip(game, tmp_path, monkeypatch):
+    path = str(tmp_path / 'telemetry.bin')
+    writer = game.TelemetryWriter(path, capacity=8)
+    monkeypatch.setattr(game, 'gfx', type('Renderer', (), {'stats': {'batches': 42}})())
+    for frame in range(12):
+        writer.record(0.001 * frame)
+    writer.close()
+    records = game.read_telemetry(path)
+    assert [record[0] for record in records] == list(range(5, 13))
+    assert all(record[12] == 42 for record in records)
+    # GL calls are only counted with PYOPENGL_PROFILE_CALLS
+    assert all(record[13] == 0 for record in records)
+    assert records[-1][2] == pytest.approx(0.011)
+
+def test_gl_calls_from_profiler(game, tmp_path, monkeypatch):
+    from OpenGL.profiler import CallProfiler
+    profiler = CallProfiler()
+    monkeypatch.setattr(game, 'gl_profiler', profiler)
+    entry = profiler.entry('glVertex3f')
+    entry.count += 17
+    profiler.frame()
+    path = str(tmp_path / 'telemetry.bin')
+    writer = game.TelemetryWriter(path, capacity=4)
+    writer.record(0.016)
+    writer.close()
+    assert game.read_telemetry(path)[-1][13] == 17
@@ -0,0 +1,158 @@
+"""Dirty range tracking and the partial uploads VBO.copy_data makes from it"""
+import ctypes
+import pytest
+numpy = pytest.importorskip('numpy')
+from OpenGL.arrays import vbo
+from OpenGL.arrays.vbo import _DirtyRanges
+
+def ranges(dirty):
+    return list(zip(dirty.starts, dirty.stops))
+
+def test_add_keeps_ranges_sorted_and_disjoint():
+    dirty = _DirtyRanges()
+    dirty.add(100, 200)
+    dirty.add(0, 10)
+    dirty.add(300, 400)
+    assert ranges(dirty) == [(0, 10), (100, 200), (300, 400)]
+    assert len(dirty) == 3
+    assert dirty.total() == 210
+
+def test_add_merges_overlapping_and_touching():
+    dirty = _DirtyRanges()
+    dirty.add(100, 200)
+    dirty.add(200, 250)
+    assert ranges(dirty) == [(100, 250)]
+    dirty.add(50, 120)
+    assert ranges(dirty) == [(50, 250)]
+    dirty.add(300, 310)
+    dirty.add(0, 400)
+    assert ranges(dirty) == [(0, 400)]
+    dirty.add(10, 20)
+    assert ranges(dirty) == [(0, 400)]
+
+def test_coalesced_joins_small_gaps():
+    dirty = _DirtyRanges()
+    for start in (0, 20, 100, 1000):
+        dirty.add(start, start + 10)
+    assert dirty.coalesced(0) == [[0, 10], [20, 30], [100, 110], [1000, 1010]]
+    assert dirty.coalesced(10) == [[0, 30], [100, 110], [1000, 1010]]
+    assert dirty.coalesced(100) == [[0, 110], [1000, 1010]]
+    assert dirty.coalesced(10 ** 6) == [[0, 1010]]
+    # coalescing does not change the ranges themselves
+    assert len(dirty) == 4
+
+def test_clear():
+    dirty = _DirtyRanges()
+    dirty.add(0, 10)
+    dirty.clear()
+    assert len(dirty) == 0
+    assert dirty.coalesced(100) == []
+
+class RecordingImplementation(object):
+    """Keeps the buffer contents the GL would have and the upload calls made"""
+    _DELETERS_ = {}
+    GL_ARRAY_BUFFER = 0x8892
+    GL_DYNAMIC_DRAW = 0x88E8
+    def __init__(self):
+        self.calls = []
+        self.contents = bytearray()
+    def basename(self, name):
+        return name
+    def deleter(self, buffers, key):
+        return lambda ref: None
+    def glGenBuffers(self, count):
+        return 1
+    def glBindBuffer(self, target, buffer):
+        pass
+    def glBufferData(self, target, size, data, usage):
+        self.calls.append(('data', size))
+        self.contents = bytearray(numpy.asarray(data).tobytes()[:size])
+    def glBufferSubData(self, target, offset, size, pointer):
+        self.calls.append(('sub', offset, size))
+        self.contents[offset:offset + size] = ctypes.string_at(pointer, size)
+
+class RecordingVBO(vbo.VBO):
+    implementation = None
+
+@pytest.fixture
+def buffer():
+    """A bound 100000-float VBO uploading into a RecordingImplementation"""
+    buffer = RecordingVBO(numpy.zeros(100000, 'f'))
+    buffer.implementation = RecordingImplementation()
+    buffer.bind()
+    del buffer.implementation.calls[:]
+    return buffer
+
+def uploaded(buffer):
+    buffer.bind()
+    assert bytes(buffer.implementation.contents) == buffer.data.tobytes()
+    return buffer.implementation.calls
+
+def test_separate_ranges_are_sub_uploaded(buffer):
+    buffer[10:20] = numpy.ones(10, 'f')
+    buffer[50000:50010] = numpy.ones(10, 'f')
+    assert uploaded(buffer) == [('sub', 40, 40), ('sub', 200000, 40)]
+    assert buffer.stats['sub_uploads'] == 2
+    assert buffer.stats['bytes_uploaded'] == 400000 + 80
+
+def test_nearby_ranges_are_one_call(buffer):
+    buffer[10:20] = numpy.ones(10, 'f')
+    buffer[100:110] = numpy.ones(10, 'f')
+    assert uploaded(buffer) == [('sub', 40, 400)]
+    assert buffer.stats['sub_uploads'] == 1
+
+def test_scattered_ranges_orphan(buffer):
+    # gaps under upload_call_bytes join everything into one whole-buffer range
+    for start in range(0, 100000, 1000):
+        buffer[start:start + 1] = numpy.ones(1, 'f')
+    buffer[-1:] = numpy.ones(1, 'f')
+    assert uploaded(buffer) == [('data', 400000)]
+    assert buffer.stats['orphans'] == 1
+    assert buffer.stats['sub_uploads'] == 0
+    assert buffer.stats['full_uploads'] == 2
+
+def test_whole_array_assignment_reuploads_without_orphaning(buffer):
+    buffer[:] = numpy.ones(100000, 'f')
+    assert not buffer.copied
+    assert uploaded(buffer) == [('data', 400000)]
+    assert buffer.stats['orphans'] == 0
+    assert buffer.stats['full_uploads'] == 2
+
+def test_stop_past_the_end_is_clamped(buffer):
+    buffer[99990:200000] = numpy.ones(10, 'f')
+    assert buffer.stats['bytes_dirtied'] == 40
+    assert uploaded(buffer) == [('sub', 399960, 40)]
+    buffer[-5:] = numpy.full(5, 2, 'f')
+    assert buffer.stats['bytes_dirtied'] == 60
+    assert uploaded(buffer)[-1] == ('sub', 399980, 20)
+
+GL_SCRIPT = '''
+import numpy
+from OpenGL.GL import *
+from OpenGL.arrays import vbo
+data = numpy.arange(100000, dtype='f')
+buffer = vbo.VBO(data)
+buffer.bind()
+buffer[10:20] = numpy.ones(10, 'f')
+buffer[50000:50010] = numpy.ones(10, 'f')
+buffer.bind()
+for start in range(0, 100000, 1000):
+    buffer[start:start + 1] = numpy.full(1, 3, 'f')
+buffer[-1:] = numpy.full(1, 3, 'f')
+buffer.bind()
+buffer[99990:200000] = numpy.full(10, 5, 'f')
+buffer.bind()
+contents = glGetBufferSubData(GL_ARRAY_BUFFER, 0, 400000)
+buffer.unbind()
+stats = buffer.stats
+buffer.delete()
+del buffer
+print(json.dumps({'same': bytes(contents) == data.tobytes(), 'stats': stats}))
+'''
+
+def test_gl_buffer_matches_array(run_gl):
+    result = run_gl(GL_SCRIPT)
+    assert result['same']
+    assert result['stats']['sub_uploads'] == 3
+    assert result['stats']['orphans'] == 1
+    assert result['stats']['full_uploads'] == 2